@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import json
+import math
+import numpy as np
+import geo
+from spatial_index import cell_range
+
+class Subscriber:
+    """One streaming client watching a circle around a location"""
+
+    def __init__(self, subscriber_id, lat, lon, radius, queue_size):
+        self.id = subscriber_id
+        self.lat = lat
+        self.lon = lon
+        self.radius = radius
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.cells = []
+        self.dropped = 0
+
+    def offer(self, alert):
+        """Queue an alert without waiting; a full queue drops its oldest alert"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(alert)
+
+class AlertHub:
+    """Pushes new user reports to the streaming clients whose circle contains them
+
+    Subscribers are registered in every grid cell their circle overlaps, so a
+    report only checks the subscribers of its own cell instead of all of them; each
+    cell caches its subscribers' centers and radii as arrays for one vectorized
+    distance check. Every method runs on the event loop; a slow client's queue drops
+    its oldest alerts instead of holding up the others.
+    """
+
+    def __init__(self, cell_size=0.005, queue_size=100):
+        self.cell_size = cell_size
+        self.queue_size = queue_size
+        self.cells = {}
+        self.subscribers = {}
+        self.ids = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, lat, lon, radius):
+        """Register a client circle and get its Subscriber"""
+        subscriber = Subscriber(next(self.ids), lat, lon, radius, self.queue_size)
+        row_min, row_max, col_min, col_max = cell_range(lat, lon, radius, self.cell_size)
+        for cell in itertools.product(range(row_min, row_max + 1), range(col_min, col_max + 1)):
+            entry = self.cells.setdefault(cell, {'members': {}, 'arrays': None})
+            entry['members'][subscriber.id] = subscriber
+            entry['arrays'] = None
+            subscriber.cells.append(cell)
+        self.subscribers[subscriber.id] = subscriber
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a client from the index"""
+        if self.subscribers.pop(subscriber.id, None) is None:
+            return
+        for cell in subscriber.cells:
+            entry = self.cells.get(cell)
+            if entry is not None:
+                entry['members'].pop(subscriber.id, None)
+                entry['arrays'] = None
+                if not entry['members']:
+                    del self.cells[cell]
+
+    def cell_arrays(self, entry):
+        """Get a cell's (subscribers, lats, lons, radii), cached until its members change"""
+        if entry['arrays'] is None:
+            members = list(entry['members'].values())
+            entry['arrays'] = (members,
+                               np.array([member.lat for member in members]),
+                               np.array([member.lon for member in members]),
+                               np.array([member.radius for member in members]))
+        return entry['arrays']
+
+    def publish(self, report):
+        """Push a report to every subscriber whose circle contains it; returns how many got it"""
+        self.published += 1
+        entry = self.cells.get((math.floor(report['lat'] / self.cell_size), math.floor(report['lon'] / self.cell_size)))
+        if entry is None:
+            return 0
+
+        members, lats, lons, radii = self.cell_arrays(entry)
+        distances = geo.haversine_distances(lats, lons, report['lat'], report['lon'])
+        recipients = np.flatnonzero(distances <= radii)
+
+        alert = {
+            'lat': report['lat'],
+            'lon': report['lon'],
+            'alert_type': report['incident_type'],
+            'severity': report['severity'],
+            'distance': None,
+            'description': report.get('description', 'User reported incident'),
+            'timestamp': report.get('timestamp')
+        }
+        for i, distance in zip(recipients.tolist(), distances[recipients].tolist()):
+            members[i].offer({**alert, 'distance': distance})
+        self.delivered += len(recipients)
+        return len(recipients)
+
+    def stats(self):
+        """Get subscriber and delivery counters"""
+        return {
+            'subscribers': len(self.subscribers),
+            'indexed_cells': len(self.cells),
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': sum(subscriber.dropped for subscriber in self.subscribers.values())
+        }
+
+def format_event(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
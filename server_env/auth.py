@@ -0,0 +1,14 @@
+import hashlib
+import hmac
+
+def user_token(secret, user_id):
+    """Issue the token that identifies a user to the API: '<user_id>:<HMAC-SHA256 of user_id>'"""
+    signature = hmac.new(secret.encode(), user_id.encode(), hashlib.sha256).hexdigest()
+    return f"{user_id}:{signature}"
+
+def token_user(secret, token):
+    """Get the user id a token was issued for, or None if it is not validly signed"""
+    user_id = token.rpartition(':')[0]
+    if not user_id or not hmac.compare_digest(user_token(secret, user_id), token):
+        return None
+    return user_id
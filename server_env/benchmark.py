@@ -0,0 +1,921 @@
+import argparse
+import json
+import math
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+import joblib
+import numpy as np
+from model import WalkSafeModel, DANGER_ZONE_BOUNDS, DANGER_ZONE_RESOLUTION, FEATURE_RADIUS
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA
+from cache import LRUCache, DiskCache
+import tiles
+import geo
+from spatial_index import GridIndex
+
+# Density of the shipped dataset: ~10k incidents over the Delray Beach training bounds
+DELRAY_BOUNDS = {'north': 26.50, 'south': 26.42, 'east': -80.05, 'west': -80.10}
+DELRAY_INCIDENTS = 10000
+
+def synthetic_bounds(n):
+    """Get bounds around Delray Beach that hold n incidents at today's density"""
+    scale = math.sqrt(n / DELRAY_INCIDENTS)
+    lat_center = (DELRAY_BOUNDS['north'] + DELRAY_BOUNDS['south']) / 2
+    lon_center = (DELRAY_BOUNDS['east'] + DELRAY_BOUNDS['west']) / 2
+    lat_half = (DELRAY_BOUNDS['north'] - DELRAY_BOUNDS['south']) / 2 * scale
+    lon_half = (DELRAY_BOUNDS['east'] - DELRAY_BOUNDS['west']) / 2 * scale
+    return {
+        'north': lat_center + lat_half, 'south': lat_center - lat_half,
+        'east': lon_center + lon_half, 'west': lon_center - lon_half
+    }
+
+def make_synthetic_crimes(n, bounds, seed=42):
+    """Generate n crime records uniformly spread over bounds"""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(bounds['south'], bounds['north'], n)
+    lons = rng.uniform(bounds['west'], bounds['east'], n)
+    severities = rng.uniform(0.1, 1.0, n)
+    crime_types = np.array(['theft', 'burglary', 'violent', 'vandalism', 'other'])[rng.integers(0, 5, n)]
+    return [
+        {
+            'lat': float(lats[i]),
+            'lon': float(lons[i]),
+            'date': '2025-09-18',
+            'severity': float(severities[i]),
+            'crime_type': str(crime_types[i]),
+            'category': str(crime_types[i])
+        }
+        for i in range(n)
+    ]
+
+def time_per_call(func, queries):
+    """Run func over each query and return mean seconds per call"""
+    start = time.perf_counter()
+    for query in queries:
+        func(*query)
+    return (time.perf_counter() - start) / len(queries)
+
+def bench_spatial_index(sizes=(10000, 100000, 1000000), n_queries=200):
+    """Radius query latency with and without the grid index as the incident count grows"""
+    print(f"{'incidents':>10} {'build (s)':>10} {'indexed (ms)':>13} {'linear (ms)':>12} {'found':>6}")
+
+    for n in sizes:
+        bounds = synthetic_bounds(n)
+        walksafe = WalkSafeModel()
+        walksafe.crime_data = IncidentStore.from_records(CRIME_SCHEMA, make_synthetic_crimes(n, bounds))
+
+        start = time.perf_counter()
+        walksafe.crime_index = walksafe.build_spatial_index(walksafe.crime_data)
+        build_time = time.perf_counter() - start
+
+        rng = np.random.default_rng(7)
+        queries = [
+            ({'lat': lat, 'lon': lon}, 0.3)
+            for lat, lon in zip(rng.uniform(bounds['south'], bounds['north'], n_queries),
+                                rng.uniform(bounds['west'], bounds['east'], n_queries))
+        ]
+
+        indexed = time_per_call(
+            lambda center, radius: walksafe.get_incidents_in_radius(walksafe.crime_data, center, radius), queries)
+        found = np.mean([len(walksafe.get_incidents_in_radius(walksafe.crime_data, *q)) for q in queries[:20]])
+
+        # A copy of the store has no index, so queries on it fall back to a full scan
+        unindexed = walksafe.crime_data.take(np.arange(n))
+        linear = time_per_call(
+            lambda center, radius: walksafe.get_incidents_in_radius(unindexed, center, radius), queries[:3])
+
+        print(f"{n:>10} {build_time:>10.3f} {indexed * 1000:>13.3f} {linear * 1000:>12.3f} {found:>6.0f}")
+
+def synthetic_crime_store(n, bounds, seed=42):
+    """Generate a columnar store of n crimes uniformly spread over bounds and the last three years"""
+    rng = np.random.default_rng(seed)
+    return IncidentStore(CRIME_SCHEMA, {
+        'lat': rng.uniform(bounds['south'], bounds['north'], n),
+        'lon': rng.uniform(bounds['west'], bounds['east'], n),
+        'severity': rng.uniform(0.1, 1.0, n),
+        'date': rng.integers(date.today().toordinal() - 3 * 365, date.today().toordinal() + 1, n),
+        'crime_type': rng.integers(0, 5, n),
+        'category': rng.integers(0, 5, n)
+    })
+
+def bench_sqlite_store(sizes=(100000, 1000000, 10000000), n_queries=200, radius=0.5):
+    """Radius query latency and memory of the SQLite R*Tree backend versus the in-memory grid index"""
+    from sqlite_store import SQLiteStore
+
+    print(f"{'incidents':>10} {'memory query (ms)':>18} {'sqlite query (ms)':>18} {'memory (MB)':>12} "
+          f"{'sqlite file (MB)':>17} {'import (s)':>11} {'found':>6}")
+    for n in sizes:
+        bounds = synthetic_bounds(n)
+        crimes = synthetic_crime_store(n, bounds)
+        rng = np.random.default_rng(7)
+        queries = [({'lat': lat, 'lon': lon}, radius)
+                   for lat, lon in zip(rng.uniform(bounds['south'], bounds['north'], n_queries),
+                                       rng.uniform(bounds['west'], bounds['east'], n_queries))]
+
+        in_memory = WalkSafeModel()
+        in_memory.crime_data = crimes
+        in_memory.crime_index, index_mb = traced_megabytes(lambda: in_memory.build_spatial_index(crimes))
+        memory = time_per_call(lambda center, r: in_memory.get_incidents_in_radius(crimes, center, r), queries)
+
+        path = os.path.join(tempfile.mkdtemp(prefix="walksafe_sqlite_"), "incidents.db")
+        backed = WalkSafeModel(storage=SQLiteStore(path))
+        backed.crime_data = crimes
+        start = time.perf_counter()
+        backed.storage_tables = backed.storage.import_incidents(
+            crimes, IncidentStore.from_records(ACCIDENT_SCHEMA, []), "benchmark")
+        imported = time.perf_counter() - start
+        # Time warm queries, as a long-running server would see them
+        time_per_call(lambda center, r: backed.get_incidents_in_radius(crimes, center, r), queries[:20])
+        sqlite = time_per_call(lambda center, r: backed.get_incidents_in_radius(crimes, center, r), queries)
+
+        found = np.mean([len(backed.get_incidents_in_radius(crimes, *query)) for query in queries[:20]])
+        file_mb = os.path.getsize(path) / 1e6
+        print(f"{n:>10} {memory * 1000:>18.3f} {sqlite * 1000:>18.3f} {(crimes.nbytes() / 1e6 + index_mb):>12.1f} "
+              f"{file_mb:>17.1f} {imported:>11.1f} {found:>6.0f}")
+        backed.storage.close()
+        os.remove(path)
+
+def bench_recent_incidents(n=1000000, windows=(7, 30, 365), radii=(0.5, 2.0), n_queries=200):
+    """Recent-incident counts near a point: filtering the radius matches versus date-sorted grid cells"""
+    bounds = synthetic_bounds(n)
+    walksafe = WalkSafeModel()
+    walksafe.crime_data = synthetic_crime_store(n, bounds)
+    walksafe.crime_index = walksafe.build_spatial_index(walksafe.crime_data)
+    unsorted = GridIndex(walksafe.crime_data.column('lat'), walksafe.crime_data.column('lon'))
+
+    rng = np.random.default_rng(7)
+    queries = [({'lat': lat, 'lon': lon},) for lat, lon in zip(rng.uniform(bounds['south'], bounds['north'], n_queries),
+                                                                rng.uniform(bounds['west'], bounds['east'], n_queries))]
+    dates = walksafe.crime_data.column('date')
+
+    def filtered(center, radius, days):
+        positions = unsorted.candidates(center['lat'], center['lon'], radius)
+        distances = geo.local_distances(center['lat'], center['lon'], unsorted.lats[positions], unsorted.lons[positions])
+        return int(np.count_nonzero(dates[positions[distances <= radius]] >= walksafe.recent_cutoff_ordinal(days)))
+
+    def indexed(center, radius, days):
+        return walksafe.count_recent_near(walksafe.crime_data, center, radius, days)
+
+    print(f"{n} incidents")
+    print(f"{'radius':>7} {'days':>5} {'filter (us)':>12} {'sorted cells (us)':>18} {'found':>6}")
+    for radius in radii:
+        for days in windows:
+            found = [indexed(center, radius, days) for center, in queries]
+            before = time_per_call(lambda center: filtered(center, radius, days), queries)
+            after = time_per_call(lambda center: indexed(center, radius, days), queries)
+            print(f"{radius:>7} {days:>5} {before * 1e6:>12.1f} {after * 1e6:>18.1f} {np.mean(found):>6.0f}")
+
+def traced_megabytes(build):
+    """Build an object and return it with the Python heap growth it caused in MB"""
+    tracemalloc.start()
+    result = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, used / 1e6
+
+def bench_incident_memory(model_dir="models", synthetic_rows=1000000):
+    """Memory held by list-of-dicts incidents versus the columnar incident store"""
+    print(f"{'dataset':>22} {'rows':>9} {'dicts (MB)':>11} {'columns (MB)':>13} {'ratio':>6}")
+
+    datasets = [
+        ('shipped crimes', CRIME_SCHEMA, lambda: joblib.load(f"{model_dir}/walksafe_crime_data.pkl")),
+        ('shipped accidents', ACCIDENT_SCHEMA, lambda: joblib.load(f"{model_dir}/walksafe_accident_data.pkl")),
+        ('synthetic crimes', CRIME_SCHEMA, lambda: make_synthetic_crimes(synthetic_rows, synthetic_bounds(synthetic_rows)))
+    ]
+
+    for name, schema, load_records in datasets:
+        records, records_mb = traced_megabytes(load_records)
+        if not isinstance(records, list):
+            records = list(IncidentStore.from_saved(schema, records))
+            records, records_mb = traced_megabytes(lambda: [dict(record) for record in records])
+        store, store_mb = traced_megabytes(lambda: IncidentStore.from_records(schema, records))
+        print(f"{name:>22} {len(store):>9} {records_mb:>11.2f} {store_mb:>13.2f} {records_mb / store_mb:>6.1f}")
+        del records, store
+
+def load_shipped_model(model_dir="models"):
+    """Load the model shipped in model_dir"""
+    walksafe = WalkSafeModel()
+    if not walksafe.load_model(model_dir):
+        raise SystemExit(f"Could not load model from {model_dir}")
+    return walksafe
+
+def random_points(n, bounds=DELRAY_BOUNDS, seed=11):
+    """Generate n random {'lat', 'lon'} points inside bounds"""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(bounds['south'], bounds['north'], n)
+    lons = rng.uniform(bounds['west'], bounds['east'], n)
+    return [{'lat': float(lat), 'lon': float(lon)} for lat, lon in zip(lats, lons)]
+
+def bench_predict_batch(sizes=(1, 10, 100, 1000)):
+    """Per-point exact predict_safety calls versus one exact predict_safety_batch call"""
+    walksafe = load_shipped_model()
+    print(f"{'points':>7} {'per-point (ms)':>15} {'batch (ms)':>11} {'speedup':>8}")
+
+    for n in sizes:
+        points = random_points(n)
+        start = time.perf_counter()
+        for point in points:
+            walksafe.predict_safety(point['lat'], point['lon'], 21, 5, exact=True)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        walksafe.predict_safety_batch(points, 21, 5, exact=True)
+        batch = time.perf_counter() - start
+        print(f"{n:>7} {single * 1000:>15.2f} {batch * 1000:>11.2f} {single / batch:>8.1f}")
+
+def bench_safety_raster(n_lookups=100000):
+    """Safety raster build cost, memory and lookup latency against exact predictions"""
+    walksafe = load_shipped_model()
+    raster = walksafe.safety_raster
+
+    start = time.perf_counter()
+    walksafe.build_safety_raster(walksafe.raster_step)
+    build_time = time.perf_counter() - start
+    print(f"grid: {raster.rows}x{raster.cols} nodes x {raster.scores.shape[0] * raster.scores.shape[1]} time/day levels")
+    print(f"build: {build_time:.2f} s, memory: {raster.nbytes() / 1e6:.2f} MB "
+          f"(scores {raster.scores.nbytes / 1e6:.2f} MB, stats {(raster.nbytes() - raster.scores.nbytes) / 1e6:.2f} MB)")
+
+    points = random_points(n_lookups)
+    lats = np.array([point['lat'] for point in points])
+    lons = np.array([point['lon'] for point in points])
+    start = time.perf_counter()
+    raster.interpolate(lats, lons, 2, 1)
+    lookup = (time.perf_counter() - start) / n_lookups
+    print(f"raster.interpolate: {lookup * 1e6:.3f} us per point")
+
+    sample = points[:500]
+    start = time.perf_counter()
+    for point in sample:
+        walksafe.predict_safety(point['lat'], point['lon'], 23, 5, exact=False)
+    raster_predict = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    exact = [walksafe.predict_safety(point['lat'], point['lon'], 23, 5) for point in sample]
+    exact_predict = (time.perf_counter() - start) / len(sample)
+    print(f"predict_safety: {raster_predict * 1e6:.1f} us from raster, {exact_predict * 1e6:.1f} us exact")
+
+    approx = walksafe.predict_safety_batch(sample, 23, 5, exact=False)
+    errors = np.abs([a['safety_score'] - e['safety_score'] for a, e in zip(approx, exact)])
+    print(f"interpolation error: mean {errors.mean():.4f}, p95 {np.percentile(errors, 95):.4f}, max {errors.max():.4f}")
+
+def bench_tiles(zoom=15):
+    """Heatmap tile latency: pyramid build, uncached tile encode and cached lookup"""
+    walksafe = load_shipped_model()
+    start = time.perf_counter()
+    pyramid = walksafe.get_tile_pyramid(2, 1)
+    print(f"pyramid build: {(time.perf_counter() - start) * 1000:.1f} ms, {pyramid.nbytes() / 1e6:.2f} MB per time/day level")
+
+    grid, x0, y0 = pyramid.levels[zoom]
+    keys = [(zoom, x, y) for x in range(x0 // tiles.TILE_SIZE, (x0 + grid.shape[1]) // tiles.TILE_SIZE + 1)
+            for y in range(y0 // tiles.TILE_SIZE, (y0 + grid.shape[0]) // tiles.TILE_SIZE + 1)]
+
+    memory = LRUCache(max_entries=len(keys))
+    disk = DiskCache(tempfile.mkdtemp(prefix="walksafe_tiles_"))
+    start = time.perf_counter()
+    for key in keys:
+        tile = json.dumps(walksafe.get_safety_tile(*key, 2, 1)).encode()
+        memory.put(key, tile)
+        disk.put(key, tile)
+    uncached = (time.perf_counter() - start) / len(keys)
+
+    start = time.perf_counter()
+    for key in keys:
+        disk.get(key)
+    from_disk = (time.perf_counter() - start) / len(keys)
+
+    start = time.perf_counter()
+    for key in keys:
+        memory.get(key)
+    from_memory = (time.perf_counter() - start) / len(keys)
+    print(f"zoom {zoom}, {len(keys)} tiles: uncached {uncached * 1000:.3f} ms, "
+          f"disk {from_disk * 1000:.3f} ms, memory {from_memory * 1e6:.2f} us per tile")
+
+def bench_danger_zones(repeats=200):
+    """Per-request danger zone scan (the previous implementation) versus the materialized grid"""
+    walksafe = load_shipped_model()
+    bounds = DANGER_ZONE_BOUNDS
+
+    # Previous implementation: one exact predict_safety call per covered grid point
+    start = time.perf_counter()
+    grid = walksafe.get_coverage_grid(bounds['north'], bounds['south'], bounds['east'], bounds['west'], DANGER_ZONE_RESOLUTION)
+    zones = [p for p in (walksafe.predict_safety(lat, lon, exact=True) for lat, lon in grid) if p['safety_score'] < 0.4]
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    walksafe.build_danger_grid()
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        walksafe.get_danger_zones()
+    read = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    walksafe.refresh_danger_grid_near(26.4615, -80.0728)
+    refresh = time.perf_counter() - start
+
+    print(f"{len(grid)} grid points, {len(zones)} danger zones")
+    print(f"per-request scan: {scan * 1000:.1f} ms")
+    print(f"materialized: build {build * 1000:.1f} ms (all time/day levels), read {read * 1e6:.1f} us, "
+          f"report refresh {refresh * 1000:.2f} ms")
+
+def bench_nearby_alerts(sizes=(1000, 10000, 100000, 300000), limit=50, n_queries=50):
+    """Nearby alert latency: scanning every report and sorting all alerts versus the report grid and top-k"""
+    walksafe = load_shipped_model()
+    rng = np.random.default_rng(9)
+    centers = random_points(n_queries, seed=13)
+    print(f"{'reports':>8} {'scan + sort (ms)':>17} {f'indexed top-{limit} (ms)':>20} {'alerts in radius':>17}")
+
+    def scan_and_sort(lat, lon, radius=0.5):
+        # The previous implementation: distances to every report, then every alert built and sorted
+        center = {'lat': lat, 'lon': lon}
+        alerts = []
+        positions, distances = walksafe.find_incidents_in_radius(walksafe.incident_reports, center, radius)
+        for i, distance in zip(positions, distances):
+            report = walksafe.incident_reports[i]
+            alerts.append({'lat': report['lat'], 'lon': report['lon'], 'alert_type': report['incident_type'],
+                           'severity': report['severity'], 'distance': float(distance),
+                           'description': report.get('description'), 'timestamp': report.get('timestamp')})
+        return sorted(alerts, key=lambda alert: alert['severity'], reverse=True)
+
+    total = 0
+    for n in sizes:
+        # Add reports straight to the report grid; rescoring the raster is not what is measured here
+        for point in random_points(n - total, seed=n):
+            report = {**point, 'incident_type': 'theft', 'severity': float(rng.uniform(0.1, 1.0)),
+                      'description': None, 'timestamp': '2026-01-01T12:00:00'}
+            walksafe.incident_reports.append(report)
+            walksafe.report_grid.add(report['lat'], report['lon'], report['severity'], report)
+        total = n
+
+        for center in centers[:5]:
+            walksafe.get_nearby_alerts(center['lat'], center['lon'], limit=limit)
+        scan = time_per_call(scan_and_sort, [(c['lat'], c['lon']) for c in centers[:10]])
+        indexed = time_per_call(lambda lat, lon: walksafe.get_nearby_alerts(lat, lon, limit=limit),
+                                [(c['lat'], c['lon']) for c in centers])
+        in_radius = np.mean([len(scan_and_sort(c['lat'], c['lon'])) for c in centers[:5]])
+        print(f"{n:>8} {scan * 1000:>17.2f} {indexed * 1000:>20.2f} {in_radius:>17.0f}")
+
+def bench_alert_fanout(subscriber_counts=(10000, 50000), n_reports=500, radius=0.5):
+    """Report fan-out to streaming subscribers: grid subscription index versus checking every subscriber"""
+    import asyncio
+    from alert_stream import AlertHub
+
+    async def run(n):
+        hub = AlertHub(queue_size=1000)
+        subscribers = [hub.subscribe(point['lat'], point['lon'], radius) for point in random_points(n, seed=21)]
+        latencies = []
+
+        async def consume(subscriber):
+            while True:
+                alert = await subscriber.queue.get()
+                latencies.append(time.perf_counter() - alert['timestamp'])
+
+        consumers = [asyncio.create_task(consume(subscriber)) for subscriber in subscribers]
+        await asyncio.sleep(0)
+        reports = [{**point, 'incident_type': 'theft', 'severity': 0.5} for point in random_points(n_reports, seed=22)]
+
+        indexed = 0.0
+        for report in reports:
+            # Alerts carry the report timestamp, here the send time
+            start = report['timestamp'] = time.perf_counter()
+            hub.publish(report)
+            indexed += time.perf_counter() - start
+            # Let the woken consumers run before the next report, as a server would between requests
+            await asyncio.sleep(0)
+
+        # Checking every subscriber's circle, as a hub without the index would
+        scan = 0.0
+        for report in reports[:20]:
+            start = time.perf_counter()
+            [subscriber for subscriber in subscribers
+             if geo.calculate_distance(subscriber.lat, subscriber.lon, report['lat'], report['lon']) <= subscriber.radius]
+            scan += time.perf_counter() - start
+
+        for consumer in consumers:
+            consumer.cancel()
+        latencies = np.array(latencies) * 1000
+        print(f"{n:>11} {hub.delivered / n_reports:>15.1f} {scan / 20 * 1000:>10.2f} {indexed / n_reports * 1000:>13.3f} "
+              f"{np.percentile(latencies, 50):>14.2f} {np.percentile(latencies, 99):>14.2f}")
+
+    # scan only finds the recipients; indexed also queues their alerts
+    print(f"{'subscribers':>11} {'recipients/rep':>15} {'scan (ms)':>10} {'indexed (ms)':>13} "
+          f"{'deliver p50 ms':>14} {'deliver p99 ms':>14}")
+    for n in subscriber_counts:
+        asyncio.run(run(n))
+
+def bench_locations(n_users=100000, batch_sizes=(100, 1000), n_updates=200000, n_friends=200, radius=1.0):
+    """Friend position ingestion: store and POST /locations updates per second, and friend lookups"""
+    import asyncio
+    import httpx
+    import server
+    from locations import LocationStore
+
+    rng = np.random.default_rng(23)
+    lats = rng.uniform(26.42, 26.48, n_updates).tolist()
+    lons = rng.uniform(-80.12, -80.05, n_updates).tolist()
+    users = [f"user-{i}" for i in rng.integers(0, n_users, n_updates)]
+    updates = [{'user_id': user, 'lat': lat, 'lon': lon, 'timestamp': None} for user, lat, lon in zip(users, lats, lons)]
+
+    print(f"{'batch':>6} {'store updates/s':>16} {'HTTP updates/s':>15}")
+    for batch_size in batch_sizes:
+        store = LocationStore()
+        start = time.perf_counter()
+        for i in range(0, n_updates, batch_size):
+            store.update_many(updates[i:i + batch_size])
+        store_rate = n_updates / (time.perf_counter() - start)
+
+        async def post_all(n_posts):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                start = time.perf_counter()
+                for i in range(0, n_posts * batch_size, batch_size):
+                    response = await client.post("/locations", json={'updates': updates[i:i + batch_size]})
+                    response.raise_for_status()
+                return n_posts * batch_size / (time.perf_counter() - start)
+
+        server.location_store = LocationStore()
+        http_rate = asyncio.run(post_all(min(n_updates // batch_size, 20000 // batch_size)))
+        print(f"{batch_size:>6} {store_rate:>16.0f} {http_rate:>15.0f}")
+
+    # Friend lookups against the store filled by the last run
+    store = server.location_store
+    store.update_many(updates)
+    friends = [f"user-{i}" for i in rng.choice(n_users, n_friends, replace=False)]
+    friend_set = set(friends)
+    repeats = 200
+    start = time.perf_counter()
+    for _ in range(repeats):
+        store.get_many(friends)
+    get_ms = (time.perf_counter() - start) / repeats * 1000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        nearby = store.near(26.45, -80.08, radius, friend_set)
+    near_ms = (time.perf_counter() - start) / repeats * 1000
+    print(f"{len(store)} tracked users, {n_friends} friends: get {get_ms:.3f} ms, "
+          f"within {radius} mi {near_ms:.3f} ms ({len(nearby)} found)")
+
+    if not server.walksafe_model.load_model():
+        raise SystemExit("Could not load model")
+
+    async def lookup(body, repeats=50):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.post("/friends/locations", json=body)).raise_for_status()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                response = await client.post("/friends/locations", json=body)
+            return (time.perf_counter() - start) / repeats * 1000, response.json()['total_friends']
+
+    for label, body in (('all friends', {'friend_ids': friends}),
+                        ('friends nearby', {'friend_ids': friends, 'lat': 26.45, 'lon': -80.08, 'radius': radius})):
+        elapsed, found = asyncio.run(lookup(body))
+        print(f"POST /friends/locations ({label}): {elapsed:.2f} ms for {found} scored friends")
+
+def densify(coordinates, spacing=0.00005):
+    """Insert waypoints every spacing degrees along a route, as a GPS-traced polyline would have"""
+    lats, lons = [coordinates[0]['lat']], [coordinates[0]['lon']]
+    for a, b in zip(coordinates, coordinates[1:]):
+        steps = max(int(math.hypot(b['lat'] - a['lat'], b['lon'] - a['lon']) / spacing), 1)
+        fractions = np.arange(1, steps + 1) / steps
+        lats.extend(a['lat'] + (b['lat'] - a['lat']) * fractions)
+        lons.extend(a['lon'] + (b['lon'] - a['lon']) * fractions)
+    return [{'lat': float(lat), 'lon': float(lon)} for lat, lon in zip(lats, lons)]
+
+def bench_compare_routes(candidate_counts=(3, 10, 30), repeats=5):
+    """One /compare-routes pass versus an analyze_route call per candidate, on overlapping alternatives"""
+    walksafe = load_shipped_model()
+    start, end = {'lat': 26.4450, 'lon': -80.1050}, {'lat': 26.4700, 'lon': -80.0700}
+
+    # Alternatives between the same endpoints share their first and last stretches
+    rng = np.random.default_rng(25)
+    candidates = []
+    while len(candidates) < max(candidate_counts):
+        via = {'lat': float(rng.uniform(26.448, 26.467)), 'lon': float(rng.uniform(-80.10, -80.075))}
+        first = walksafe.find_safe_route(start, via, float(rng.uniform(0, 5)))['coordinates']
+        second = walksafe.find_safe_route(via, end, float(rng.uniform(0, 5)))['coordinates']
+        candidates.append(densify(first + second[1:]))
+
+    def timed(func, cold):
+        best = math.inf
+        for _ in range(repeats):
+            if cold:
+                walksafe.prediction_cache.clear()
+            begin = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - begin)
+        return best * 1000, result
+
+    print(f"{'routes':>6} {'waypoints':>9} {'cells':>6} {'cache':>5} {'per route (ms)':>14} {'compare (ms)':>12}")
+    for count in candidate_counts:
+        routes = candidates[:count]
+        for cold in (True, False):
+            separate_ms, _ = timed(lambda: [walksafe.analyze_route(route) for route in routes], cold)
+            compare_ms, compared = timed(lambda: walksafe.compare_routes(routes), cold)
+            print(f"{count:>6} {compared['total_points']:>9} {compared['unique_cells']:>6} {'cold' if cold else 'warm':>5} "
+                  f"{separate_ms:>14.1f} {compare_ms:>12.1f}")
+
+def bench_safe_route(weights=(0.0, 2.0, 5.0), spans=(0.5, 2.0, 5.0), n_routes=30):
+    """/safe-route search latency by trip length and safety weight"""
+    import routing
+
+    walksafe = WalkSafeModel()
+    if not walksafe.load_model():
+        raise SystemExit("Could not load model")
+    raster = walksafe.safety_raster
+    time_level, day_level = walksafe.get_risk_levels(21, 5)
+    rng = np.random.default_rng(24)
+
+    print(f"{'trip (mi)':>9} {'weight':>6} {'search (ms)':>11} {'full route (ms)':>15} "
+          f"{'distance (mi)':>13} {'mean safety':>11}")
+    for span in spans:
+        # Random endpoints about span miles apart, inside the raster
+        pairs = []
+        while len(pairs) < n_routes:
+            lat, lon = rng.uniform(26.41, 26.49), rng.uniform(-80.14, -80.01)
+            angle = rng.uniform(0, 2 * math.pi)
+            end_lat = lat + span * math.sin(angle) / 69.1
+            end_lon = lon + span * math.cos(angle) / (69.1 * math.cos(math.radians(lat)))
+            if raster.contains(end_lat, end_lon):
+                pairs.append(({'lat': lat, 'lon': lon}, {'lat': end_lat, 'lon': end_lon}))
+
+        for weight in weights:
+            search = time_per_call(lambda start, end: routing.find_path(
+                raster, start['lat'], start['lon'], end['lat'], end['lon'], time_level, day_level, weight), pairs)
+            routes = [walksafe.find_safe_route(start, end, weight, time_of_day=21, day_of_week=5) for start, end in pairs]
+            full = time_per_call(lambda start, end: walksafe.find_safe_route(
+                start, end, weight, time_of_day=21, day_of_week=5), pairs)
+
+            distance = np.mean([route['distance'] for route in routes])
+            safety = np.mean([route['analysis']['overall_safety'] for route in routes])
+            print(f"{span:>9} {weight:>6} {search * 1000:>11.2f} {full * 1000:>15.2f} "
+                  f"{distance:>13.2f} {safety:>11.3f}")
+
+def bench_training(resolutions=(50, 200, 500, 1000), synthetic_rows=1000000, sample_points=10):
+    """Training label generation: per-point iterrows scan versus banded row sweeps, and model fit time"""
+    import logging
+    import pandas as pd
+    import train_model
+
+    train_model.logger.setLevel(logging.WARNING)
+    accidents, crimes = train_model.preprocess_data(train_model.load_and_prepare_data("data.csv"))
+
+    # The previous implementation: two iterrows() passes with a scalar haversine per point
+    def scan_features(lat, lon, radius=0.3):
+        nearby_crimes = [crime for _, crime in crimes.iterrows()
+                         if geo.calculate_distance(lat, lon, crime['lat'], crime['lon']) <= radius]
+        nearby_accidents = [accident for _, accident in accidents.iterrows()
+                            if geo.calculate_distance(lat, lon, accident['lat'], accident['lon']) <= radius]
+        return len(nearby_crimes), len(nearby_accidents)
+
+    labels = train_model.create_safety_labels(accidents, crimes, 50, n_jobs=1)
+    sample = np.random.default_rng(26).choice(len(labels), sample_points, replace=False)
+    start = time.perf_counter()
+    for i in sample:
+        scan_features(labels['lat'][i], labels['lon'][i])
+    per_point = (time.perf_counter() - start) / sample_points
+    print(f"shipped data ({len(crimes)} crimes, {len(accidents)} accidents): iterrows scan {per_point:.2f} s/point "
+          f"(~{per_point * 2500 / 60:.0f} min for 50x50)")
+
+    rng = np.random.default_rng(27)
+    bounds = {'north': 26.52, 'south': 26.40, 'east': -80.03, 'west': -80.12}
+    def synthetic(n):
+        return pd.DataFrame({
+            'lat': rng.uniform(bounds['south'], bounds['north'], n),
+            'lon': rng.uniform(bounds['west'], bounds['east'], n),
+            'severity': rng.uniform(0.1, 1.0, n)
+        })
+    synthetic_crimes = synthetic(synthetic_rows).assign(
+        crime_type=np.array(['theft', 'burglary', 'violent', 'vandalism', 'other'])[rng.integers(0, 5, synthetic_rows)])
+    synthetic_accidents = synthetic(synthetic_rows).assign(
+        pedestrian_involved=rng.random(synthetic_rows) < 0.2, intersection=rng.random(synthetic_rows) < 0.4)
+
+    print(f"{'dataset':>9} {'grid':>9} {'labels (s)':>11} {'fit (s)':>8}")
+    for name, (accident_rows, crime_rows) in (('shipped', (accidents, crimes)),
+                                              (f'{synthetic_rows // 1000000}M+{synthetic_rows // 1000000}M',
+                                               (synthetic_accidents, synthetic_crimes))):
+        for resolution in resolutions:
+            start = time.perf_counter()
+            labels = train_model.create_safety_labels(accident_rows, crime_rows, resolution)
+            label_time = time.perf_counter() - start
+            start = time.perf_counter()
+            train_model.train_model(labels)
+            print(f"{name:>9} {f'{resolution}x{resolution}':>9} {label_time:>11.2f} {time.perf_counter() - start:>8.2f}")
+
+def bench_executor(n_predicts=50, heatmap_clients=2, interval=0.05):
+    """p50/p99 /predict latency while other clients keep requesting exact-path heatmaps"""
+    import asyncio
+    import httpx
+    import server
+    from executor import ModelExecutor
+
+    walksafe = server.walksafe_model
+    if not walksafe.load_model():
+        raise SystemExit("Could not load model")
+    # Force the full model path so heatmaps are genuinely CPU-heavy
+    walksafe.safety_raster = None
+    walksafe.cache_cell_size = None
+
+    async def run(kind):
+        server.model_executor = ModelExecutor(walksafe, kind=kind)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            done = asyncio.Event()
+
+            async def heatmap_load():
+                while not done.is_set():
+                    await client.get("/heatmap", params={'resolution': 50})
+                    # The in-process transport never waits on a socket, so yield explicitly
+                    await asyncio.sleep(0)
+
+            load = [asyncio.create_task(heatmap_load()) for _ in range(heatmap_clients)]
+            await asyncio.sleep(0.1)
+
+            # Predicts arrive on a fixed schedule; latency counts from the scheduled
+            # arrival so time spent waiting for a blocked event loop is included
+            latencies = []
+            first_arrival = time.perf_counter()
+            for i, point in enumerate(random_points(n_predicts)):
+                arrival = first_arrival + i * interval
+                await asyncio.sleep(max(arrival - time.perf_counter(), 0))
+                await client.post("/predict", json=point)
+                latencies.append(time.perf_counter() - arrival)
+
+            done.set()
+            await asyncio.gather(*load)
+        server.model_executor.shutdown()
+        return np.array(latencies) * 1000
+
+    print(f"{'executor':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9}")
+    for kind in ('inline', 'thread'):
+        latencies = asyncio.run(run(kind))
+        print(f"{kind:>9} {np.percentile(latencies, 50):>9.1f} {np.percentile(latencies, 99):>9.1f} {latencies.max():>9.1f}")
+
+def memory_kilobytes(pid):
+    """Read RSS, PSS and private (unshared) memory of a process from /proc in kB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+def child_pids(pid):
+    """Get the pids of a process's direct children"""
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def bench_prefork(worker_counts=(1, 2, 4), duration=10.0, clients=8, port=8765):
+    """Per-worker memory and /predict throughput under gunicorn, with and without preload"""
+    import httpx
+    from concurrent.futures import ThreadPoolExecutor
+
+    def predict_load(url, deadline, seed):
+        count = 0
+        with httpx.Client(base_url=url) as client:
+            for point in random_points(100000, seed=seed):
+                if time.perf_counter() >= deadline:
+                    return count
+                client.post("/predict", json=point)
+                count += 1
+        return count
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'preload':>8} {'workers':>8} {'RSS/worker (MB)':>16} {'PSS/worker (MB)':>16} "
+          f"{'private/worker (MB)':>20} {'req/s':>8}")
+    for preload in ('1', '0'):
+        for workers in worker_counts:
+            env = dict(os.environ, WALKSAFE_PRELOAD=preload, WALKSAFE_WORKERS=str(workers),
+                       WALKSAFE_BIND=f"127.0.0.1:{port}")
+            master = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "server:app"], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            url = f"http://127.0.0.1:{port}"
+            try:
+                # Wait until every worker has finished starting up
+                while True:
+                    try:
+                        if (httpx.get(f"{url}/health").status_code == 200 and
+                                len(child_pids(master.pid)) == workers):
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.5)
+                time.sleep(2.0 * workers)
+
+                deadline = time.perf_counter() + duration
+                with ThreadPoolExecutor(clients) as pool:
+                    total = sum(pool.map(lambda seed: predict_load(url, deadline, seed), range(clients)))
+
+                memory = np.array([memory_kilobytes(pid) for pid in child_pids(master.pid)]) / 1024
+                rss, pss, private = memory.mean(axis=0)
+                print(f"{'on' if preload == '1' else 'off':>8} {workers:>8} {rss:>16.1f} {pss:>16.1f} "
+                      f"{private:>20.1f} {total / duration:>8.0f}")
+            finally:
+                master.terminate()
+                master.wait()
+
+# Run in a fresh interpreter: import, load and answer one prediction
+FIRST_PREDICTION_SCRIPT = """
+import logging, sys, time
+logging.disable(logging.CRITICAL)
+from model import WalkSafeModel
+walksafe = WalkSafeModel()
+walksafe.load_model(sys.argv[1])
+walksafe.predict_safety(26.4615, -80.0728, 21, 5)
+"""
+
+def bench_cold_start(model_dir="models", repeats=3):
+    """Time to first prediction in a new process from legacy pickles versus an artifact bundle"""
+    import bundle
+
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        bundle.convert_legacy(model_dir, bundle_dir)
+        print(f"{'source':>8} {'first prediction (s)':>21}")
+        for name, directory in (('legacy', model_dir), ('bundle', bundle_dir)):
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                subprocess.run(["python", "-c", FIRST_PREDICTION_SCRIPT, directory], check=True)
+                times.append(time.perf_counter() - start)
+            print(f"{name:>8} {min(times):>21.2f}")
+
+def bench_forest(sizes=(1, 10, 100, 1000, 10000, 100000)):
+    """Flattened forest versus sklearn scale+predict latency by batch size"""
+    from forest import FlatForest
+
+    model = joblib.load("models/walksafe_model.pkl")
+    scaler = joblib.load("models/walksafe_scaler.pkl")
+    start = time.perf_counter()
+    flat_forest = FlatForest.from_sklearn(model, scaler)
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f} ms, {len(flat_forest.roots)} trees, "
+          f"{len(flat_forest.value)} nodes, depth {flat_forest.depth}, {flat_forest.nbytes() / 1e3:.1f} kB")
+
+    print(f"{'rows':>7} {'sklearn (ms)':>13} {'flat (ms)':>10} {'speedup':>8}")
+    rng = np.random.default_rng(5)
+    for n in sizes:
+        X = scaler.mean_ + rng.normal(size=(n, len(scaler.mean_))) * scaler.scale_
+        repeats = max(1, min(200, 20000 // n))
+        sklearn_time = time_per_call(lambda: model.predict(scaler.transform(X)), [()] * max(1, repeats // 10))
+        flat_time = time_per_call(lambda: flat_forest.predict(X), [()] * repeats)
+        print(f"{n:>7} {sklearn_time * 1000:>13.3f} {flat_time * 1000:>10.3f} {sklearn_time / flat_time:>8.1f}")
+
+def bench_report_update(n_reports=500):
+    """Per-report incremental update cost versus rebuilding the raster, tiles and danger grid"""
+    walksafe = load_shipped_model()
+    walksafe.warm_up()
+    raster = walksafe.safety_raster
+    # Build a tile pyramid so each report also refreshes its tiles
+    walksafe.get_tile_pyramid(2, 1)
+    incident_types = ['assault', 'theft', 'accident', 'near_miss', 'vandalism']
+    reports = [{**point, 'incident_type': incident_types[i % len(incident_types)], 'severity': 0.7}
+               for i, point in enumerate(random_points(n_reports, seed=5))]
+
+    raster.make_writable()
+    saved_stats = {name: values.copy() for name, values in raster.stats.items()}
+    stats_time = 0.0
+    for report in reports[:100]:
+        contributions = walksafe.report_contributions(report)
+        start = time.perf_counter()
+        raster.add(report['lat'], report['lon'], contributions, FEATURE_RADIUS)
+        stats_time += time.perf_counter() - start
+    # Undo the stat-only adds so the raster matches its scores again
+    raster.stats = saved_stats
+
+    start = time.perf_counter()
+    for report in reports:
+        walksafe.add_incident_report(report)
+    update = (time.perf_counter() - start) / n_reports
+
+    # A rebuild from the trained stores alone, for cost
+    start = time.perf_counter()
+    rebuilt = walksafe.build_safety_raster(raster.step)
+    tiles.TilePyramid(rebuilt, 2, 1, walksafe.delray_center)
+    walksafe.build_danger_grid()
+    rebuild = time.perf_counter() - start
+
+    print(f"stats only: {stats_time / 100 * 1e6:.1f} us per report")
+    print(f"incremental (stats, rescore, tiles, danger grid): {update * 1000:.2f} ms per report")
+    print(f"full rebuild: {rebuild * 1000:.0f} ms ({rebuild / update:.0f}x one report)")
+
+def sample_report(i):
+    """Build a logged user report like the ones /report saves"""
+    return {'lat': 26.4615 + (i % 1000) * 1e-5, 'lon': -80.0728 - (i % 700) * 1e-5, 'incident_type': 'theft',
+            'severity': 0.5, 'description': None, 'user_id': f"user{i % 5000}", 'timestamp': '2026-01-01T12:00:00'}
+
+def bench_report_log(n_reports=5000, clients=64, recovery_records=1000000):
+    """Sustained report log throughput with and without group commit, and recovery time"""
+    from concurrent.futures import ThreadPoolExecutor
+    from report_log import ReportLog
+
+    print(f"{'commit':>8} {'reports/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'avg batch':>10}")
+    for label, options in (('per-item', {'commit_interval': 0, 'max_batch': 1}), ('group', {})):
+        log = ReportLog(tempfile.mkdtemp(prefix="walksafe_reports_"), **options)
+        log.recover()
+
+        def submit(i):
+            start = time.perf_counter()
+            log.append(sample_report(i)).result()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = np.array(list(pool.map(submit, range(n_reports))))
+        elapsed = time.perf_counter() - start
+        stats = log.stats()
+        log.close()
+        print(f"{label:>8} {n_reports / elapsed:>10.0f} {np.percentile(latencies, 50) * 1000:>9.2f} "
+              f"{np.percentile(latencies, 99) * 1000:>9.2f} {stats['average_batch']:>10.1f}")
+
+    directory = tempfile.mkdtemp(prefix="walksafe_reports_")
+    log = ReportLog(directory, max_batch=10000, snapshot_every=recovery_records + 1)
+    log.recover()
+    futures = [log.append(sample_report(i)) for i in range(recovery_records)]
+    futures[-1].result()
+    log.close()
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    start = time.perf_counter()
+    log = ReportLog(directory, snapshot_every=recovery_records + 1)
+    recovered = len(log.recover())
+    from_log = time.perf_counter() - start
+    log.start_snapshot()
+    log.close()
+    snapshot_size = os.path.getsize(os.path.join(directory, "snapshot.json"))
+
+    start = time.perf_counter()
+    log = ReportLog(directory)
+    log.recover()
+    from_snapshot = time.perf_counter() - start
+    log.close()
+    print(f"recovery of {recovered} reports: {from_log:.2f} s from the log ({size / 1e6:.0f} MB), "
+          f"{from_snapshot:.2f} s from a snapshot ({snapshot_size / 1e6:.0f} MB)")
+
+def bench_statistics(sizes=(1000, 100000, 1000000), repeats=20):
+    """/stats cost with a full rescan of incidents and reports versus counters and the report timeline"""
+    from datetime import datetime, timedelta
+    walksafe = load_shipped_model()
+    print(f"{'reports':>8} {'rescan (ms)':>12} {'counters (ms)':>14} {'this week':>10}")
+
+    for n in sizes:
+        # Reports spread over the last 30 days, added to the timeline without rescoring the raster
+        now = datetime.now()
+        walksafe.incident_reports = [{'timestamp': (now - timedelta(seconds=30 * 86400 * (n - i) / n)).isoformat()}
+                                     for i in range(n)]
+        walksafe.report_timeline.clear()
+        for report in walksafe.incident_reports:
+            walksafe.report_timeline.add(report['timestamp'])
+
+        start = time.perf_counter()
+        for _ in range(max(repeats // 10, 1)):
+            np.count_nonzero(walksafe.crime_data.column('severity') > np.float32(0.7))
+            np.count_nonzero(walksafe.accident_data.column('pedestrian_involved'))
+            rescanned = len([r for r in walksafe.incident_reports
+                             if datetime.fromisoformat(r['timestamp']) > datetime.now() - timedelta(days=7)])
+        rescan = (time.perf_counter() - start) / max(repeats // 10, 1)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            walksafe.get_statistics()
+        counters = (time.perf_counter() - start) / repeats
+        print(f"{n:>8} {rescan * 1000:>12.2f} {counters * 1000:>14.3f} {rescanned:>10}")
+
+BENCHMARKS = {
+    'alert-fanout': bench_alert_fanout,
+    'spatial-index': bench_spatial_index,
+    'sqlite-store': bench_sqlite_store,
+    'incident-memory': bench_incident_memory,
+    'locations': bench_locations,
+    'nearby-alerts': bench_nearby_alerts,
+    'predict-batch': bench_predict_batch,
+    'recent-incidents': bench_recent_incidents,
+    'safe-route': bench_safe_route,
+    'safety-raster': bench_safety_raster,
+    'statistics': bench_statistics,
+    'danger-zones': bench_danger_zones,
+    'cold-start': bench_cold_start,
+    'compare-routes': bench_compare_routes,
+    'executor': bench_executor,
+    'forest': bench_forest,
+    'prefork': bench_prefork,
+    'report-log': bench_report_log,
+    'report-update': bench_report_update,
+    'tiles': bench_tiles,
+    'training': bench_training,
+}
+
+def main():
+    """Run the selected benchmarks"""
+    parser = argparse.ArgumentParser(description="WalkSafe+ performance benchmarks")
+    parser.add_argument('benchmarks', nargs='*', choices=sorted(BENCHMARKS), help="Benchmarks to run (default: all)")
+    args = parser.parse_args()
+
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        print(f"\n== {name} ==")
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
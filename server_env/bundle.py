@@ -0,0 +1,186 @@
+import json
+import os
+import shutil
+import sys
+import joblib
+import numpy as np
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA
+from safety_raster import SafetyRaster
+from forest import FlatForest
+
+# Bump when the bundle layout changes in a way older loaders cannot read
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+ESTIMATORS_NAME = "estimators.joblib"
+
+# Incident stores kept in a bundle, with their schemas
+INCIDENT_SCHEMAS = {'crime_data': CRIME_SCHEMA, 'accident_data': ACCIDENT_SCHEMA}
+
+def has_bundle(directory):
+    """Check whether a directory holds an artifact bundle"""
+    return os.path.exists(os.path.join(directory, MANIFEST_NAME))
+
+def artifact_fingerprint(directory):
+    """Get a value that changes whenever the model artifacts in a directory are rewritten
+
+    Bundles are keyed on the manifest alone, which save_bundle replaces last.
+    """
+    if has_bundle(directory):
+        names = [MANIFEST_NAME]
+    else:
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.pkl'))
+    fingerprint = []
+    for name in names:
+        stat = os.stat(os.path.join(directory, name))
+        fingerprint.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+def save_array(directory, name, array):
+    """Write an array as a .npy file and get its manifest entry"""
+    filename = f"{name}.npy"
+    np.save(os.path.join(directory, filename), np.ascontiguousarray(array))
+    return {'file': filename, 'dtype': str(array.dtype), 'shape': list(array.shape)}
+
+def load_array(directory, entry, mmap_mode):
+    """Load an array listed in the manifest, memory-mapped when mmap_mode is set"""
+    array = np.load(os.path.join(directory, entry['file']), mmap_mode=mmap_mode)
+    # A mismatch means the bundle was rewritten while it was being read
+    if str(array.dtype) != entry['dtype'] or list(array.shape) != entry['shape']:
+        raise ValueError(f"Bundle array {entry['file']} does not match its manifest entry")
+    return array
+
+def save_bundle(directory, components):
+    """Write model components as a versioned bundle: manifest, .npy arrays and estimators
+
+    components holds model, scaler, feature_importance, features_config, crime_data,
+    accident_data (IncidentStores), delray_center, metadata and optionally forest
+    (the compiled FlatForest) and safety_raster. Files are staged next to directory
+    and renamed into place with the manifest last, so a reader never sees a manifest
+    without its arrays.
+    """
+    staging = f"{directory.rstrip(os.sep)}.staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    joblib.dump({'model': components['model'], 'scaler': components['scaler']},
+                os.path.join(staging, ESTIMATORS_NAME))
+
+    manifest = {
+        'bundle_version': BUNDLE_VERSION,
+        'estimators': ESTIMATORS_NAME,
+        'metadata': components['metadata'],
+        'feature_importance': {name: float(value) for name, value in components['feature_importance'].items()},
+        'features_config': components['features_config'],
+        'delray_center': components['delray_center'],
+        'incidents': {},
+        'forest': None,
+        'safety_raster': None
+    }
+
+    forest = components.get('forest')
+    if forest is not None:
+        manifest['forest'] = {
+            'depth': forest.depth,
+            'arrays': {name: save_array(staging, f"forest.{name}", array) for name, array in forest.arrays().items()}
+        }
+
+    for store_name in INCIDENT_SCHEMAS:
+        store = components[store_name]
+        manifest['incidents'][store_name] = {
+            'columns': {name: save_array(staging, f"{store_name}.{name}", column)
+                        for name, column in store.to_saved()['columns'].items()},
+            'vocabularies': store.vocabularies
+        }
+
+    raster = components.get('safety_raster')
+    if raster is not None:
+        manifest['safety_raster'] = {
+            'bounds': raster.bounds,
+            'step': raster.step,
+            'recent_cutoff': raster.recent_cutoff,
+            'stats': {name: save_array(staging, f"raster.{name}", values) for name, values in raster.stats.items()},
+            'scores': save_array(staging, "raster.scores", raster.scores)
+        }
+
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Keep any files the bundle does not own (e.g. legacy pickles) in place, and
+    # move the manifest last so it never points at arrays that are not there yet
+    os.makedirs(directory, exist_ok=True)
+    for filename in sorted(os.listdir(staging), key=lambda name: name == MANIFEST_NAME):
+        os.replace(os.path.join(staging, filename), os.path.join(directory, filename))
+    os.rmdir(staging)
+    return manifest
+
+def load_bundle(directory, mmap_mode='r', load_estimators=False):
+    """Load the components of a bundle; arrays are memory-mapped unless mmap_mode is None
+
+    When the bundle has a compiled forest the sklearn estimators (and sklearn itself)
+    are only loaded if load_estimators is set.
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get('bundle_version') != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version: {manifest.get('bundle_version')}")
+
+    components = {
+        'model': None,
+        'scaler': None,
+        'forest': None,
+        'feature_importance': manifest['feature_importance'],
+        'features_config': manifest['features_config'],
+        'delray_center': manifest['delray_center'],
+        'metadata': manifest['metadata'],
+        'safety_raster': None
+    }
+
+    saved_forest = manifest.get('forest')
+    if saved_forest is not None:
+        arrays = {name: load_array(directory, entry, mmap_mode) for name, entry in saved_forest['arrays'].items()}
+        components['forest'] = FlatForest(depth=saved_forest['depth'], **arrays)
+    if saved_forest is None or load_estimators:
+        estimators = joblib.load(os.path.join(directory, manifest['estimators']))
+        components['model'] = estimators['model']
+        components['scaler'] = estimators['scaler']
+
+    for store_name, schema in INCIDENT_SCHEMAS.items():
+        saved = manifest['incidents'][store_name]
+        columns = {name: load_array(directory, entry, mmap_mode) for name, entry in saved['columns'].items()}
+        components[store_name] = IncidentStore(schema, columns, saved['vocabularies'])
+
+    saved_raster = manifest['safety_raster']
+    if saved_raster is not None:
+        raster = SafetyRaster(saved_raster['bounds'], saved_raster['step'])
+        raster.stats = {name: load_array(directory, entry, mmap_mode) for name, entry in saved_raster['stats'].items()}
+        raster.scores = load_array(directory, saved_raster['scores'], mmap_mode)
+        raster.recent_cutoff = saved_raster.get('recent_cutoff')
+        components['safety_raster'] = raster
+
+    return components
+
+def load_legacy(model_dir):
+    """Load the components of the legacy one-pickle-per-part model directory"""
+    return {
+        'model': joblib.load(f"{model_dir}/walksafe_model.pkl"),
+        'scaler': joblib.load(f"{model_dir}/walksafe_scaler.pkl"),
+        'feature_importance': joblib.load(f"{model_dir}/walksafe_feature_importance.pkl"),
+        'features_config': joblib.load(f"{model_dir}/walksafe_features_config.pkl"),
+        'crime_data': IncidentStore.from_saved(CRIME_SCHEMA, joblib.load(f"{model_dir}/walksafe_crime_data.pkl")),
+        'accident_data': IncidentStore.from_saved(ACCIDENT_SCHEMA, joblib.load(f"{model_dir}/walksafe_accident_data.pkl")),
+        'delray_center': joblib.load(f"{model_dir}/walksafe_delray_center.pkl"),
+        'metadata': joblib.load(f"{model_dir}/walksafe_metadata.pkl"),
+        'safety_raster': None
+    }
+
+def convert_legacy(model_dir, bundle_dir=None):
+    """Convert legacy pickles into a bundle (in place by default), precomputing the raster"""
+    from model import WalkSafeModel
+
+    walksafe = WalkSafeModel()
+    walksafe.use_components(load_legacy(model_dir))
+    return walksafe.save_bundle(bundle_dir or model_dir)
+
+if __name__ == "__main__":
+    # Usage: python bundle.py [legacy model dir] [bundle dir]
+    convert_legacy(*(sys.argv[1:] or ["models"]))
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional TTL and hit/miss/eviction counters"""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Get a cached value, or None on a miss or when the entry has expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Get cache size and counters"""
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class DiskCache:
+    """Directory of cached byte blobs with least-recently-used eviction by entry count"""
+
+    def __init__(self, directory, max_entries=20000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Rebuild the LRU order of files left by earlier runs from their access times
+        existing = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                existing.append((os.stat(path).st_atime, os.path.relpath(path, directory)))
+        self.entries = OrderedDict((path, None) for _, path in sorted(existing))
+
+    def path_for(self, key):
+        """Map a tuple key to a relative file path"""
+        return os.path.join(*[str(part) for part in key])
+
+    def get(self, key):
+        """Get cached bytes, or None on a miss"""
+        path = self.path_for(key)
+        with self.lock:
+            if path not in self.entries:
+                return None
+            self.entries.move_to_end(path)
+        try:
+            with open(os.path.join(self.directory, path), 'rb') as f:
+                return f.read()
+        except OSError:
+            with self.lock:
+                self.entries.pop(path, None)
+            return None
+
+    def put(self, key, data):
+        """Write bytes to the cache, evicting the least recently used files when full"""
+        path = self.path_for(key)
+        full_path = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        # Write to a temp file first so readers never see a partial tile
+        temp_path = f"{full_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, full_path)
+
+        with self.lock:
+            self.entries[path] = None
+            self.entries.move_to_end(path)
+            evicted = []
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False)[0])
+                self.evictions += 1
+
+        for old_path in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_path))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Get cache size and counters"""
+        with self.lock:
+            return {'size': len(self.entries), 'max_entries': self.max_entries, 'evictions': self.evictions}
@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from model import WalkSafeModel
+
+logger = logging.getLogger(__name__)
+
+# Default per-endpoint limits on concurrently running model calls
+DEFAULT_CONCURRENCY_LIMITS = {
+    'heatmap': 2,
+    'danger-zones': 2,
+    'predict-batch': 4,
+    'analyze-route': 4
+}
+
+# Endpoints a process worker can serve; it is sent the user reports it has not applied yet
+DEFAULT_PROCESS_ENDPOINTS = ('heatmap', 'predict-batch', 'analyze-route', 'tiles')
+
+# Model loaded by each process pool worker
+_worker_model = None
+
+class WorkerBehind:
+    """Returned by a process worker sent reports that start past the ones it has applied"""
+
+    def __init__(self, applied):
+        self.applied = applied
+
+def _init_worker(model_dir):
+    """Load a private model copy in a process pool worker"""
+    global _worker_model
+    _worker_model = WalkSafeModel()
+    if not _worker_model.load_model(model_dir):
+        logger.error(f"Worker {os.getpid()} failed to load model from {model_dir}")
+
+def _call_worker_model(method, args, kwargs, first_report=0, reports=()):
+    """Call a model method inside a process pool worker, first applying the reports it is missing
+
+    reports are the server's user reports from index first_report on.
+    """
+    applied = len(_worker_model.incident_reports)
+    if applied < first_report:
+        return WorkerBehind(applied)
+    missing = reports[applied - first_report:]
+    if missing:
+        _worker_model.add_replicated_reports(list(missing))
+    return getattr(_worker_model, method)(*args, **kwargs)
+
+def parse_limits(value):
+    """Parse 'endpoint=limit,...' into a dict"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, limit = item.split('=')
+        limits[endpoint.strip()] = int(limit)
+    return limits
+
+class ModelExecutor:
+    """Runs blocking model calls off the asyncio event loop
+
+    kind is 'thread' (a bounded thread pool sharing the server's model), 'process'
+    (a process pool for process_endpoints, each worker with its own model copy that
+    is sent the server model's new user reports with each call) or 'inline' (call
+    on the event loop).
+    Each endpoint can cap how many of its calls run at once; the rest wait their turn
+    without holding a worker.
+    """
+
+    def __init__(self, model, kind='thread', max_workers=4, limits=None,
+                 process_endpoints=DEFAULT_PROCESS_ENDPOINTS, model_dir="models"):
+        if kind not in ('thread', 'process', 'inline'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.model = model
+        self.kind = kind
+        self.max_workers = max_workers
+        self.limits = dict(DEFAULT_CONCURRENCY_LIMITS if limits is None else limits)
+        self.process_endpoints = set(process_endpoints)
+        self.model_dir = model_dir
+        self.semaphores = {}
+        # Reports the last process worker call left its worker holding
+        self.shipped_reports = 0
+
+        self.thread_pool = None
+        self.process_pool = None
+        if kind != 'inline':
+            self.thread_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="walksafe-model")
+        if kind == 'process':
+            self.process_pool = self.start_process_pool()
+
+    @classmethod
+    def from_env(cls, model, model_dir="models"):
+        """Build an executor configured by WALKSAFE_EXECUTOR* environment variables"""
+        limits = dict(DEFAULT_CONCURRENCY_LIMITS)
+        limits.update(parse_limits(os.environ.get("WALKSAFE_CONCURRENCY_LIMITS", "")))
+        process_endpoints = os.environ.get("WALKSAFE_PROCESS_ENDPOINTS")
+        return cls(
+            model,
+            kind=os.environ.get("WALKSAFE_EXECUTOR", "thread"),
+            max_workers=int(os.environ.get("WALKSAFE_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1))),
+            limits=limits,
+            process_endpoints=process_endpoints.split(',') if process_endpoints else DEFAULT_PROCESS_ENDPOINTS,
+            model_dir=model_dir
+        )
+
+    def start_process_pool(self):
+        """Start a process pool whose workers load the model from model_dir"""
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_init_worker, initargs=(self.model_dir,))
+
+    def set_model(self, model):
+        """Send later calls to a new model; calls already dispatched finish on the old one"""
+        self.model = model
+        if self.process_pool is not None:
+            old_pool = self.process_pool
+            self.process_pool = self.start_process_pool()
+            self.shipped_reports = 0
+            old_pool.shutdown(wait=False)
+
+    def semaphore(self, endpoint):
+        """Get the concurrency limiter for an endpoint (None when unlimited)"""
+        limit = self.limits.get(endpoint)
+        if not limit:
+            return None
+        semaphore = self.semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = self.semaphores[endpoint] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def run(self, endpoint, method, *args, **kwargs):
+        """Call a model method for an endpoint and return its result"""
+        semaphore = self.semaphore(endpoint)
+        if semaphore is None:
+            return await self.dispatch(endpoint, method, args, kwargs)
+        async with semaphore:
+            return await self.dispatch(endpoint, method, args, kwargs)
+
+    async def dispatch(self, endpoint, method, args, kwargs):
+        """Send a model call to the pool that serves the endpoint"""
+        if self.kind == 'inline':
+            return getattr(self.model, method)(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        if self.process_pool is not None and endpoint in self.process_endpoints:
+            return await self.dispatch_to_process(loop, method, args, kwargs)
+        return await loop.run_in_executor(
+            self.thread_pool, functools.partial(getattr(self.model, method), *args, **kwargs))
+
+    async def dispatch_to_process(self, loop, method, args, kwargs):
+        """Call a model method in a process worker, sending the user reports it may be missing
+
+        Reports are sent from where the last worker call left off; a worker further
+        behind answers with its own count and the call is resent from there. After
+        one try per worker, every report is sent.
+        """
+        reports = self.model.incident_reports
+        count = len(reports)
+        first = min(self.shipped_reports, count)
+        for attempt in range(self.max_workers + 1):
+            if attempt == self.max_workers:
+                first = 0
+            result = await loop.run_in_executor(
+                self.process_pool, _call_worker_model, method, args, kwargs, first, reports[first:count])
+            if not isinstance(result, WorkerBehind):
+                self.shipped_reports = count
+                return result
+            first = result.applied
+
+    def shutdown(self):
+        """Stop the worker pools"""
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False)
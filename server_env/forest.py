@@ -0,0 +1,144 @@
+import numpy as np
+
+# Rows evaluated together; keeps the (trees x rows) node index arrays cache-sized
+CHUNK_ROWS = 4096
+
+def ordered_keys(values):
+    """Map float64 values to int64 keys that sort in the same order"""
+    bits = np.asarray(values, dtype=np.float64).view(np.int64)
+    return bits ^ ((bits >> 63) & np.int64(0x7FFFFFFFFFFFFFFF))
+
+def keys_to_floats(keys):
+    """Invert ordered_keys"""
+    keys = np.asarray(keys, dtype=np.int64)
+    return (keys ^ ((keys >> 63) & np.int64(0x7FFFFFFFFFFFFFFF))).view(np.float64)
+
+def fold_thresholds(thresholds, mean, scale):
+    """Get raw-feature thresholds equivalent to sklearn's scaled split tests
+
+    sklearn tests float32((x - mean) / scale) <= threshold. That is monotone in x,
+    so for every split there is a largest float64 x that still goes left; find it
+    by bisecting over the float64 values around the algebraic answer.
+    """
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32) <= thresholds
+
+    guess = thresholds * scale + mean
+    width = np.abs(guess) * 1e-6 + scale * 1e-6 + 1e-300
+    while True:
+        low, high = guess - width, guess + width
+        if goes_left(low).all() and not goes_left(high).any():
+            break
+        width *= 16
+
+    low, high = ordered_keys(low), ordered_keys(high)
+    while (high - low > 1).any():
+        middle = low + (high - low) // 2
+        left = goes_left(keys_to_floats(middle))
+        low = np.where(left, middle, low)
+        high = np.where(left, high, middle)
+    return keys_to_floats(low)
+
+def breadth_first_order(children_left, children_right):
+    """Get a tree's node ids in breadth-first order, so each node's children are adjacent"""
+    order = [0]
+    for node in order:
+        if children_left[node] >= 0:
+            order.extend((children_left[node], children_right[node]))
+    return np.array(order)
+
+class FlatForest:
+    """A regression forest compiled to flat node arrays and evaluated level by level
+
+    Node i of the forest splits on feature[i] at threshold[i] (raw, unscaled units)
+    and goes to child[i] when the feature is <= the threshold, else child[i] + 1.
+    Leaves have an infinite threshold and point back at themselves, so after depth
+    steps every row sits on a leaf of every tree. Predictions match sklearn's
+    RandomForestRegressor.predict(scaler.transform(X)) bit for bit.
+    """
+
+    def __init__(self, feature, threshold, child, value, roots, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+
+    @classmethod
+    def from_sklearn(cls, forest, scaler=None):
+        """Compile a fitted RandomForestRegressor, folding a StandardScaler into its thresholds"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            order = breadth_first_order(tree.children_left, tree.children_right)
+            position = np.empty(tree.node_count, dtype=np.intp)
+            position[order] = np.arange(tree.node_count)
+
+            is_leaf = tree.children_left[order] < 0
+            features.append(np.where(is_leaf, 0, tree.feature[order]))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+            children.append(np.where(is_leaf, np.arange(tree.node_count), position[tree.children_left[order]]) + offset)
+            values.append(tree.value[order, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+
+        feature = np.concatenate(features).astype(np.intp)
+        threshold = np.concatenate(thresholds)
+
+        n_features = forest.n_features_in_
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if scaler.with_mean:
+                mean = scaler.mean_
+            if scaler.with_std:
+                scale = scaler.scale_
+        splits = np.isfinite(threshold)
+        threshold[splits] = fold_thresholds(threshold[splits], mean[feature[splits]], scale[feature[splits]])
+
+        depth = max(estimator.tree_.max_depth for estimator in forest.estimators_)
+        return cls(feature, threshold, np.concatenate(children).astype(np.intp),
+                   np.concatenate(values), np.array(roots, dtype=np.intp), depth)
+
+    def arrays(self):
+        """Get the node arrays by name, for saving"""
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'child': self.child,
+            'value': self.value,
+            'roots': self.roots
+        }
+
+    def predict(self, X):
+        """Predict raw (unscaled) feature rows"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        predictions = np.empty(len(X))
+        for start in range(0, len(X), CHUNK_ROWS):
+            predictions[start:start + CHUNK_ROWS] = self.predict_chunk(X[start:start + CHUNK_ROWS])
+        return predictions
+
+    def predict_chunk(self, X):
+        """Walk every tree for a block of rows, one level per step"""
+        flat = X.ravel()
+        row_offsets = np.arange(len(X))[None, :] * X.shape[1]
+
+        # Every tree starts at its root, so the first level compares whole feature columns
+        goes_right = X.T[self.feature[self.roots]] > self.threshold[self.roots][:, None]
+        nodes = self.child[self.roots][:, None] + goes_right
+        for _ in range(self.depth - 1):
+            goes_right = np.take(flat, np.take(self.feature, nodes) + row_offsets) > np.take(self.threshold, nodes)
+            nodes = np.take(self.child, nodes) + goes_right
+
+        # Sum trees in order, as sklearn does, so rounding matches exactly
+        leaf_values = np.take(self.value, nodes)
+        total = np.zeros(len(X))
+        for tree_values in leaf_values:
+            total += tree_values
+        return total / len(self.roots)
+
+    def nbytes(self):
+        """Get the memory used by the node arrays in bytes"""
+        return sum(array.nbytes for array in self.arrays().values())
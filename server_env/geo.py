@@ -0,0 +1,48 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_MILES = 3959
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points in miles"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(delta_lon/2) * math.sin(delta_lon/2))
+
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_MILES * c
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """Calculate great-circle distances in miles between broadcastable arrays of points"""
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    sin_dlat = np.sin((lat2_rad - lat1_rad) / 2)
+    sin_dlon = np.sin(np.radians(np.subtract(lon2, lon1)) / 2)
+
+    a = sin_dlat * sin_dlat + np.cos(lat1_rad) * np.cos(lat2_rad) * sin_dlon * sin_dlon
+    return 2 * EARTH_RADIUS_MILES * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def local_distances(lat, lon, lats, lons):
+    """Calculate equirectangular distances in miles from one point to arrays of points
+
+    Treats the neighbourhood of (lat, lon) as a plane. Over the few miles covered by
+    the model the error against haversine is well under a foot.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    scale = EARTH_RADIUS_MILES * math.pi / 180
+    dy = (lats - lat) * scale
+    dx = (np.asarray(lons, dtype=np.float64) - lon) * scale * np.cos(np.radians((lats + lat) / 2))
+    return np.sqrt(dx * dx + dy * dy)
+
+def path_distance(lats, lons):
+    """Calculate total length in miles of a path through consecutive points"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lats) < 2:
+        return 0.0
+    return float(haversine_distances(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum())
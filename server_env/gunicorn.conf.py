@@ -0,0 +1,22 @@
+"""Production launcher: gunicorn -c gunicorn.conf.py server:app
+
+The master imports the app and loads the model once, then forks uvicorn workers
+that share the loaded model and incident/raster arrays copy-on-write.
+"""
+import os
+
+bind = os.environ.get("WALKSAFE_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WALKSAFE_WORKERS", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("WALKSAFE_PRELOAD", "1") == "1"
+timeout = int(os.environ.get("WALKSAFE_WORKER_TIMEOUT", 120))
+loglevel = "info"
+
+# Tell the app how many workers share the port, so an admin reload reaches them all
+os.environ["WALKSAFE_WORKER_COUNT"] = str(workers)
+
+def when_ready(arbiter):
+    """Load the model in the master once the app is imported, before any worker forks"""
+    if preload_app:
+        import server
+        server.preload_model()
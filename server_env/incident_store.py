@@ -0,0 +1,169 @@
+import numpy as np
+from datetime import date
+
+# Day ordinal of 1970-01-01, numpy's datetime64 epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MISSING_DATE = 0
+
+# Column name -> storage kind for each incident type
+CRIME_SCHEMA = {
+    'lat': 'float',
+    'lon': 'float',
+    'severity': 'float',
+    'date': 'date',
+    'crime_type': 'code',
+    'category': 'code'
+}
+
+ACCIDENT_SCHEMA = {
+    'lat': 'float',
+    'lon': 'float',
+    'severity': 'float',
+    'date': 'date',
+    'pedestrian_involved': 'flag',
+    'intersection': 'flag'
+}
+
+# Known values for coded columns, extended with any new values found in the data
+DEFAULT_VOCABULARIES = {
+    'crime_type': ['theft', 'burglary', 'violent', 'vandalism', 'other'],
+    'category': ['theft', 'burglary', 'assault', 'robbery', 'vandalism', 'violent', 'other']
+}
+
+COLUMN_DTYPES = {
+    'float': np.float32,
+    'date': np.int32,
+    'code': np.int8,
+    'flag': np.bool_
+}
+
+def parse_date_ordinals(dates):
+    """Convert YYYY-MM-DD strings to day ordinals (MISSING_DATE when unparseable)"""
+    dates = ['' if value is None else str(value) for value in dates]
+    try:
+        days = np.array(dates, dtype='datetime64[D]')
+    except ValueError:
+        days = np.array([parse_single_date(value) for value in dates], dtype='datetime64[D]')
+
+    ordinals = days.astype(np.int64) + EPOCH_ORDINAL
+    ordinals[np.isnat(days)] = MISSING_DATE
+    return ordinals.astype(np.int32)
+
+def parse_single_date(value):
+    """Parse one date string, returning NaT when it is not a valid date"""
+    try:
+        return np.datetime64(value, 'D')
+    except ValueError:
+        return np.datetime64('NaT')
+
+def format_date_ordinal(ordinal):
+    """Convert a day ordinal back to a YYYY-MM-DD string"""
+    if ordinal == MISSING_DATE:
+        return None
+    return date.fromordinal(int(ordinal)).isoformat()
+
+class IncidentStore:
+    """Typed column (struct-of-arrays) storage for crime or accident incidents"""
+
+    def __init__(self, schema, columns, vocabularies=None):
+        self.schema = schema
+        self.columns = {name: np.asarray(columns[name], dtype=COLUMN_DTYPES[kind]) for name, kind in schema.items()}
+        self.vocabularies = {
+            name: list((vocabularies or {}).get(name, DEFAULT_VOCABULARIES.get(name, [])))
+            for name, kind in schema.items() if kind == 'code'
+        }
+
+    @classmethod
+    def from_columns(cls, schema, values):
+        """Build a store by encoding raw column values (strings, floats, booleans)"""
+        columns = {}
+        vocabularies = {}
+        for name, kind in schema.items():
+            raw = values[name]
+            if kind == 'date':
+                columns[name] = parse_date_ordinals(raw)
+            elif kind == 'code':
+                vocabulary = list(DEFAULT_VOCABULARIES.get(name, []))
+                for value in sorted(set(map(str, raw)) - set(vocabulary)):
+                    vocabulary.append(value)
+                if len(vocabulary) > np.iinfo(np.int8).max:
+                    raise ValueError(f"Too many distinct values for column '{name}'")
+                lookup = {value: code for code, value in enumerate(vocabulary)}
+                columns[name] = np.array([lookup[str(value)] for value in raw], dtype=np.int8)
+                vocabularies[name] = vocabulary
+            elif kind == 'flag':
+                columns[name] = np.array([bool(value) for value in raw], dtype=np.bool_)
+            else:
+                columns[name] = np.asarray(raw, dtype=np.float32)
+        return cls(schema, columns, vocabularies)
+
+    @classmethod
+    def from_records(cls, schema, records):
+        """Build a store from a list of incident dicts (the legacy pickle format)"""
+        return cls.from_columns(schema, {name: [record.get(name) for record in records] for name in schema})
+
+    @classmethod
+    def from_saved(cls, schema, saved):
+        """Build a store from saved columns, converting legacy list-of-dicts data"""
+        if isinstance(saved, list):
+            return cls.from_records(schema, saved)
+        return cls(schema, saved['columns'], saved['vocabularies'])
+
+    def to_saved(self):
+        """Get the columns and vocabularies in their on-disk form"""
+        return {'format': 'columnar', 'columns': self.columns, 'vocabularies': self.vocabularies}
+
+    def __len__(self):
+        return len(self.columns['lat'])
+
+    def __getitem__(self, position):
+        """Decode one incident into the dict form used by API responses"""
+        record = {}
+        for name, kind in self.schema.items():
+            value = self.columns[name][position]
+            if kind == 'date':
+                record[name] = format_date_ordinal(value)
+            elif kind == 'code':
+                record[name] = self.vocabularies[name][value]
+            elif kind == 'flag':
+                record[name] = bool(value)
+            else:
+                # float32 holds ~7 significant digits, round away the binary noise
+                record[name] = round(float(value), 6)
+        return record
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def column(self, name):
+        """Get the raw typed array for a column"""
+        return self.columns[name]
+
+    def mask(self, name, value):
+        """Get a boolean mask of incidents whose coded column equals value"""
+        vocabulary = self.vocabularies[name]
+        if value not in vocabulary:
+            return np.zeros(len(self), dtype=np.bool_)
+        return self.columns[name] == vocabulary.index(value)
+
+    def column_at(self, name, positions):
+        """Get a column's values at the given positions"""
+        return self.columns[name][positions]
+
+    def positions_between(self, name, low, high):
+        """Get the positions whose column value is at least low and below high"""
+        values = self.columns[name]
+        return np.flatnonzero((values >= low) & (values < high))
+
+    def take(self, positions):
+        """Get a new store holding only the incidents at the given positions"""
+        return IncidentStore(
+            self.schema,
+            {name: column[positions] for name, column in self.columns.items()},
+            self.vocabularies
+        )
+
+    def nbytes(self):
+        """Get the memory used by the column arrays in bytes"""
+        return sum(column.nbytes for column in self.columns.values())
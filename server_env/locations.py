@@ -0,0 +1,159 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import geo
+from spatial_index import cell_range
+
+class LocationStore:
+    """Latest position of each user in grid buckets, forgotten ttl seconds after its last update
+
+    Positions are kept in arrival order, so expiry only ever looks at the oldest
+    entries. Updates may carry the client's own timestamp (epoch seconds), clamped
+    to the server clock so a fast client clock cannot block later updates; one older
+    than the position already held for that user is ignored. A user's position is
+    only visible to the viewers they share it with.
+    """
+
+    def __init__(self, ttl=300, cell_size=0.005, clock=time.time):
+        self.ttl = ttl
+        self.cell_size = cell_size
+        self.clock = clock
+        self.positions = OrderedDict()
+        self.cells = {}
+        self.shares = {}
+        self.lock = threading.Lock()
+        self.updates = 0
+        self.ignored = 0
+        self.expired = 0
+
+    def cell_of(self, lat, lon):
+        """Get the grid cell holding a point"""
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def update_many(self, updates):
+        """Store a batch of {'user_id', 'lat', 'lon', 'timestamp'?} positions; returns how many were applied"""
+        now = self.clock()
+        applied = 0
+        with self.lock:
+            for update in updates:
+                user_id = update['user_id']
+                timestamp = update.get('timestamp')
+                recorded_at = now if timestamp is None else min(timestamp, now)
+                current = self.positions.get(user_id)
+                if current is not None:
+                    if recorded_at < current['recorded_at']:
+                        # Out of order; the newer position stays, expiring on its own schedule
+                        self.ignored += 1
+                        continue
+                    del self.positions[user_id]
+                    self.remove_from_cell(user_id, current['cell'])
+
+                cell = self.cell_of(update['lat'], update['lon'])
+                self.positions[user_id] = {
+                    'lat': update['lat'],
+                    'lon': update['lon'],
+                    'recorded_at': recorded_at,
+                    'updated_at': now,
+                    'cell': cell
+                }
+                self.cells.setdefault(cell, set()).add(user_id)
+                applied += 1
+            self.updates += applied
+            self.expire_locked(now)
+        return applied
+
+    def set_viewers(self, owner, viewer_ids, allow=True):
+        """Share an owner's position with viewers, or stop sharing it; returns the owner's viewers"""
+        with self.lock:
+            viewers = self.shares.setdefault(owner, set())
+            if allow:
+                viewers.update(viewer_ids)
+            else:
+                viewers.difference_update(viewer_ids)
+            if not viewers:
+                del self.shares[owner]
+            return sorted(viewers)
+
+    def visible_to(self, viewer, user_ids):
+        """Get those of the given users who share their position with viewer"""
+        with self.lock:
+            return {user_id for user_id in user_ids if viewer in self.shares.get(user_id, ())}
+
+    def remove_from_cell(self, user_id, cell):
+        """Take a user out of a grid cell"""
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self.cells[cell]
+
+    def expire_locked(self, now):
+        """Drop positions not updated within ttl (caller holds the lock)"""
+        cutoff = now - self.ttl
+        while self.positions:
+            user_id, position = next(iter(self.positions.items()))
+            if position['updated_at'] > cutoff:
+                break
+            self.positions.popitem(last=False)
+            self.remove_from_cell(user_id, position['cell'])
+            self.expired += 1
+
+    def expire(self):
+        """Drop positions not updated within ttl"""
+        with self.lock:
+            self.expire_locked(self.clock())
+
+    def get_many(self, user_ids):
+        """Get the live positions of the given users, keyed by user id"""
+        with self.lock:
+            self.expire_locked(self.clock())
+            return {user_id: self.public(self.positions[user_id]) for user_id in user_ids if user_id in self.positions}
+
+    def near(self, lat, lon, radius, user_ids=None):
+        """Get (user_id, position, distance) for live users within radius of a point, nearest first
+
+        With user_ids, only those users are considered.
+        """
+        with self.lock:
+            self.expire_locked(self.clock())
+            row_min, row_max, col_min, col_max = cell_range(lat, lon, radius, self.cell_size)
+            candidates = []
+            for row in range(row_min, row_max + 1):
+                for col in range(col_min, col_max + 1):
+                    members = self.cells.get((row, col))
+                    if members:
+                        candidates.extend(members if user_ids is None else members & user_ids)
+            positions = [self.public(self.positions[user_id]) for user_id in candidates]
+
+        if not positions:
+            return []
+        distances = geo.local_distances(lat, lon, [p['lat'] for p in positions], [p['lon'] for p in positions])
+        order = np.argsort(distances, kind='stable')
+        return [(candidates[i], positions[i], float(distances[i])) for i in order if distances[i] <= radius]
+
+    def public(self, position):
+        """Get the API form of a stored position"""
+        return {
+            'lat': position['lat'],
+            'lon': position['lon'],
+            'recorded_at': position['recorded_at'],
+            'updated_at': position['updated_at']
+        }
+
+    def stats(self):
+        """Get store size and counters"""
+        with self.lock:
+            return {
+                'tracked_users': len(self.positions),
+                'occupied_cells': len(self.cells),
+                'sharing_users': len(self.shares),
+                'ttl': self.ttl,
+                'updates': self.updates,
+                'ignored': self.ignored,
+                'expired': self.expired
+            }
+
+    def __len__(self):
+        return len(self.positions)
@@ -1,40 +1,93 @@
 import numpy as np
-import joblib
 import math
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+import heapq
 import logging
+import threading
+import geo
+from spatial_index import GridIndex, PointGrid
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA
+from safety_raster import SafetyRaster, RASTER_BOUNDS
+from routing import find_path
+from tiles import TilePyramid, TILE_SIZE
+from cache import LRUCache
+from report_timeline import ReportTimeline, epoch_seconds
+from forest import FlatForest
+from bundle import has_bundle, load_bundle, load_legacy, save_bundle
 
 logger = logging.getLogger(__name__)
 
+# Distinct values returned by get_time_risk/get_day_risk, one raster layer each
+TIME_RISK_LEVELS = [0.3, 0.6, 0.8]
+DAY_RISK_LEVELS = [0.4, 0.7]
+
+# Radius in miles used for neighborhood features
+FEATURE_RADIUS = 0.3
+
+# User report incident types counted as violent crimes, and as accidents (the
+# rest count as crimes); pedestrian accident types also count as pedestrian
+VIOLENT_REPORT_TYPES = {'violent', 'assault', 'robbery'}
+ACCIDENT_REPORT_TYPES = {'accident', 'pedestrian_accident', 'near_miss'}
+PEDESTRIAN_REPORT_TYPES = {'pedestrian_accident', 'near_miss'}
+
+# High-risk crimes included with the nearby alerts of a location
+MAX_CRIME_ALERTS = 3
+
+# Grid scanned for danger zones
+DANGER_ZONE_BOUNDS = {'north': 26.50, 'south': 26.42, 'east': -80.05, 'west': -80.10}
+DANGER_ZONE_RESOLUTION = 25
+
 class WalkSafeModel:
     """WalkSafe+ ML model handler for safety predictions"""
     
-    def __init__(self):
+    def __init__(self, raster_step=0.0005, cache_cell_size=0.0001, cache_ttl=300, cache_max_entries=20000,
+                 report_weight=1.0, storage=None):
         self.model = None
         self.scaler = None
+        self.forest = None
         self.feature_importance = {}
         self.features_config = {}
-        self.crime_data = []
-        self.accident_data = []
+        self.crime_data = IncidentStore.from_records(CRIME_SCHEMA, [])
+        self.accident_data = IncidentStore.from_records(ACCIDENT_SCHEMA, [])
         self.delray_center = {}
         self.metadata = {}
+        self.model_version = None
         self.incident_reports = []
+        self.report_weight = report_weight
+        self.report_points = []
+        self.report_arrays = None
+        self.report_lock = threading.RLock()
+        self.successor = None
+        self.report_timeline = ReportTimeline()
+        self.report_grid = PointGrid()
+        self.incident_counts = {'high_risk_crimes': 0, 'pedestrian_accidents': 0}
+        self.storage = storage
+        self.storage_tables = None
+        self.data_version = 0
+        self.crime_index = None
+        self.accident_index = None
+        self.raster_step = raster_step
+        self.safety_raster = None
+        self.recent_cutoff = None
+        self.tile_pyramids = {}
+        self.cache_cell_size = cache_cell_size
+        self.prediction_cache = LRUCache(max_entries=cache_max_entries, ttl=cache_ttl)
+        self.danger_grid = None
+        self.danger_zone_results = LRUCache(max_entries=256)
 
     def load_model(self, model_dir="models"):
-        """Load trained model and data"""
+        """Load trained model and data from an artifact bundle or legacy pickles"""
         try:
             logger.info(f"Loading model from {model_dir}/...")
             
-            # Load model components
-            self.model = joblib.load(f"{model_dir}/walksafe_model.pkl")
-            self.scaler = joblib.load(f"{model_dir}/walksafe_scaler.pkl")
-            self.feature_importance = joblib.load(f"{model_dir}/walksafe_feature_importance.pkl")
-            self.features_config = joblib.load(f"{model_dir}/walksafe_features_config.pkl")
-            self.crime_data = joblib.load(f"{model_dir}/walksafe_crime_data.pkl")
-            self.accident_data = joblib.load(f"{model_dir}/walksafe_accident_data.pkl")
-            self.delray_center = joblib.load(f"{model_dir}/walksafe_delray_center.pkl")
-            self.metadata = joblib.load(f"{model_dir}/walksafe_metadata.pkl")
+            # Load model components, memory-mapping bundle arrays
+            if has_bundle(model_dir):
+                components = load_bundle(model_dir)
+            else:
+                logger.info("No artifact bundle found, loading legacy pickles")
+                components = load_legacy(model_dir)
+            self.use_components(components)
             
             logger.info("Model loaded successfully!")
             logger.info(f"Trained on {self.metadata['total_crimes']} crimes and {self.metadata['total_accidents']} accidents")
@@ -46,60 +99,269 @@ class WalkSafeModel:
             logger.error(f"Failed to load model: {e}")
             return False
 
+    def use_components(self, components):
+        """Install loaded model components and build the derived indexes and grids"""
+        self.model = components.get('model')
+        self.scaler = components.get('scaler')
+        self.forest = components.get('forest')
+        if self.forest is None:
+            self.forest = FlatForest.from_sklearn(self.model, self.scaler)
+        self.feature_importance = components['feature_importance']
+        self.features_config = components['features_config']
+        self.crime_data = components['crime_data']
+        self.accident_data = components['accident_data']
+        self.delray_center = components['delray_center']
+        self.metadata = components['metadata']
+        self.model_version = self.metadata.get('trained_at', 'unknown')
+        
+        # Incidents only change on load, so their dashboard totals are counted once here
+        self.incident_counts = {
+            'high_risk_crimes': int(np.count_nonzero(self.crime_data.column('severity') > np.float32(0.7))),
+            'pedestrian_accidents': int(np.count_nonzero(self.accident_data.column('pedestrian_involved')))
+        }
+        
+        # Build spatial indexes for radius queries, or hand the incidents to the storage backend
+        if self.storage is not None:
+            self.storage_tables = self.storage.import_incidents(self.crime_data, self.accident_data, self.model_version)
+            self.crime_index = self.accident_index = None
+        else:
+            self.crime_index = self.build_spatial_index(self.crime_data)
+            self.accident_index = self.build_spatial_index(self.accident_data)
+        
+        # User reports kept from before a (re)load are folded in again once the grids are built
+        self.report_points = []
+        self.report_arrays = None
+        self.report_timeline.clear()
+        self.report_grid.clear()
+        
+        # Precompute safety scores for every time/day risk level, unless the bundle has them
+        raster = components.get('safety_raster')
+        self.recent_cutoff = self.recent_cutoff_ordinal(30)
+        if raster is not None and raster.step == self.raster_step:
+            # A bundle built on an earlier day counts recent crimes from an earlier cutoff
+            self.safety_raster = raster
+            self.shift_raster_recent_cutoff(self.recent_cutoff)
+        elif self.raster_step:
+            self.safety_raster = self.build_safety_raster(self.raster_step)
+        else:
+            self.safety_raster = None
+        if self.storage is not None:
+            # Everything built from the in-memory incidents is built; queries read the stored tables from here on
+            self.crime_data = self.storage.stored_incidents(self.storage_tables['crimes'], self.crime_data)
+            self.accident_data = self.storage.stored_incidents(self.storage_tables['accidents'], self.accident_data)
+        self.tile_pyramids = {}
+        self.prediction_cache.clear()
+        self.build_danger_grid()
+        self.apply_incident_reports(self.incident_reports)
+        self.data_version += 1
+
+    def warm_up(self):
+        """Fill the caches a freshly loaded model would otherwise build on its first requests"""
+        time_level, day_level = self.get_risk_levels()
+        self.get_danger_zones()
+        if self.safety_raster is not None:
+            self.get_tile_pyramid(time_level, day_level)
+        self.generate_heatmap_data(**DANGER_ZONE_BOUNDS)
+
+    def save_bundle(self, bundle_dir):
+        """Write the loaded model, incidents and safety raster as an artifact bundle"""
+        if self.model is None:
+            raise ValueError("sklearn estimators are not loaded, cannot write a bundle")
+        return save_bundle(bundle_dir, {
+            'model': self.model,
+            'scaler': self.scaler,
+            'forest': self.forest,
+            'feature_importance': self.feature_importance,
+            'features_config': self.features_config,
+            'crime_data': self.crime_data,
+            'accident_data': self.accident_data,
+            'delray_center': self.delray_center,
+            'metadata': self.metadata,
+            'safety_raster': self.safety_raster
+        })
+
     def is_loaded(self):
         """Check if model is loaded"""
-        return self.model is not None
+        return self.forest is not None
+
+    def shared_arrays(self):
+        """Get the large read-only arrays (incidents, indexes, raster) loaded with the model"""
+        arrays = list(self.crime_data.columns.values()) + list(self.accident_data.columns.values())
+        for index in (self.crime_index, self.accident_index):
+            if index is not None:
+                arrays += [index.lats, index.lons, index.order]
+        if self.safety_raster is not None:
+            arrays += list(self.safety_raster.stats.values()) + [self.safety_raster.scores]
+        return arrays
+
+    def make_read_only(self):
+        """Mark the shared arrays read-only so forked workers never copy their pages"""
+        for array in self.shared_arrays():
+            array.flags.writeable = False
+
+    def covers(self, lat, lon):
+        """Check whether a point lies in the area the model has incident data for"""
+        return (RASTER_BOUNDS['south'] <= lat <= RASTER_BOUNDS['north'] and
+                RASTER_BOUNDS['west'] <= lon <= RASTER_BOUNDS['east'])
 
-    def predict_safety(self, lat, lon, time_of_day=None, day_of_week=None):
+    def predict_safety(self, lat, lon, time_of_day=None, day_of_week=None, exact=True):
         """Predict safety score using loaded model"""
-        if self.model is None:
+        return self.predict_safety_batch([{'lat': lat, 'lon': lon}], time_of_day, day_of_week, exact)[0]
+
+    def predict_safety_batch(self, points, hours=None, days=None, exact=True):
+        """Predict safety scores for many points with a single scale and predict pass
+
+        hours and days may each be None (current time), one value for every point,
+        or a list with one value (or None) per point. Every point runs through the
+        model unless exact is False, which reads points inside the safety raster
+        from its bilinear interpolation instead (for map overlays only).
+        Answers are cached per cache_cell_size cell, time/day bucket and data_version:
+        every point of a cell gets the prediction made at the cell's center, so a
+        cached answer is the same one a miss would have computed.
+        """
+        if self.forest is None:
             raise ValueError("Model not loaded")
+        if not points:
+            return []
+        self.refresh_recent_stats()
+        
+        hours = self.broadcast_time_values(hours, len(points))
+        days = self.broadcast_time_values(days, len(points))
+        if not self.cache_cell_size:
+            return self.compute_safety_predictions(points, hours, days, exact)
+        
+        # Reports bump data_version, so predictions made before one are never read after it
+        data_version = self.data_version
+        predictions = [None] * len(points)
+        misses = {}
+        for i, (point, hour, day) in enumerate(zip(points, hours, days)):
+            key = (
+                round(point['lat'] / self.cache_cell_size),
+                round(point['lon'] / self.cache_cell_size),
+                *self.get_risk_levels(hour, day),
+                exact,
+                data_version
+            )
+            cached = self.prediction_cache.get(key)
+            if cached is not None:
+                predictions[i] = {**cached, 'lat': point['lat'], 'lon': point['lon']}
+            else:
+                misses.setdefault(key, []).append(i)
         
-        # Extract features for location
-        features = self.extract_location_features(lat, lon, time_of_day, day_of_week)
+        if misses:
+            # Score each missing cell once, at its center
+            centers = [{'lat': key[0] * self.cache_cell_size, 'lon': key[1] * self.cache_cell_size} for key in misses]
+            firsts = [indexes[0] for indexes in misses.values()]
+            computed = self.compute_safety_predictions(
+                centers, [hours[i] for i in firsts], [days[i] for i in firsts], exact)
+            for (key, indexes), prediction in zip(misses.items(), computed):
+                self.prediction_cache.put(key, prediction)
+                for i in indexes:
+                    predictions[i] = {**prediction, 'lat': points[i]['lat'], 'lon': points[i]['lon']}
         
-        # Scale features
-        feature_names = list(self.features_config.keys())
-        feature_vector = np.array([[features.get(feature, 0) for feature in feature_names]])
-        scaled_features = self.scaler.transform(feature_vector)
+        return predictions
+
+    def compute_safety_predictions(self, points, hours, days, exact=True):
+        """Predict safety scores for points with per-point hours and days, bypassing the cache"""
+        lats = np.array([point['lat'] for point in points], dtype=np.float64)
+        lons = np.array([point['lon'] for point in points], dtype=np.float64)
         
-        # Make prediction
-        safety_score = float(self.model.predict(scaled_features)[0])
-        safety_score = max(0.0, min(1.0, safety_score))
+        safety_scores = np.empty(len(points))
+        features = [None] * len(points)
         
-        # Generate recommendations
-        recommendations = self.generate_recommendations(features, safety_score)
+        if self.safety_raster is not None and not exact:
+            from_raster = np.flatnonzero(self.safety_raster.contains(lats, lons))
+        else:
+            from_raster = np.empty(0, dtype=np.int64)
         
-        return {
-            'lat': lat,
-            'lon': lon,
-            'safety_score': safety_score,
-            'risk_level': self.categorize_safety(safety_score),
-            'confidence': float(abs(safety_score - 0.5) * 2),
-            'factors': features,
-            'recommendations': recommendations
-        }
+        if len(from_raster):
+            time_risks = [self.get_time_risk(hours[i]) if hours[i] is not None else self.get_current_time_risk() for i in from_raster]
+            day_risks = [self.get_day_risk(days[i]) if days[i] is not None else self.get_current_day_risk() for i in from_raster]
+            safety_scores[from_raster] = self.safety_raster.interpolate(
+                lats[from_raster], lons[from_raster],
+                [TIME_RISK_LEVELS.index(risk) for risk in time_risks],
+                [DAY_RISK_LEVELS.index(risk) for risk in day_risks]
+            )
+            
+            # Report the neighborhood factors of the nearest grid node
+            nodes = self.safety_raster.nearest_nodes(lats[from_raster], lons[from_raster])
+            location_features = self.features_from_stats(
+                {name: values[nodes] for name, values in self.safety_raster.stats.items()}, FEATURE_RADIUS)
+            for k, i in enumerate(from_raster):
+                features[i] = {name: float(values[k]) for name, values in location_features.items()}
+                features[i].update({
+                    'time_risk_score': time_risks[k],
+                    'day_risk_score': day_risks[k],
+                    'weather_risk': 0.3
+                })
+        
+        from_model = [i for i in range(len(points)) if features[i] is None]
+        if from_model:
+            # Extract features for every location and predict them all at once
+            for i in from_model:
+                features[i] = self.extract_location_features(points[i]['lat'], points[i]['lon'], hours[i], days[i])
+            
+            feature_names = list(self.features_config.keys())
+            feature_matrix = np.array([[features[i].get(feature, 0) for feature in feature_names] for i in from_model])
+            safety_scores[from_model] = self.forest.predict(feature_matrix)
+        
+        safety_scores = np.clip(safety_scores, 0.0, 1.0).tolist()
+        
+        predictions = []
+        for point, point_features, safety_score in zip(points, features, safety_scores):
+            predictions.append({
+                'lat': point['lat'],
+                'lon': point['lon'],
+                'safety_score': safety_score,
+                'risk_level': self.categorize_safety(safety_score),
+                'confidence': float(abs(safety_score - 0.5) * 2),
+                'factors': point_features,
+                'recommendations': self.generate_recommendations(point_features, safety_score)
+            })
+        
+        return predictions
+
+    def broadcast_time_values(self, values, count):
+        """Expand an hour/day argument into one value per point"""
+        if values is None or isinstance(values, (int, np.integer)):
+            return [values] * count
+        if len(values) != count:
+            raise ValueError(f"Expected {count} time values, got {len(values)}")
+        return list(values)
 
     def extract_location_features(self, lat, lon, time_of_day=None, day_of_week=None):
         """Extract features for a specific location"""
-        radius = 0.3
-        nearby_crimes = self.get_incidents_in_radius(self.crime_data, {'lat': lat, 'lon': lon}, radius)
-        nearby_accidents = self.get_incidents_in_radius(self.accident_data, {'lat': lat, 'lon': lon}, radius)
+        stats = self.neighborhood_stats(lat, lon, FEATURE_RADIUS)
+        location_features = self.features_from_stats(
+            {name: np.array([value], dtype=np.float64) for name, value in stats.items()}, FEATURE_RADIUS)
         
         return {
-            'crime_density': self.calculate_density(nearby_crimes, radius),
-            'crime_severity_avg': self.calculate_average_severity(nearby_crimes),
-            'violent_crime_ratio': self.calculate_violent_crime_ratio(nearby_crimes),
-            'recent_crime_count': self.count_recent_incidents(nearby_crimes, 30),
-            'accident_density': self.calculate_density(nearby_accidents, radius),
-            'pedestrian_accident_ratio': self.calculate_pedestrian_ratio(nearby_accidents),
-            'fatal_accident_ratio': self.calculate_fatal_ratio(nearby_accidents),
-            'intersection_accident_ratio': self.calculate_intersection_ratio(nearby_accidents),
-            'time_risk_score': self.get_time_risk(time_of_day) if time_of_day else self.get_current_time_risk(),
-            'day_risk_score': self.get_day_risk(day_of_week) if day_of_week else self.get_current_day_risk(),
+            **{name: float(values[0]) for name, values in location_features.items()},
+            'time_risk_score': self.get_time_risk(time_of_day) if time_of_day is not None else self.get_current_time_risk(),
+            'day_risk_score': self.get_day_risk(day_of_week) if day_of_week is not None else self.get_current_day_risk(),
             'weather_risk': 0.3
         }
 
+    def neighborhood_stats(self, lat, lon, radius):
+        """Sum incident and user report counts and severities within radius of a point"""
+        center = {'lat': lat, 'lon': lon}
+        crimes = self.get_incidents_in_radius(self.crime_data, center, radius)
+        accidents = self.get_incidents_in_radius(self.accident_data, center, radius)
+        
+        stats = {
+            'crime_count': len(crimes),
+            'crime_severity_sum': float(crimes.column('severity').sum(dtype=np.float64)),
+            'violent_crime_count': int(np.count_nonzero(crimes.mask('crime_type', 'violent'))),
+            'recent_crime_count': self.count_recent_near(self.crime_data, center, radius, 30),
+            'accident_count': len(accidents),
+            'pedestrian_accident_count': int(np.count_nonzero(accidents.column('pedestrian_involved'))),
+            'fatal_accident_count': int(np.count_nonzero(accidents.column('severity') >= np.float32(0.9))),
+            'intersection_accident_count': int(np.count_nonzero(accidents.column('intersection')))
+        }
+        for name, value in self.report_stats_near(lat, lon, radius).items():
+            stats[name] += value
+        return stats
+
     def generate_recommendations(self, features, safety_score):
         """Generate safety recommendations"""
         recommendations = []
@@ -132,32 +394,68 @@ class WalkSafeModel:
         else:
             return 'VERY_LOW'
 
-    def analyze_route(self, coordinates, walking_speed=3.0):
+    def analyze_route(self, coordinates, walking_speed=3.0, time_of_day=None, day_of_week=None):
         """Analyze safety along a walking route"""
-        if self.model is None:
+        if self.forest is None:
             raise ValueError("Model not loaded")
         
-        route_scores = []
-        danger_zones = []
+        route_scores = self.predict_safety_batch(coordinates, time_of_day, day_of_week)
+        return self.summarize_route(coordinates, np.array([score['safety_score'] for score in route_scores]),
+                                    [score['risk_level'] for score in route_scores], walking_speed)
+
+    def compare_routes(self, routes, walking_speed=3.0, time_of_day=None, day_of_week=None):
+        """Analyze several candidate routes at once and rank them, safest first
+
+        Waypoints are grouped by prediction cache cell across all routes and each
+        cell is scored once, so shared stretches cost nothing extra. Ties in
+        overall safety go to the shorter walk.
+        """
+        if self.forest is None:
+            raise ValueError("Model not loaded")
         
-        for i, coord in enumerate(coordinates):
-            prediction = self.predict_safety(coord['lat'], coord['lon'])
-            route_scores.append(prediction)
-            
-            # Identify danger zones
-            if prediction['safety_score'] < 0.4:
-                danger_zones.append({
-                    'lat': coord['lat'],
-                    'lon': coord['lon'],
-                    'safety_score': prediction['safety_score'],
-                    'risk_level': prediction['risk_level'],
-                    'waypoint_index': i
-                })
+        lats = np.array([coord['lat'] for route in routes for coord in route], dtype=np.float64)
+        lons = np.array([coord['lon'] for route in routes for coord in route], dtype=np.float64)
+        if self.cache_cell_size:
+            cells = GridIndex.cell_code(np.rint(lats / self.cache_cell_size), np.rint(lons / self.cache_cell_size))
+            _, first, inverse = np.unique(cells, return_index=True, return_inverse=True)
+        else:
+            _, first, inverse = np.unique(np.column_stack([lats, lons]), axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        
+        predictions = self.predict_safety_batch(
+            [{'lat': float(lats[i]), 'lon': float(lons[i])} for i in first], time_of_day, day_of_week)
+        scores = np.array([prediction['safety_score'] for prediction in predictions])[inverse]
+        risk_levels = np.array([prediction['risk_level'] for prediction in predictions], dtype=object)[inverse]
         
-        safety_scores = [score['safety_score'] for score in route_scores]
-        avg_safety = sum(safety_scores) / len(safety_scores)
-        min_safety = min(safety_scores)
-        max_safety = max(safety_scores)
+        analyses = []
+        offset = 0
+        for route in routes:
+            waypoints = slice(offset, offset + len(route))
+            analyses.append(self.summarize_route(route, scores[waypoints], risk_levels[waypoints], walking_speed))
+            offset += len(route)
+        
+        ranking = sorted(range(len(routes)), key=lambda i: (-analyses[i]['overall_safety'], analyses[i]['estimated_duration']))
+        return {
+            'routes': analyses,
+            'ranking': ranking,
+            'total_points': len(lats),
+            'unique_cells': len(first)
+        }
+
+    def summarize_route(self, coordinates, safety_scores, risk_levels, walking_speed):
+        """Build a route analysis from the safety score and risk level at each waypoint"""
+        # Identify danger zones
+        danger_zones = [{
+            'lat': coordinates[i]['lat'],
+            'lon': coordinates[i]['lon'],
+            'safety_score': float(safety_scores[i]),
+            'risk_level': risk_levels[i],
+            'waypoint_index': int(i)
+        } for i in np.flatnonzero(safety_scores < 0.4)]
+        
+        avg_safety = float(safety_scores.mean())
+        min_safety = float(safety_scores.min())
+        max_safety = float(safety_scores.max())
         
         # Calculate estimated walking time
         total_distance = self.calculate_route_distance(coordinates)
@@ -186,138 +484,376 @@ class WalkSafeModel:
             'danger_zones': danger_zones
         }
 
-    def get_nearby_alerts(self, lat, lon, radius=0.5):
-        """Get nearby safety alerts"""
-        alerts = []
+    def find_safe_route(self, start, end, safety_weight=2.0, walking_speed=3.0, time_of_day=None, day_of_week=None):
+        """Find the walking path between two points that best trades distance against risk
+
+        Searches the safety raster's grid of precomputed scores, where each step
+        costs its length times 1 + safety_weight x its risk; safety_weight 0 gives
+        the shortest path. Returns the path's waypoints and its route analysis.
+        """
+        if self.forest is None:
+            raise ValueError("Model not loaded")
+        if self.safety_raster is None:
+            raise ValueError("Safety raster not available")
+        self.refresh_recent_stats()
+        raster = self.safety_raster
+        for point in (start, end):
+            if not raster.contains(point['lat'], point['lon']):
+                raise ValueError(f"Point ({point['lat']}, {point['lon']}) is outside the routing area")
+        
+        time_level, day_level = self.get_risk_levels(time_of_day, day_of_week)
+        nodes, cost = find_path(raster, start['lat'], start['lon'], end['lat'], end['lon'],
+                                time_level, day_level, safety_weight)
+        rows, cols = np.divmod(nodes, raster.cols)
+        
+        # The path runs between grid nodes; the first and last legs reach the exact endpoints
+        coordinates = [{'lat': start['lat'], 'lon': start['lon']}]
+        coordinates += [{'lat': float(lat), 'lon': float(lon)} for lat, lon in zip(raster.lats[rows], raster.lons[cols])]
+        coordinates.append({'lat': end['lat'], 'lon': end['lon']})
+        
+        return {
+            'coordinates': coordinates,
+            'distance': self.calculate_route_distance(coordinates),
+            'cost': cost,
+            'safety_weight': safety_weight,
+            'analysis': self.analyze_route(coordinates, walking_speed, time_of_day, day_of_week)
+        }
+
+    def get_nearby_alerts(self, lat, lon, radius=0.5, limit=None):
+        """Get nearby safety alerts, most severe first, then nearest first"""
+        center = {'lat': lat, 'lon': lon}
+        
+        # Recent incident reports
+        reports, report_severities, report_distances = self.find_reports_in_radius(center, radius)
+        
+        # High-risk crimes in area
+        positions, crime_distances = self.find_incidents_in_radius(self.crime_data, center, radius)
+        crime_severities = self.crime_data.column_at('severity', positions)
+        high_risk = crime_severities > np.float32(0.7)
+        positions, crime_distances = positions[high_risk], crime_distances[high_risk]
+        crime_severities = crime_severities[high_risk].astype(np.float64)
         
-        # Check for recent incident reports
-        for report in self.incident_reports:
-            distance = self.calculate_distance(lat, lon, report['lat'], report['lon'])
-            if distance <= radius:
+        # Rank each source on its own, then merge only the survivors with a bounded heap
+        candidates = [(-report_severities[i], report_distances[i], 0, i)
+                      for i in self.top_alerts(report_severities, report_distances, limit)]
+        candidates += [(-crime_severities[i], crime_distances[i], 1, i)
+                       for i in self.top_alerts(crime_severities, crime_distances, MAX_CRIME_ALERTS)]
+        ranked = heapq.nsmallest(len(candidates) if limit is None else limit, candidates)
+        
+        alerts = []
+        for _, distance, source, i in ranked:
+            if source == 0:
+                report = reports[i]
                 alerts.append({
                     'lat': report['lat'],
                     'lon': report['lon'],
                     'alert_type': report['incident_type'],
                     'severity': report['severity'],
-                    'distance': distance,
+                    'distance': float(distance),
                     'description': report.get('description', 'User reported incident'),
                     'timestamp': report.get('timestamp', datetime.now().isoformat())
                 })
-        
-        # Check for high-risk crimes in area
-        nearby_crimes = self.get_incidents_in_radius(self.crime_data, {'lat': lat, 'lon': lon}, radius)
-        high_risk_crimes = [c for c in nearby_crimes if c['severity'] > 0.7]
-        
-        for crime in high_risk_crimes[:3]:  # Limit to 3 most severe
-            distance = self.calculate_distance(lat, lon, crime['lat'], crime['lon'])
-            alerts.append({
-                'lat': crime['lat'],
-                'lon': crime['lon'],
-                'alert_type': 'crime_alert',
-                'severity': crime['severity'],
-                'distance': distance,
-                'description': f"{crime['category']} reported in area",
-                'timestamp': crime['date']
-            })
-        
-        # Sort by severity
-        alerts = sorted(alerts, key=lambda x: x['severity'], reverse=True)
+            else:
+                crime = self.crime_data[positions[i]]
+                alerts.append({
+                    'lat': crime['lat'],
+                    'lon': crime['lon'],
+                    'alert_type': 'crime_alert',
+                    'severity': crime['severity'],
+                    'distance': float(distance),
+                    'description': f"{crime['category']} reported in area",
+                    'timestamp': crime['date']
+                })
         
         return alerts
 
+    def top_alerts(self, severities, distances, k):
+        """Get the indexes of the k most severe (then nearest) alerts in rank order"""
+        candidates = np.arange(len(severities))
+        if k is not None and len(severities) > k:
+            # Only alerts at least as severe as the k-th most severe can make the cut
+            kth = np.partition(severities, len(severities) - k)[len(severities) - k]
+            candidates = np.flatnonzero(severities >= kth)
+        order = np.lexsort((distances[candidates], -severities[candidates]))
+        return candidates[order][:k]
+
     def add_incident_report(self, report_data):
-        """Add incident report to the system"""
-        report_dict = {
-            **report_data,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.incident_reports.append(report_dict)
+        """Add incident report to the system, or to the model that replaced this one
+
+        A report stamped before it was logged keeps its timestamp.
+        """
+        with self.report_lock:
+            if self.successor is not None:
+                return self.successor.add_incident_report(report_data)
+            report_dict = {
+                **report_data,
+                'timestamp': report_data.get('timestamp') or datetime.now().isoformat()
+            }
+            self.incident_reports.append(report_dict)
+            if self.storage is not None:
+                self.storage.add_report(report_dict)
+            self.apply_incident_reports([report_dict])
         return report_dict
 
+    def add_replicated_reports(self, reports):
+        """Add reports another server process accepted and stored, or pass them to the model that replaced this one"""
+        with self.report_lock:
+            if self.successor is not None:
+                return self.successor.add_replicated_reports(reports)
+            self.incident_reports.extend(reports)
+            self.apply_incident_reports(reports)
+
+    def hand_over(self, successor, applied):
+        """Pass user reports on to a model replacing this one
+
+        successor was loaded with the first applied reports; the rest are folded in
+        and the report list is shared. Reports added to this model from then on,
+        e.g. by calls dispatched before the swap, are forwarded to successor.
+        """
+        with self.report_lock:
+            successor.apply_incident_reports(self.incident_reports[applied:])
+            successor.incident_reports = self.incident_reports
+            self.successor = successor
+
+    def report_contributions(self, report):
+        """Get the neighborhood stat weights a user report adds around its location"""
+        weight = self.report_weight
+        incident_type = str(report['incident_type']).lower()
+        if incident_type in ACCIDENT_REPORT_TYPES:
+            return {
+                'accident_count': weight,
+                'pedestrian_accident_count': weight if incident_type in PEDESTRIAN_REPORT_TYPES else 0.0,
+                'fatal_accident_count': weight if report['severity'] >= 0.9 else 0.0
+            }
+        return {
+            'crime_count': weight,
+            'crime_severity_sum': weight * report['severity'],
+            'violent_crime_count': weight if incident_type in VIOLENT_REPORT_TYPES else 0.0,
+            'recent_crime_count': weight
+        }
+
+    def apply_incident_reports(self, reports):
+        """Fold user reports into the neighborhood stats and refresh only the grid cells around them"""
+        if not reports:
+            return
+        with self.report_lock:
+            for report in reports:
+                contributions = self.report_contributions(report)
+                self.report_points.append((report['lat'], report['lon'], contributions))
+                self.report_timeline.add(report['timestamp'])
+                self.report_grid.add(report['lat'], report['lon'], report['severity'], report)
+                if self.safety_raster is not None:
+                    self.update_safety_raster(report['lat'], report['lon'], contributions)
+                self.refresh_danger_grid_near(report['lat'], report['lon'])
+            self.prediction_cache.clear()
+            self.data_version += 1
+
+    def report_stats_near(self, lat, lon, radius):
+        """Sum the stat weights of user reports within radius of a point"""
+        report_points = self.report_points
+        if not report_points:
+            return {}
+        # report_points only grows until a reload replaces it, so arrays built from
+        # the same list at the same length are current even if a report raced the build
+        arrays = self.report_arrays
+        if arrays is None or arrays['points'] is not report_points or arrays['count'] != len(report_points):
+            count = len(report_points)
+            points = report_points[:count]
+            names = {name for _, _, contributions in points for name in contributions}
+            arrays = {
+                'points': report_points,
+                'count': count,
+                'lat': np.array([point[0] for point in points]),
+                'lon': np.array([point[1] for point in points]),
+                'stats': {name: np.array([point[2].get(name, 0.0) for point in points]) for name in names}
+            }
+            self.report_arrays = arrays
+        
+        within = geo.local_distances(lat, lon, arrays['lat'], arrays['lon']) <= radius
+        return {name: float(values[within].sum()) for name, values in arrays['stats'].items()}
+
+    def update_safety_raster(self, lat, lon, contributions):
+        """Add one report to the raster stats and rescore only the nodes within its feature radius"""
+        raster = self.safety_raster
+        nodes = raster.add(lat, lon, contributions, FEATURE_RADIUS)
+        if not len(nodes):
+            return
+        
+        scores = raster.scores.reshape(len(TIME_RISK_LEVELS), len(DAY_RISK_LEVELS), -1)
+        scores[:, :, nodes] = self.score_stats({name: values[nodes] for name, values in raster.stats.items()})
+        
+        bounds = raster.node_bounds(nodes)
+        for pyramid in self.tile_pyramids.values():
+            pyramid.refresh(raster, bounds)
+
+    def refresh_recent_stats(self):
+        """Move the 30-day recent crime counts forward once the window has moved on since they were summed
+
+        Only crimes dated between the old and new raster cutoff are added or taken
+        away, and only the nodes around them are rescored. The danger grid is
+        rescored in full.
+        """
+        if not self.recent_stats_stale():
+            return
+        cutoff = self.recent_cutoff_ordinal(30)
+        with self.report_lock:
+            if self.recent_cutoff == cutoff:
+                return
+            if self.safety_raster is not None:
+                self.shift_raster_recent_cutoff(cutoff)
+            if self.danger_grid is not None:
+                self.refresh_danger_grid(np.arange(len(self.danger_grid['lats'])))
+            self.recent_cutoff = cutoff
+            self.prediction_cache.clear()
+            self.data_version += 1
+
+    def recent_stats_stale(self):
+        """Check whether the 30-day window has moved on since the recent crime counts were summed"""
+        return self.recent_cutoff != self.recent_cutoff_ordinal(30)
+
+    def shift_raster_recent_cutoff(self, cutoff):
+        """Recount the raster's recent crimes from a new cutoff date ordinal and rescore the nodes that changed"""
+        raster = self.safety_raster
+        if raster.recent_cutoff == cutoff:
+            return
+        raster.make_writable()
+        crimes = self.crime_data
+        if raster.recent_cutoff is None:
+            # Nothing records which day the counts were taken on, so count again from scratch
+            weights = (crimes.column('date') >= cutoff).astype(np.float64)
+            recent = raster.accumulate(crimes.column('lat'), crimes.column('lon'),
+                                       {'recent_crime_count': weights}, FEATURE_RADIUS)['recent_crime_count']
+            for lat, lon, contributions in self.report_points:
+                nodes = raster.nodes_within(lat, lon, FEATURE_RADIUS)
+                recent[nodes] += contributions.get('recent_crime_count', 0.0)
+            delta = recent - raster.stats['recent_crime_count']
+        else:
+            # Crimes between the two cutoffs leave the window when it moves forward and rejoin when it moves back
+            low, high = sorted((raster.recent_cutoff, cutoff))
+            moved = crimes.take(crimes.positions_between('date', low, high))
+            sign = -1.0 if cutoff > raster.recent_cutoff else 1.0
+            delta = raster.accumulate(moved.column('lat'), moved.column('lon'),
+                                      {'recent_crime_count': np.full(len(moved), sign)}, FEATURE_RADIUS)['recent_crime_count']
+        raster.recent_cutoff = cutoff
+        
+        nodes = np.flatnonzero(delta)
+        if not len(nodes):
+            return
+        raster.stats['recent_crime_count'] += delta
+        scores = raster.scores.reshape(len(TIME_RISK_LEVELS), len(DAY_RISK_LEVELS), -1)
+        scores[:, :, nodes] = self.score_stats({name: values[nodes] for name, values in raster.stats.items()})
+        
+        bounds = raster.node_bounds(nodes)
+        for pyramid in self.tile_pyramids.values():
+            pyramid.refresh(raster, bounds)
+
     def generate_heatmap_data(self, north, south, east, west, resolution=20, min_safety=0.0):
-        """Generate safety heatmap data"""
+        """Generate safety heatmap data
+
+        Like the tiles, the heatmap is read from the safety raster's bilinear
+        interpolation rather than the model, so a point's score may differ from
+        /predict by the raster's interpolation error.
+        """
         heatmap_data = []
         
-        lat_step = (north - south) / resolution
-        lon_step = (east - west) / resolution
-        
-        for i in range(resolution):
-            for j in range(resolution):
-                lat = south + i * lat_step
-                lon = west + j * lon_step
-                
-                # Check if point is within Delray Beach coverage
-                distance = self.calculate_distance(
-                    lat, lon, 
-                    self.delray_center['lat'], 
-                    self.delray_center['lon']
-                )
-                
-                if distance <= 3.0:
-                    prediction = self.predict_safety(lat, lon)
-                    
-                    # Filter by minimum safety score if specified
-                    if prediction['safety_score'] >= min_safety:
-                        heatmap_data.append({
-                            'lat': round(lat, 6),
-                            'lon': round(lon, 6),
-                            'safety_score': round(prediction['safety_score'], 3),
-                            'risk_level': prediction['risk_level']
-                        })
+        grid = self.get_coverage_grid(north, south, east, west, resolution)
+        predictions = self.predict_safety_batch([{'lat': lat, 'lon': lon} for lat, lon in grid], exact=False)
+        
+        for (lat, lon), prediction in zip(grid, predictions):
+            # Filter by minimum safety score if specified
+            if prediction['safety_score'] >= min_safety:
+                heatmap_data.append({
+                    'lat': round(lat, 6),
+                    'lon': round(lon, 6),
+                    'safety_score': round(prediction['safety_score'], 3),
+                    'risk_level': prediction['risk_level']
+                })
         
         return heatmap_data
 
+    def get_coverage_grid(self, north, south, east, west, resolution):
+        """Get grid points within the 3-mile Delray Beach coverage area"""
+        steps = np.arange(resolution)
+        lats = np.repeat(south + steps * ((north - south) / resolution), resolution)
+        lons = np.tile(west + steps * ((east - west) / resolution), resolution)
+        
+        distances = geo.haversine_distances(self.delray_center['lat'], self.delray_center['lon'], lats, lons)
+        covered = distances <= 3.0
+        return list(zip(lats[covered].tolist(), lons[covered].tolist()))
+
+    def build_danger_grid(self):
+        """Materialize safety scores of the danger zone grid for every time/day level"""
+        grid = self.get_coverage_grid(
+            DANGER_ZONE_BOUNDS['north'], DANGER_ZONE_BOUNDS['south'],
+            DANGER_ZONE_BOUNDS['east'], DANGER_ZONE_BOUNDS['west'], DANGER_ZONE_RESOLUTION
+        )
+        self.danger_grid = {
+            'lats': np.array([lat for lat, _ in grid]),
+            'lons': np.array([lon for _, lon in grid]),
+            'scores': np.zeros((len(TIME_RISK_LEVELS), len(DAY_RISK_LEVELS), len(grid)))
+        }
+        self.refresh_danger_grid(np.arange(len(grid)))
+
+    def refresh_danger_grid(self, positions):
+        """Recompute materialized danger grid scores at the given grid positions
+
+        Each point is scored exactly from its own neighborhood stats, at every
+        time/day level in one forest pass.
+        """
+        point_stats = [self.neighborhood_stats(self.danger_grid['lats'][i], self.danger_grid['lons'][i], FEATURE_RADIUS)
+                       for i in positions]
+        stats = {name: np.array([values[name] for values in point_stats], dtype=np.float64) for name in point_stats[0]}
+        scores = self.score_stats(stats)
+        
+        if not np.array_equal(self.danger_grid['scores'][:, :, positions], scores):
+            self.danger_grid['scores'][:, :, positions] = scores
+            self.danger_zone_results.clear()
+
+    def refresh_danger_grid_near(self, lat, lon):
+        """Recompute danger grid cells whose neighborhood features include a location"""
+        if self.danger_grid is None:
+            return
+        distances = geo.local_distances(lat, lon, self.danger_grid['lats'], self.danger_grid['lons'])
+        positions = np.flatnonzero(distances <= FEATURE_RADIUS)
+        if len(positions):
+            self.refresh_danger_grid(positions)
+
     def get_danger_zones(self, danger_threshold=0.4, high_danger_threshold=0.25):
         """Get danger zones for map visualization"""
-        danger_zones = []
+        if self.danger_grid is None:
+            raise ValueError("Model not loaded")
+        self.refresh_recent_stats()
         
-        # Generate grid points and find dangerous ones
-        resolution = 25
-        bounds = {
-            'north': 26.50, 'south': 26.42,
-            'east': -80.05, 'west': -80.10
-        }
+        # Filter the materialized grid for the current time/day level
+        time_level, day_level = self.get_risk_levels()
+        key = (danger_threshold, high_danger_threshold, time_level, day_level)
+        danger_zones = self.danger_zone_results.get(key)
         
-        lat_step = (bounds['north'] - bounds['south']) / resolution
-        lon_step = (bounds['east'] - bounds['west']) / resolution
-        
-        for i in range(resolution):
-            for j in range(resolution):
-                lat = bounds['south'] + i * lat_step
-                lon = bounds['west'] + j * lon_step
-                
-                distance = self.calculate_distance(lat, lon, self.delray_center['lat'], self.delray_center['lon'])
-                if distance <= 3.0:
-                    prediction = self.predict_safety(lat, lon)
-                    
-                    if prediction['safety_score'] < danger_threshold:
-                        danger_level = "HIGH" if prediction['safety_score'] < high_danger_threshold else "MODERATE"
-                        
-                        danger_zones.append({
-                            'lat': lat,
-                            'lon': lon,
-                            'safety_score': prediction['safety_score'],
-                            'danger_level': danger_level,
-                            'confidence': prediction['confidence']
-                        })
-        
-        return danger_zones
+        if danger_zones is None:
+            scores = self.danger_grid['scores'][time_level, day_level]
+            danger_zones = []
+            for i in np.flatnonzero(scores < danger_threshold):
+                safety_score = float(scores[i])
+                danger_zones.append({
+                    'lat': float(self.danger_grid['lats'][i]),
+                    'lon': float(self.danger_grid['lons'][i]),
+                    'safety_score': safety_score,
+                    'danger_level': "HIGH" if safety_score < high_danger_threshold else "MODERATE",
+                    'confidence': float(abs(safety_score - 0.5) * 2)
+                })
+            self.danger_zone_results.put(key, danger_zones)
+        
+        return list(danger_zones)
 
     def get_statistics(self):
         """Get safety statistics"""
-        # Calculate area statistics
-        high_risk_crimes = [c for c in self.crime_data if c['severity'] > 0.7]
-        pedestrian_accidents = [a for a in self.accident_data if a['pedestrian_involved']]
-        recent_reports = [r for r in self.incident_reports 
-                         if datetime.fromisoformat(r['timestamp']) > datetime.now() - timedelta(days=7)]
-        
         return {
             "delray_beach_stats": {
                 "total_crimes": len(self.crime_data),
-                "high_risk_crimes": len(high_risk_crimes),
+                "high_risk_crimes": self.incident_counts['high_risk_crimes'],
                 "total_accidents": len(self.accident_data),
-                "pedestrian_accidents": len(pedestrian_accidents),
-                "user_reports_this_week": len(recent_reports)
+                "pedestrian_accidents": self.incident_counts['pedestrian_accidents'],
+                "user_reports_this_week": self.report_timeline.count_between(datetime.now() - timedelta(days=7))
             },
             "safety_insights": {
                 "most_dangerous_time": "10 PM - 5 AM",
@@ -328,72 +864,203 @@ class WalkSafeModel:
             "last_updated": datetime.now().isoformat()
         }
 
+    def build_safety_raster(self, step):
+        """Precompute neighborhood stats and safety scores on a grid for every time/day level"""
+        raster = SafetyRaster(step=step)
+        raster.recent_cutoff = self.recent_cutoff_ordinal(30)
+        raster.stats = self.compute_neighborhood_stats(raster, FEATURE_RADIUS, raster.recent_cutoff)
+        raster.scores = self.score_stats(raster.stats).reshape(
+            len(TIME_RISK_LEVELS), len(DAY_RISK_LEVELS), raster.rows, raster.cols)
+        
+        logger.info(f"Safety raster: {raster.rows}x{raster.cols} nodes, {raster.nbytes() / 1e6:.1f} MB")
+        return raster
+
+    def score_stats(self, stats):
+        """Score neighborhood stat arrays at every time/day risk level as a (time, day, node) array"""
+        location_features = self.features_from_stats(stats, FEATURE_RADIUS)
+        node_count = len(stats['crime_count'])
+        
+        feature_blocks = []
+        for time_risk in TIME_RISK_LEVELS:
+            for day_risk in DAY_RISK_LEVELS:
+                features = {
+                    **location_features,
+                    'time_risk_score': np.full(node_count, time_risk),
+                    'day_risk_score': np.full(node_count, day_risk),
+                    'weather_risk': np.full(node_count, 0.3)
+                }
+                feature_blocks.append(np.column_stack([features.get(name, np.zeros(node_count)) for name in self.features_config]))
+        
+        scores = np.clip(self.forest.predict(np.vstack(feature_blocks)), 0.0, 1.0)
+        return scores.reshape(len(TIME_RISK_LEVELS), len(DAY_RISK_LEVELS), node_count)
+
+    def get_risk_levels(self, time_of_day=None, day_of_week=None):
+        """Get the raster time and day level indexes for an hour and weekday"""
+        time_risk = self.get_time_risk(time_of_day) if time_of_day is not None else self.get_current_time_risk()
+        day_risk = self.get_day_risk(day_of_week) if day_of_week is not None else self.get_current_day_risk()
+        return TIME_RISK_LEVELS.index(time_risk), DAY_RISK_LEVELS.index(day_risk)
+
+    def get_tile_pyramid(self, time_level, day_level):
+        """Get the tile pyramid for a time/day level, building it on first use"""
+        self.refresh_recent_stats()
+        key = (time_level, day_level)
+        pyramid = self.tile_pyramids.get(key)
+        if pyramid is None:
+            if self.safety_raster is None:
+                raise ValueError("Safety raster not available")
+            pyramid = TilePyramid(self.safety_raster, time_level, day_level, self.delray_center)
+            self.tile_pyramids[key] = pyramid
+        return pyramid
+
+    def get_safety_tile(self, z, x, y, time_level, day_level):
+        """Get the safety score grid of a slippy-map tile"""
+        cells = self.get_tile_pyramid(time_level, day_level).tile(z, x, y)
+        scores = np.round(cells.astype(np.float64), 3)
+        
+        return {
+            'z': z,
+            'x': x,
+            'y': y,
+            'size': TILE_SIZE,
+            'time_risk_score': TIME_RISK_LEVELS[time_level],
+            'day_risk_score': DAY_RISK_LEVELS[day_level],
+            'scores': [[None if math.isnan(score) else score for score in row] for row in scores.tolist()]
+        }
+
+    def compute_neighborhood_stats(self, raster, radius, recent_cutoff):
+        """Sum incident counts and severities around every raster node, counting crimes from recent_cutoff as recent"""
+        crimes = self.crime_data
+        accidents = self.accident_data
+        
+        stats = raster.accumulate(crimes.column('lat'), crimes.column('lon'), {
+            'crime_count': np.ones(len(crimes)),
+            'crime_severity_sum': crimes.column('severity'),
+            'violent_crime_count': crimes.mask('crime_type', 'violent'),
+            'recent_crime_count': crimes.column('date') >= recent_cutoff
+        }, radius)
+        stats.update(raster.accumulate(accidents.column('lat'), accidents.column('lon'), {
+            'accident_count': np.ones(len(accidents)),
+            'pedestrian_accident_count': accidents.column('pedestrian_involved'),
+            'fatal_accident_count': accidents.column('severity') >= np.float32(0.9),
+            'intersection_accident_count': accidents.column('intersection')
+        }, radius))
+        return stats
+
+    def features_from_stats(self, stats, radius):
+        """Turn neighborhood stat arrays into the location feature arrays of extract_location_features"""
+        area = math.pi * radius * radius
+        crime_count = stats['crime_count']
+        accident_count = stats['accident_count']
+        
+        def ratio(values, counts):
+            return np.divide(values, counts, out=np.zeros(len(counts)), where=counts > 0)
+        
+        return {
+            'crime_density': crime_count / area,
+            'crime_severity_avg': ratio(stats['crime_severity_sum'], crime_count),
+            'violent_crime_ratio': ratio(stats['violent_crime_count'], crime_count),
+            'recent_crime_count': stats['recent_crime_count'],
+            'accident_density': accident_count / area,
+            'pedestrian_accident_ratio': ratio(stats['pedestrian_accident_count'], accident_count),
+            'fatal_accident_ratio': ratio(stats['fatal_accident_count'], accident_count),
+            'intersection_accident_ratio': ratio(stats['intersection_accident_count'], accident_count)
+        }
+
     # Helper methods
+    def build_spatial_index(self, incidents):
+        """Build a grid bucket index over incident locations, sorted by date within each cell"""
+        return GridIndex(incidents.column('lat'), incidents.column('lon'), keys=incidents.column('date'))
+
+    def get_storage_table(self, incidents):
+        """Get the storage backend table holding an incident store, if any"""
+        if self.storage_tables is None:
+            return None
+        if incidents is self.crime_data:
+            return self.storage_tables['crimes']
+        if incidents is self.accident_data:
+            return self.storage_tables['accidents']
+        return None
+
+    def get_spatial_index(self, incidents):
+        """Get the spatial index built for an incident list, if any"""
+        if incidents is self.crime_data:
+            return self.crime_index
+        if incidents is self.accident_data:
+            return self.accident_index
+        return None
+
+    def find_incidents_in_radius(self, incidents, center, radius):
+        """Get positions and distances of incidents within radius of a point"""
+        table = self.get_storage_table(incidents)
+        if table is not None:
+            return self.storage.find_incidents_in_radius(table, center['lat'], center['lon'], radius)
+        
+        index = self.get_spatial_index(incidents)
+        if index is not None and index.size == len(incidents):
+            # Only scan the grid buckets that overlap the search radius
+            positions = index.candidates(center['lat'], center['lon'], radius)
+            lats, lons = index.lats[positions], index.lons[positions]
+        elif isinstance(incidents, IncidentStore):
+            positions = np.arange(len(incidents))
+            lats, lons = incidents.column('lat'), incidents.column('lon')
+        else:
+            positions = np.arange(len(incidents))
+            lats = np.array([incident['lat'] for incident in incidents], dtype=np.float64)
+            lons = np.array([incident['lon'] for incident in incidents], dtype=np.float64)
+        
+        distances = geo.local_distances(center['lat'], center['lon'], lats, lons)
+        within = distances <= radius
+        return positions[within], distances[within]
+
+    def find_reports_in_radius(self, center, radius):
+        """Get the user reports within radius of a point with their severities and distances"""
+        if self.storage is not None:
+            # The shared store also holds reports sent to other server processes
+            matches = self.storage.reports_in_radius(center['lat'], center['lon'], radius)
+            reports = [report for report, _ in matches]
+            severities = np.array([report['severity'] for report in reports], dtype=np.float64)
+            return reports, severities, np.array([distance for _, distance in matches], dtype=np.float64)
+        return self.report_grid.query(center['lat'], center['lon'], radius)
+
     def get_incidents_in_radius(self, incidents, center, radius):
         """Get incidents within radius of a point"""
-        nearby_incidents = []
-        for incident in incidents:
-            distance = self.calculate_distance(
-                incident['lat'], incident['lon'],
-                center['lat'], center['lon']
-            )
-            if distance <= radius:
-                nearby_incidents.append(incident)
-        return nearby_incidents
+        positions, _ = self.find_incidents_in_radius(incidents, center, radius)
+        if isinstance(incidents, IncidentStore):
+            return incidents.take(positions)
+        return [incidents[i] for i in positions]
 
-    def calculate_density(self, incidents, radius):
-        """Calculate incident density per square mile"""
-        area = math.pi * radius * radius
-        return len(incidents) / area if area > 0 else 0
-
-    def calculate_average_severity(self, crimes):
-        """Calculate average severity of crimes"""
-        if not crimes:
-            return 0
-        return sum(crime.get('severity', 0.5) for crime in crimes) / len(crimes)
-
-    def calculate_violent_crime_ratio(self, crimes):
-        """Calculate ratio of violent crimes"""
-        if not crimes:
-            return 0
-        violent_crimes = [c for c in crimes if c['crime_type'] == 'violent']
-        return len(violent_crimes) / len(crimes)
-
-    def calculate_pedestrian_ratio(self, accidents):
-        """Calculate ratio of pedestrian accidents"""
-        if not accidents:
-            return 0
-        ped_accidents = [a for a in accidents if a['pedestrian_involved']]
-        return len(ped_accidents) / len(accidents)
-
-    def calculate_fatal_ratio(self, accidents):
-        """Calculate ratio of fatal accidents"""
-        if not accidents:
-            return 0
-        fatal_accidents = [a for a in accidents if a['severity'] >= 0.9]
-        return len(fatal_accidents) / len(accidents)
-
-    def calculate_intersection_ratio(self, accidents):
-        """Calculate ratio of intersection accidents"""
-        if not accidents:
-            return 0
-        intersection_accidents = [a for a in accidents if a['intersection']]
-        return len(intersection_accidents) / len(accidents)
-
-    def count_recent_incidents(self, incidents, days):
-        """Count incidents within recent days"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        recent_count = 0
+    def count_recent_near(self, incidents, center, radius, days):
+        """Count incidents within radius of a point dated within recent days"""
+        cutoff = self.recent_cutoff_ordinal(days)
+        index = self.get_spatial_index(incidents)
+        if index is not None and index.size == len(incidents):
+            return index.count_within(center['lat'], center['lon'], radius, cutoff)
+        positions, _ = self.find_incidents_in_radius(incidents, center, radius)
+        return int(np.count_nonzero(incidents.column_at('date', positions) >= cutoff))
+
+    def get_recent_incidents(self, lat, lon, radius, days):
+        """Count crimes, accidents and user reports within radius of a point in the last days"""
+        center = {'lat': lat, 'lon': lon}
+        since = datetime.now() - timedelta(days=days)
+        reports = [report for report in self.find_reports_in_radius(center, radius)[0]
+                   if epoch_seconds(report['timestamp']) > since.timestamp()]
         
-        for incident in incidents:
-            try:
-                incident_date = datetime.strptime(incident['date'], '%Y-%m-%d')
-                if incident_date >= cutoff_date:
-                    recent_count += 1
-            except (ValueError, KeyError):
-                continue
+        return {
+            'crimes': self.count_recent_near(self.crime_data, center, radius, days),
+            'accidents': self.count_recent_near(self.accident_data, center, radius, days),
+            'user_reports': len(reports),
+            'since': since.isoformat()
+        }
+
+    def recent_cutoff_ordinal(self, days):
+        """Get the first incident date ordinal that counts as within recent days"""
+        cutoff_date = datetime.now() - timedelta(days=days)
         
-        return recent_count
+        # Incident dates are midnights, so a cutoff later in the day excludes its own date
+        cutoff_ordinal = cutoff_date.toordinal()
+        if cutoff_date.time() != datetime.min.time():
+            cutoff_ordinal += 1
+        return cutoff_ordinal
 
     def get_current_time_risk(self):
         """Get risk score for current time"""
@@ -431,27 +1098,11 @@ class WalkSafeModel:
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points in miles"""
-        R = 3959  # Earth radius in miles
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(delta_lon/2) * math.sin(delta_lon/2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+        return geo.calculate_distance(lat1, lon1, lat2, lon2)
 
     def calculate_route_distance(self, coordinates):
         """Calculate total route distance in miles"""
-        total_distance = 0
-        for i in range(len(coordinates) - 1):
-            distance = self.calculate_distance(
-                coordinates[i]['lat'], coordinates[i]['lon'],
-                coordinates[i+1]['lat'], coordinates[i+1]['lon']
-            )
-            total_distance += distance
-        return total_distance
\ No newline at end of file
+        return geo.path_distance(
+            [coord['lat'] for coord in coordinates],
+            [coord['lon'] for coord in coordinates]
+        )
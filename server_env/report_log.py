@@ -0,0 +1,371 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = "snapshot.json"
+LOCK_NAME = "LOCK"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+SLOT_PREFIX = "worker-"
+
+class LogLockedError(RuntimeError):
+    """Raised when another process already owns a report log directory"""
+
+def segment_name(first_seq):
+    """Get the file name of the log segment whose first record is first_seq"""
+    return f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}"
+
+def list_segments(directory):
+    """Get (first record number, file name) of every log segment in a directory in order"""
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            found.append((int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), name))
+    return sorted(found)
+
+def slot_directory(base, slot):
+    """Get the log directory of a worker slot: base itself for slot 0, else a worker-<slot> subdirectory"""
+    return base if slot == 0 else os.path.join(base, f"{SLOT_PREFIX}{slot}")
+
+def slot_directories(base):
+    """Get the log directories of every worker slot created under base, in slot order"""
+    slots = [(0, base)]
+    if os.path.isdir(base):
+        for name in os.listdir(base):
+            if name.startswith(SLOT_PREFIX) and name[len(SLOT_PREFIX):].isdigit():
+                slots.append((int(name[len(SLOT_PREFIX):]), os.path.join(base, name)))
+    return [directory for _, directory in sorted(slots)]
+
+def claim_report_log(base, **options):
+    """Recover the report log of the first worker slot under base that no other process owns
+
+    Pre-forked workers each claim their own slot, so every accepted report is on
+    disk in exactly one of them. Returns the log and the records it recovered.
+    """
+    slot = 0
+    while True:
+        report_log = ReportLog(slot_directory(base, slot), **options)
+        try:
+            return report_log, report_log.recover()
+        except LogLockedError:
+            slot += 1
+
+def encode_record(record):
+    """Encode a record as one checksummed log line"""
+    payload = json.dumps(record, separators=(',', ':')).encode()
+    return b'%08x %s\n' % (zlib.crc32(payload), payload)
+
+def decode_records(data):
+    """Decode log lines, stopping at the first torn or corrupt one
+
+    Returns the records and the byte length of the valid prefix.
+    """
+    lines = data.split(b'\n')
+    # The last piece is empty after a complete final line, else a torn one
+    payloads = []
+    valid = 0
+    for line in lines[:-1]:
+        payload = line[9:]
+        if line[8:9] != b' ' or line[:8] != b'%08x' % zlib.crc32(payload):
+            break
+        payloads.append(payload)
+        valid += len(line) + 1
+
+    try:
+        # One parse of the whole batch is several times faster than a parse per line
+        return json.loads(b'[%s]' % b','.join(payloads)), valid
+    except ValueError:
+        pass
+    records = []
+    valid = 0
+    for payload in payloads:
+        try:
+            records.append(json.loads(payload))
+        except ValueError:
+            break
+        valid += len(payload) + 10
+    return records, valid
+
+def fsync_directory(directory):
+    """Make renames and new files in a directory durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ReportLog:
+    """Append-only, group-committed write-ahead log of user incident reports
+
+    Records go to numbered segment files as checksummed JSON lines. A single writer
+    thread gathers every record appended while the previous fsync was running (or
+    within commit_interval seconds) and commits them with one write and one fsync,
+    so bursts cost one fsync per batch instead of per report. Every snapshot_every
+    records the log starts a new segment and writes all records so far as one compact
+    snapshot in the background; segments the snapshot covers are then deleted.
+    recover() loads the snapshot and replays the segments after it, dropping a torn
+    tail left by a crash. One process owns a log directory at a time; others may
+    read it with a LogFollower.
+    """
+
+    def __init__(self, directory, commit_interval=0.002, max_batch=1024, snapshot_every=100000):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.snapshot_every = snapshot_every
+
+        self.records = []
+        self.pending = []
+        self.condition = threading.Condition()
+        self.closed = False
+        self.segment = None
+        self.segment_start = 0
+        self.snapshot_seq = 0
+        self.snapshot_thread = None
+        self.writer = None
+        self.lock_file = None
+
+        self.commits = 0
+        self.committed = 0
+        self.snapshots = 0
+
+    def recover(self):
+        """Lock the directory, load the snapshot, replay the log and start the writer
+
+        Returns every durable record in append order.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock_file = open(os.path.join(self.directory, LOCK_NAME), 'a')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_file.close()
+            self.lock_file = None
+            raise LogLockedError(f"Report log {self.directory} is in use by another process")
+
+        start = time.perf_counter()
+        records = []
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'rb') as f:
+                records = json.load(f)['records']
+        self.snapshot_seq = len(records)
+
+        for first_seq, name in self.segments():
+            path = os.path.join(self.directory, name)
+            with open(path, 'rb') as f:
+                segment_records, valid = decode_records(f.read())
+            if first_seq > len(records):
+                raise RuntimeError(f"Report log segment {name} starts after record {len(records)}; records are missing")
+            # Segments may overlap a snapshot written after they were
+            records.extend(segment_records[len(records) - first_seq:])
+            if valid < os.path.getsize(path):
+                logger.warning(f"Dropping torn tail of report log segment {name}")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid)
+                    os.fsync(f.fileno())
+
+        self.records = records
+        self.open_segment(len(records))
+        self.writer = threading.Thread(target=self.write_loop, name="walksafe-report-log", daemon=True)
+        self.writer.start()
+        logger.info(f"Recovered {len(records)} reports from {self.directory} in {time.perf_counter() - start:.2f} s "
+                    f"({self.snapshot_seq} from snapshot)")
+        return list(records)
+
+    def segments(self):
+        """Get (first record number, file name) of every log segment in order"""
+        return list_segments(self.directory)
+
+    def open_segment(self, first_seq):
+        """Close the current segment and start appending to a new one"""
+        if self.segment is not None:
+            self.segment.close()
+        path = os.path.join(self.directory, segment_name(first_seq))
+        self.segment = open(path, 'ab', buffering=0)
+        self.segment_start = first_seq
+        fsync_directory(self.directory)
+
+    def append(self, record):
+        """Queue a record for the next group commit
+
+        Returns a Future that resolves to the record's number once it is on disk.
+        """
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Report log is closed")
+            self.pending.append((record, future))
+            self.condition.notify()
+        return future
+
+    def write_loop(self):
+        """Commit queued records in batches until the log is closed"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                # Give a burst a moment to gather into this commit
+                deadline = time.monotonic() + self.commit_interval
+                while len(self.pending) < self.max_batch and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.pending[:self.max_batch]
+                del self.pending[:self.max_batch]
+            self.commit(batch)
+
+    def commit(self, batch):
+        """Write and fsync a batch of records, then resolve their futures"""
+        try:
+            self.segment.write(b''.join(encode_record(record) for record, _ in batch))
+            os.fsync(self.segment.fileno())
+        except Exception as e:
+            logger.error(f"Report log commit failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        first_seq = len(self.records)
+        self.records.extend(record for record, _ in batch)
+        self.commits += 1
+        self.committed += len(batch)
+        for offset, (_, future) in enumerate(batch):
+            future.set_result(first_seq + offset)
+
+        if len(self.records) - self.snapshot_seq >= self.snapshot_every and \
+                (self.snapshot_thread is None or not self.snapshot_thread.is_alive()):
+            self.start_snapshot()
+
+    def start_snapshot(self):
+        """Start a new segment and snapshot every record before it in the background"""
+        seq = len(self.records)
+        self.open_segment(seq)
+        self.snapshot_thread = threading.Thread(
+            target=self.write_snapshot, args=(self.records[:seq],), name="walksafe-report-snapshot", daemon=True)
+        self.snapshot_thread.start()
+
+    def write_snapshot(self, records):
+        """Write records as the snapshot, then delete the segments it covers"""
+        try:
+            path = os.path.join(self.directory, SNAPSHOT_NAME)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'seq': len(records), 'records': records}, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            fsync_directory(self.directory)
+        except Exception as e:
+            logger.error(f"Report log snapshot failed: {e}")
+            return
+
+        self.snapshot_seq = len(records)
+        self.snapshots += 1
+        for first_seq, name in self.segments():
+            if first_seq < self.snapshot_seq:
+                os.remove(os.path.join(self.directory, name))
+        logger.info(f"Report log snapshot of {len(records)} records written")
+
+    def close(self):
+        """Commit queued records, stop the writer and release the directory"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.writer is not None:
+            self.writer.join()
+        if self.snapshot_thread is not None:
+            self.snapshot_thread.join()
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def stats(self):
+        """Get log size and commit counters"""
+        return {
+            'records': len(self.records),
+            'pending': len(self.pending),
+            'commits': self.commits,
+            'average_batch': self.committed / self.commits if self.commits else 0.0,
+            'snapshot_records': self.snapshot_seq,
+            'snapshots': self.snapshots
+        }
+
+class LogFollower:
+    """Read-only tail of a report log directory owned by another process
+
+    poll() returns the records committed since the previous poll. It remembers how
+    far into which segment it has read, only reads the snapshot when records it has
+    not seen are no longer in any segment, and never writes to the directory, so
+    the owner may snapshot, delete segments or restart while it is followed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.seq = 0
+        self.segment = None
+        self.offset = 0
+
+    def poll(self):
+        """Get the records committed since the previous poll, in append order"""
+        records = []
+        if not os.path.isdir(self.directory):
+            return records
+        segments = list_segments(self.directory)
+        if not segments or segments[0][0] > self.seq:
+            records.extend(self.read_snapshot())
+
+        for i, (first_seq, name) in enumerate(segments):
+            if i + 1 < len(segments) and segments[i + 1][0] <= self.seq:
+                continue
+            if first_seq > self.seq:
+                logger.warning(f"Report log {self.directory} has no records {self.seq} to {first_seq - 1}")
+                self.seq, self.segment = first_seq, None
+            try:
+                records.extend(self.read_segment(first_seq, name))
+            except FileNotFoundError:
+                # Deleted under a newer snapshot, which the next poll reads
+                self.segment = None
+                break
+        return records
+
+    def read_segment(self, first_seq, name):
+        """Read the complete records of a segment past those already returned"""
+        if name == self.segment:
+            offset, seq = self.offset, self.seq
+        else:
+            offset, seq = 0, first_seq
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # A line still being written fails its checksum and is read again next poll
+        records, valid = decode_records(data)
+        new_records = records[self.seq - seq:]
+        self.seq = max(self.seq, seq + len(records))
+        self.segment, self.offset = name, offset + valid
+        return new_records
+
+    def read_snapshot(self):
+        """Read the snapshot records past those already returned"""
+        try:
+            with open(os.path.join(self.directory, SNAPSHOT_NAME), 'rb') as f:
+                snapshot = json.load(f)['records']
+        except FileNotFoundError:
+            return []
+        records = snapshot[self.seq:]
+        self.seq = max(self.seq, len(snapshot))
+        self.segment = None
+        return records
@@ -0,0 +1,38 @@
+from bisect import bisect_right, insort
+from datetime import datetime
+
+def epoch_seconds(timestamp):
+    """Convert an ISO timestamp string or datetime to epoch seconds (naive values are local time)"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+class ReportTimeline:
+    """Report times kept as sorted epoch seconds, so window counts are two bisects
+
+    Reports almost always arrive in time order, which makes add an append; older
+    timestamps (e.g. replayed out of order) are inserted in place.
+    """
+
+    def __init__(self):
+        self.times = []
+
+    def add(self, timestamp):
+        """Record one report time"""
+        seconds = epoch_seconds(timestamp)
+        if not self.times or seconds >= self.times[-1]:
+            self.times.append(seconds)
+        else:
+            insort(self.times, seconds)
+
+    def count_between(self, start, end=None):
+        """Count reports after start and at or before end (default: no upper bound)"""
+        stop = len(self.times) if end is None else bisect_right(self.times, epoch_seconds(end))
+        return max(stop - bisect_right(self.times, epoch_seconds(start)), 0)
+
+    def clear(self):
+        """Forget every report time"""
+        self.times = []
+
+    def __len__(self):
+        return len(self.times)
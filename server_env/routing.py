@@ -0,0 +1,84 @@
+import math
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import dijkstra
+from spatial_index import DEGREES_PER_MILE
+
+# Smallest detour margin in miles searched around the start/end box
+MIN_ROUTE_MARGIN = 0.25
+
+def node_window(raster, start_node, end_node, margin):
+    """Get the (row_min, row_max, col_min, col_max) raster window around two nodes plus margin miles"""
+    start_row, start_col = divmod(int(start_node), raster.cols)
+    end_row, end_col = divmod(int(end_node), raster.cols)
+    max_lat = max(abs(raster.bounds['north']), abs(raster.bounds['south']))
+    row_reach = math.ceil(margin * DEGREES_PER_MILE / raster.step)
+    col_reach = math.ceil(margin * DEGREES_PER_MILE / math.cos(math.radians(max_lat)) / raster.step)
+    return (max(min(start_row, end_row) - row_reach, 0), min(max(start_row, end_row) + row_reach, raster.rows - 1),
+            max(min(start_col, end_col) - col_reach, 0), min(max(start_col, end_col) + col_reach, raster.cols - 1))
+
+def window_graph(raster, window, time_level, day_level, safety_weight):
+    """Build the 8-connected cost graph of a raster window
+
+    An edge costs its length in miles times 1 + safety_weight x the mean risk
+    (1 - safety score) of its two nodes, so costs are never below the length.
+    """
+    row_min, row_max, col_min, col_max = window
+    rows, cols = row_max - row_min + 1, col_max - col_min + 1
+    risk = 1.0 - raster.scores[time_level, day_level, row_min:row_max + 1, col_min:col_max + 1]
+    ids = np.arange(rows * cols).reshape(rows, cols)
+
+    dy = raster.step / DEGREES_PER_MILE
+    dx = dy * np.cos(np.radians(raster.lats[row_min:row_max + 1]))[:, None]
+    mid_dx = (dx[:-1] + dx[1:]) / 2
+    diagonal = np.sqrt(mid_dx * mid_dx + dy * dy)
+
+    # East, north, north-east and north-west neighbours; the graph is undirected
+    edges = [
+        (ids[:, :-1], ids[:, 1:], np.broadcast_to(dx, (rows, cols - 1)), risk[:, :-1] + risk[:, 1:]),
+        (ids[:-1, :], ids[1:, :], np.full((rows - 1, cols), dy), risk[:-1, :] + risk[1:, :]),
+        (ids[:-1, :-1], ids[1:, 1:], np.broadcast_to(diagonal, (rows - 1, cols - 1)), risk[:-1, :-1] + risk[1:, 1:]),
+        (ids[:-1, 1:], ids[1:, :-1], np.broadcast_to(diagonal, (rows - 1, cols - 1)), risk[:-1, 1:] + risk[1:, :-1])
+    ]
+    sources = np.concatenate([source.ravel() for source, _, _, _ in edges])
+    targets = np.concatenate([target.ravel() for _, target, _, _ in edges])
+    costs = np.concatenate([(length * (1.0 + safety_weight * risk_sum / 2)).ravel() for _, _, length, risk_sum in edges])
+    return coo_matrix((costs, (sources, targets)), shape=(rows * cols, rows * cols)).tocsr()
+
+def find_path(raster, start_lat, start_lon, end_lat, end_lon, time_level, day_level, safety_weight):
+    """Find the lowest-cost node path between two in-bounds points
+
+    Runs Dijkstra over a window around the two points. No edge costs less than
+    its length, so a path leaving a window of margin m is at least 2m long; when
+    the best path inside costs more than that, the margin grows and the search
+    reruns. The result is the same path a search of the whole raster would find.
+    Returns the flat raster node indexes of the path and its cost.
+    """
+    start_node, end_node = raster.nearest_nodes([start_lat, end_lat], [start_lon, end_lon])
+    if start_node == end_node:
+        return np.array([start_node]), 0.0
+
+    straight = math.hypot((end_lat - start_lat), (end_lon - start_lon) * math.cos(math.radians(start_lat))) / DEGREES_PER_MILE
+    margin = max(MIN_ROUTE_MARGIN, straight / 2)
+    while True:
+        window = node_window(raster, start_node, end_node, margin)
+        row_min, row_max, col_min, col_max = window
+        cols = col_max - col_min + 1
+        start_row, start_col = divmod(int(start_node), raster.cols)
+        end_row, end_col = divmod(int(end_node), raster.cols)
+        source = (start_row - row_min) * cols + start_col - col_min
+        target = (end_row - row_min) * cols + end_col - col_min
+
+        graph = window_graph(raster, window, time_level, day_level, safety_weight)
+        costs, predecessors = dijkstra(graph, directed=False, indices=source, return_predecessors=True)
+        cost = float(costs[target])
+        covers_raster = window == (0, raster.rows - 1, 0, raster.cols - 1)
+        if cost <= 2 * margin or covers_raster:
+            break
+        margin = cost / 2
+
+    path = [target]
+    while path[-1] != source:
+        path.append(predecessors[path[-1]])
+    local_rows, local_cols = np.divmod(np.array(path[::-1]), cols)
+    return (local_rows + row_min) * raster.cols + local_cols + col_min, cost
@@ -0,0 +1,139 @@
+import math
+import numpy as np
+import geo
+from spatial_index import DEGREES_PER_MILE
+
+# Area served by the API (matches the LocationRequest bounds in server.py)
+RASTER_BOUNDS = {'north': 26.50, 'south': 26.40, 'east': -80.00, 'west': -80.15}
+
+class SafetyRaster:
+    """Regular lat/lon grid of neighborhood statistics and precomputed safety scores
+
+    Values live on grid nodes. scores has shape (time levels, day levels, rows, cols)
+    and is read with bilinear interpolation between the four surrounding nodes.
+    recent_cutoff is the first date ordinal counted in the recent crime stat.
+    """
+
+    def __init__(self, bounds=RASTER_BOUNDS, step=0.0005):
+        self.bounds = dict(bounds)
+        self.step = step
+        self.rows = int(round((bounds['north'] - bounds['south']) / step)) + 1
+        self.cols = int(round((bounds['east'] - bounds['west']) / step)) + 1
+        self.lats = bounds['south'] + np.arange(self.rows) * step
+        self.lons = bounds['west'] + np.arange(self.cols) * step
+        self.stats = {}
+        self.scores = None
+        self.recent_cutoff = None
+
+    def contains(self, lats, lons):
+        """Get a boolean mask of points that fall inside the raster"""
+        return ((lats >= self.lats[0]) & (lats <= self.lats[-1]) &
+                (lons >= self.lons[0]) & (lons <= self.lons[-1]))
+
+    def node_window(self, radius):
+        """Get row/col offsets of every node that may lie within radius of a point"""
+        lat_reach = math.ceil(radius * DEGREES_PER_MILE / self.step) + 1
+        max_lat = max(abs(self.bounds['north']), abs(self.bounds['south']))
+        lon_reach = math.ceil(radius * DEGREES_PER_MILE / math.cos(math.radians(max_lat)) / self.step) + 1
+        row_offsets, col_offsets = np.meshgrid(
+            np.arange(-lat_reach, lat_reach + 1), np.arange(-lon_reach, lon_reach + 1), indexing='ij')
+        return row_offsets.ravel(), col_offsets.ravel()
+
+    def accumulate(self, lats, lons, values, radius, chunk_size=4096):
+        """Sum per-incident values into every node within radius of each incident
+
+        values maps a stat name to an array with one weight per incident. Returns a
+        dict of flat float64 arrays with one sum per node.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        sums = {name: np.zeros(self.rows * self.cols) for name in values}
+        row_offsets, col_offsets = self.node_window(radius)
+
+        for start in range(0, len(lats), chunk_size):
+            chunk_lats = lats[start:start + chunk_size, None]
+            chunk_lons = lons[start:start + chunk_size, None]
+            rows = np.rint((chunk_lats - self.lats[0]) / self.step).astype(np.int64) + row_offsets
+            cols = np.rint((chunk_lons - self.lons[0]) / self.step).astype(np.int64) + col_offsets
+
+            inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+            rows = np.clip(rows, 0, self.rows - 1)
+            cols = np.clip(cols, 0, self.cols - 1)
+            distances = geo.local_distances(self.lats[rows], self.lons[cols], chunk_lats, chunk_lons)
+            hits = inside & (distances <= radius)
+
+            nodes = (rows * self.cols + cols)[hits]
+            incident_positions = np.broadcast_to(np.arange(len(chunk_lats))[:, None], hits.shape)[hits]
+            for name, weights in values.items():
+                chunk_weights = np.asarray(weights[start:start + chunk_size], dtype=np.float64)
+                sums[name] += np.bincount(nodes, weights=chunk_weights[incident_positions], minlength=len(sums[name]))
+
+        return sums
+
+    def nodes_within(self, lat, lon, radius):
+        """Get flat indexes of the nodes within radius of a single point"""
+        row_offsets, col_offsets = self.node_window(radius)
+        rows = int(np.rint((lat - self.lats[0]) / self.step)) + row_offsets
+        cols = int(np.rint((lon - self.lons[0]) / self.step)) + col_offsets
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        rows, cols = rows[inside], cols[inside]
+        distances = geo.local_distances(lat, lon, self.lats[rows], self.lons[cols])
+        within = distances <= radius
+        return rows[within] * self.cols + cols[within]
+
+    def add(self, lat, lon, values, radius):
+        """Add one incident's weights to the stats of every node within radius of it
+
+        values maps a stat name to the incident's weight. Returns the updated nodes.
+        """
+        self.make_writable()
+        nodes = self.nodes_within(lat, lon, radius)
+        for name, weight in values.items():
+            self.stats[name][nodes] += weight
+        return nodes
+
+    def make_writable(self):
+        """Copy read-only (memory-mapped or fork-shared) arrays so they can be updated in place"""
+        for name, values in self.stats.items():
+            if not values.flags.writeable:
+                self.stats[name] = np.array(values)
+        if self.scores is not None and not self.scores.flags.writeable:
+            self.scores = np.array(self.scores)
+
+    def node_bounds(self, nodes):
+        """Get the lat/lon box around a set of nodes, padded by one step for interpolation"""
+        rows, cols = np.divmod(nodes, self.cols)
+        return {
+            'north': self.lats[rows.max()] + self.step,
+            'south': self.lats[rows.min()] - self.step,
+            'east': self.lons[cols.max()] + self.step,
+            'west': self.lons[cols.min()] - self.step
+        }
+
+    def interpolate(self, lats, lons, time_levels, day_levels):
+        """Bilinearly interpolate precomputed scores at arrays of in-bounds points"""
+        row_pos = (np.asarray(lats, dtype=np.float64) - self.lats[0]) / self.step
+        col_pos = (np.asarray(lons, dtype=np.float64) - self.lons[0]) / self.step
+        rows = np.clip(np.floor(row_pos).astype(np.int64), 0, self.rows - 2)
+        cols = np.clip(np.floor(col_pos).astype(np.int64), 0, self.cols - 2)
+        row_frac = row_pos - rows
+        col_frac = col_pos - cols
+
+        scores = self.scores
+        return ((1 - row_frac) * (1 - col_frac) * scores[time_levels, day_levels, rows, cols] +
+                (1 - row_frac) * col_frac * scores[time_levels, day_levels, rows, cols + 1] +
+                row_frac * (1 - col_frac) * scores[time_levels, day_levels, rows + 1, cols] +
+                row_frac * col_frac * scores[time_levels, day_levels, rows + 1, cols + 1])
+
+    def nearest_nodes(self, lats, lons):
+        """Get flat indexes of the grid nodes nearest to arrays of in-bounds points"""
+        rows = np.clip(np.rint((np.asarray(lats) - self.lats[0]) / self.step).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip(np.rint((np.asarray(lons) - self.lons[0]) / self.step).astype(np.int64), 0, self.cols - 1)
+        return rows * self.cols + cols
+
+    def nbytes(self):
+        """Get the memory used by the raster arrays in bytes"""
+        total = sum(values.nbytes for values in self.stats.values())
+        if self.scores is not None:
+            total += self.scores.nbytes
+        return total
@@ -1,11 +1,26 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Path, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 from datetime import datetime
+import asyncio
+import gc
+import hashlib
+import json
+import os
 import uvicorn
 import logging
 from model import WalkSafeModel
+from cache import LRUCache, DiskCache
+from executor import ModelExecutor
+from bundle import artifact_fingerprint
+from auth import token_user
+from report_log import LogFollower, claim_report_log, slot_directories
+from sqlite_store import SQLiteStore
+from alert_stream import AlertHub, format_event
+from locations import LocationStore
+from tiles import MIN_ZOOM, MAX_ZOOM
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,8 +41,91 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Artifact directory the model is loaded, and hot reloaded, from
+MODEL_DIR = os.environ.get("WALKSAFE_MODEL_DIR", "models")
+
+# Seconds between checks of MODEL_DIR for new artifacts (0 disables the watcher)
+RELOAD_INTERVAL = float(os.environ.get("WALKSAFE_RELOAD_INTERVAL", 0))
+
+# File /admin/reload touches so that every worker's artifact watcher reloads
+RELOAD_REQUEST_PATH = os.environ.get("WALKSAFE_RELOAD_REQUEST_PATH", os.path.join(MODEL_DIR, ".reload-request"))
+
+# Pre-forked workers serving the app (set by gunicorn.conf.py). An admin reload
+# handled by one of several workers is broadcast through RELOAD_REQUEST_PATH
+WORKER_COUNT = int(os.environ.get("WALKSAFE_WORKER_COUNT", 1))
+
+# Token required by /admin endpoints (unset disables them)
+ADMIN_TOKEN = os.environ.get("WALKSAFE_ADMIN_TOKEN")
+
+# Secret the account service signs X-User-Token headers with (see auth.user_token);
+# unset disables the location sharing endpoints
+USER_TOKEN_SECRET = os.environ.get("WALKSAFE_USER_TOKEN_SECRET")
+
+# Directory of the durable user report log (empty disables it). Each pre-forked
+# worker writes its own slot under it and follows the others' for their reports
+REPORT_LOG_DIR = os.environ.get("WALKSAFE_REPORT_LOG_DIR", "report_log")
+
+# Seconds between reads of the report logs of other workers
+REPORT_FOLLOW_INTERVAL = float(os.environ.get("WALKSAFE_REPORT_FOLLOW_INTERVAL", 1.0))
+
+# SQLite file shared by every server process for incident and report queries
+# (unset keeps them in memory)
+SQLITE_PATH = os.environ.get("WALKSAFE_SQLITE_PATH")
+storage = SQLiteStore(SQLITE_PATH) if SQLITE_PATH else None
+
 # Initialize model
-walksafe_model = WalkSafeModel()
+walksafe_model = WalkSafeModel(storage=storage)
+model_reloads = 0
+reload_lock = asyncio.Lock()
+artifact_watcher = None
+
+# Write-ahead log slot of this process that makes user reports survive restarts
+# (claimed on startup), and readers of the slots of other workers
+report_log = None
+report_log_options = {
+    'commit_interval': float(os.environ.get("WALKSAFE_REPORT_COMMIT_INTERVAL", 0.002)),
+    'snapshot_every': int(os.environ.get("WALKSAFE_REPORT_SNAPSHOT_EVERY", 100000))
+}
+report_followers = {}
+report_follow_task = None
+
+# Runs CPU-bound model calls off the event loop
+model_executor = ModelExecutor.from_env(walksafe_model, MODEL_DIR)
+
+# Encoded heatmap tiles, in memory and on disk
+tile_memory_cache = LRUCache(max_entries=int(os.environ.get("WALKSAFE_TILE_MEMORY_ENTRIES", 4096)))
+tile_disk_cache = DiskCache(
+    os.environ.get("WALKSAFE_TILE_CACHE_DIR", "tile_cache"),
+    max_entries=int(os.environ.get("WALKSAFE_TILE_DISK_ENTRIES", 50000))
+)
+
+# Streaming alert subscribers of this process, and the seconds between keepalives
+alert_hub = AlertHub(queue_size=int(os.environ.get("WALKSAFE_ALERT_QUEUE_SIZE", 100)))
+ALERT_KEEPALIVE = float(os.environ.get("WALKSAFE_ALERT_KEEPALIVE", 15))
+
+# Latest shared position of each user, forgotten after this many seconds without an update.
+# The store lives in this process only, so location sharing needs a single worker
+location_store = LocationStore(ttl=float(os.environ.get("WALKSAFE_LOCATION_TTL", 300)))
+
+# Seconds intermediary caches may reuse a response before revalidating its ETag
+CACHE_MAX_AGE = int(os.environ.get("WALKSAFE_CACHE_MAX_AGE", 30))
+
+def make_etag(*parts):
+    """Derive a weak ETag from the model and data versions and the response inputs"""
+    digest = hashlib.sha1(repr((walksafe_model.model_version, walksafe_model.data_version) + parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def cache_headers(etag):
+    """Get ETag and Cache-Control headers for a cacheable response"""
+    return {"ETag": etag, "Cache-Control": f"public, max-age={CACHE_MAX_AGE}, must-revalidate"}
+
+def is_not_modified(request, etag):
+    """Check whether the client already holds the representation with this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
 
 # Pydantic models
 class LocationRequest(BaseModel):
@@ -36,10 +134,31 @@ class LocationRequest(BaseModel):
     time_of_day: Optional[int] = Field(None, ge=0, le=23)
     day_of_week: Optional[int] = Field(None, ge=0, le=6)
 
+class Coordinate(BaseModel):
+    lat: float = Field(..., ge=26.4, le=26.5)
+    lon: float = Field(..., ge=-80.15, le=-80.0)
+
+class BatchLocationRequest(BaseModel):
+    points: List[LocationRequest] = Field(..., min_length=1, max_length=10000, description="Locations to score")
+
 class RouteRequest(BaseModel):
     coordinates: List[Dict[str, float]] = Field(..., description="Route waypoints")
     walking_speed: Optional[float] = Field(3.0, description="Walking speed in mph")
 
+class CompareRoutesRequest(BaseModel):
+    routes: List[List[Dict[str, float]]] = Field(..., min_length=1, max_length=50, description="Candidate routes' waypoints")
+    walking_speed: Optional[float] = Field(3.0, description="Walking speed in mph")
+    time_of_day: Optional[int] = Field(None, ge=0, le=23)
+    day_of_week: Optional[int] = Field(None, ge=0, le=6)
+
+class SafeRouteRequest(BaseModel):
+    start: Coordinate
+    end: Coordinate
+    safety_weight: float = Field(2.0, ge=0.0, le=10.0, description="0 for the shortest path; higher values accept longer paths that avoid risk")
+    walking_speed: Optional[float] = Field(3.0, description="Walking speed in mph")
+    time_of_day: Optional[int] = Field(None, ge=0, le=23)
+    day_of_week: Optional[int] = Field(None, ge=0, le=6)
+
 class SafetyPrediction(BaseModel):
     lat: float
     lon: float
@@ -49,6 +168,10 @@ class SafetyPrediction(BaseModel):
     factors: Dict[str, float]
     recommendations: List[str]
 
+class BatchSafetyPrediction(BaseModel):
+    predictions: List[SafetyPrediction]
+    total_points: int
+
 class RouteAnalysis(BaseModel):
     overall_safety: float
     risk_level: str
@@ -68,15 +191,185 @@ class IncidentReport(BaseModel):
     description: Optional[str] = None
     user_id: Optional[str] = None
 
+class LocationUpdate(BaseModel):
+    user_id: Optional[str] = Field(None, min_length=1, max_length=128, description="Must be the caller when given")
+    lat: float = Field(..., ge=-90.0, le=90.0)
+    lon: float = Field(..., ge=-180.0, le=180.0)
+    timestamp: Optional[float] = Field(None, description="Client fix time in epoch seconds, capped at server time")
+
+class LocationBatch(BaseModel):
+    updates: List[LocationUpdate] = Field(..., min_length=1, max_length=10000, description="Position updates")
+
+class ShareRequest(BaseModel):
+    viewer_ids: List[str] = Field(..., min_length=1, max_length=5000, description="Users who may see the caller's position")
+    allow: bool = Field(True, description="False stops sharing with these users")
+
+class FriendsRequest(BaseModel):
+    friend_ids: List[str] = Field(..., min_length=1, max_length=5000, description="Users to look up")
+    lat: Optional[float] = Field(None, ge=-90.0, le=90.0, description="Caller latitude; with lon, only friends within radius are returned")
+    lon: Optional[float] = Field(None, ge=-180.0, le=180.0, description="Caller longitude")
+    radius: float = Field(1.0, ge=0.1, le=10.0, description="Nearby radius in miles")
+    time_of_day: Optional[int] = Field(None, ge=0, le=23)
+    day_of_week: Optional[int] = Field(None, ge=0, le=6)
+
+def require_user(x_user_token):
+    """Get the id of the user an X-User-Token header identifies"""
+    if not USER_TOKEN_SECRET:
+        raise HTTPException(status_code=403, detail="Location sharing is disabled")
+    if WORKER_COUNT > 1:
+        # Each worker would hold its own positions and shares, so friends would see a random subset
+        raise HTTPException(status_code=503, detail=f"Location sharing needs a single worker, {WORKER_COUNT} are running")
+    user_id = token_user(USER_TOKEN_SECRET, x_user_token) if x_user_token else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid user token")
+    return user_id
+
+def preload_model():
+    """Load the model in a pre-fork master so every worker shares its memory
+
+    Called by gunicorn.conf.py before workers are forked. The loaded arrays are
+    marked read-only and the heap is frozen so the garbage collector never writes
+    to (and so copies) the pages workers inherit.
+    """
+    if not walksafe_model.load_model(MODEL_DIR):
+        logger.error("Failed to preload model - workers will load their own copy")
+        return False
+    walksafe_model.make_read_only()
+    gc.freeze()
+    logger.info(f"Model preloaded, {gc.get_freeze_count()} objects frozen")
+    return True
+
+def load_warm_model(incident_reports):
+    """Load a new model from MODEL_DIR with user reports folded in and warm its caches (runs off the event loop)"""
+    new_model = WalkSafeModel(storage=storage)
+    new_model.incident_reports = incident_reports
+    if not new_model.load_model(MODEL_DIR):
+        return None
+    new_model.warm_up()
+    return new_model
+
+async def reload_model(reason):
+    """Build a new model in the background and swap it in for later requests
+
+    Requests already running keep the model they started with. The swap happens
+    on the event loop, so no endpoint sees the old and new model mid-step.
+    """
+    global walksafe_model, model_reloads
+    async with reload_lock:
+        logger.info(f"Reloading model ({reason})...")
+        snapshot = list(walksafe_model.incident_reports)
+        new_model = await asyncio.get_running_loop().run_in_executor(None, load_warm_model, snapshot)
+        if new_model is None:
+            logger.error(f"Model reload failed, still serving version {walksafe_model.model_version}")
+            return False
+
+        # User reports outlive model versions; fold in those sent during the load,
+        # share the list and forward reports still in flight to the old model
+        await asyncio.get_running_loop().run_in_executor(None, walksafe_model.hand_over, new_model, len(snapshot))
+        old_version = walksafe_model.model_version
+        walksafe_model = new_model
+        model_executor.set_model(new_model)
+        model_reloads += 1
+        logger.info(f"Model version {old_version} replaced by {new_model.model_version}")
+        return True
+
+def watched_fingerprint():
+    """Get the fingerprint of the MODEL_DIR artifacts and of the last admin reload request"""
+    try:
+        requested = os.stat(RELOAD_REQUEST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        requested = None
+    return artifact_fingerprint(MODEL_DIR), requested
+
+def request_reload():
+    """Touch RELOAD_REQUEST_PATH so the artifact watcher of every worker reloads"""
+    with open(RELOAD_REQUEST_PATH, 'w') as f:
+        f.write(f"{datetime.now().isoformat()}\n")
+
+async def watch_model_artifacts():
+    """Reload the model whenever the artifacts in MODEL_DIR are rewritten or a reload is requested"""
+    fingerprint = watched_fingerprint()
+    while True:
+        await asyncio.sleep(RELOAD_INTERVAL)
+        try:
+            current = watched_fingerprint()
+        except OSError as e:
+            logger.warning(f"Cannot read model artifacts: {e}")
+            continue
+        # A failed reload (e.g. artifacts still being written) is retried next check
+        if current != fingerprint and await reload_model("artifacts changed"):
+            fingerprint = current
+
+def poll_report_followers():
+    """Read the reports other workers have logged since the last poll (blocking file reads)"""
+    for directory in slot_directories(REPORT_LOG_DIR):
+        if directory != report_log.directory and directory not in report_followers:
+            report_followers[directory] = LogFollower(directory)
+    records = []
+    for follower in report_followers.values():
+        records.extend(follower.poll())
+    return records
+
+async def follow_report_logs():
+    """Fold in and stream the reports other workers accept"""
+    while True:
+        await asyncio.sleep(REPORT_FOLLOW_INTERVAL)
+        try:
+            records = await asyncio.get_running_loop().run_in_executor(None, poll_report_followers)
+            if records:
+                await model_executor.run("report", "add_replicated_reports", records)
+                for record in records:
+                    alert_hub.publish(record)
+        except Exception as e:
+            logger.error(f"Reading worker report logs failed: {e}")
+
 # API Endpoints
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
+    global artifact_watcher, report_log, report_follow_task
     logger.info("WalkSafe+ API starting up...")
-    if not walksafe_model.load_model():
+    
+    reports = []
+    if REPORT_LOG_DIR:
+        try:
+            report_log, reports = claim_report_log(REPORT_LOG_DIR, **report_log_options)
+            logger.info(f"Writing user reports to {report_log.directory}")
+        except Exception as e:
+            logger.error(f"Report log unavailable, user reports will be refused: {e}")
+    if report_log is not None:
+        # Reports other workers logged before this one started; later ones arrive by following
+        try:
+            reports += poll_report_followers()
+        except Exception as e:
+            logger.error(f"Reading worker report logs failed: {e}")
+    if report_log is None and storage is not None:
+        reports = storage.reports()
+    walksafe_model.incident_reports = reports
+    
+    if walksafe_model.is_loaded():
+        walksafe_model.apply_incident_reports(reports)
+        logger.info("Server ready! (using preloaded model)")
+    elif not walksafe_model.load_model(MODEL_DIR):
         logger.error("Failed to load model - server will not function properly")
     else:
         logger.info("Server ready!")
+    
+    if RELOAD_INTERVAL > 0:
+        artifact_watcher = asyncio.create_task(watch_model_artifacts())
+    if report_log is not None and REPORT_FOLLOW_INTERVAL > 0:
+        report_follow_task = asyncio.create_task(follow_report_logs())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background tasks and model worker pools and flush the report log"""
+    if artifact_watcher is not None:
+        artifact_watcher.cancel()
+    if report_follow_task is not None:
+        report_follow_task.cancel()
+    model_executor.shutdown()
+    if report_log is not None:
+        report_log.close()
 
 @app.get("/")
 async def root():
@@ -99,11 +392,17 @@ async def health_check():
     return {
         "status": "healthy" if walksafe_model.is_loaded() else "model_not_loaded",
         "model_ready": walksafe_model.is_loaded(),
+        "model_version": walksafe_model.model_version,
+        "model_reloads": model_reloads,
         "data_points": {
             "crimes": len(walksafe_model.crime_data),
             "accidents": len(walksafe_model.accident_data),
             "user_reports": len(walksafe_model.incident_reports)
         },
+        "prediction_cache": walksafe_model.prediction_cache.stats(),
+        "report_log": report_log.stats() if report_log is not None else None,
+        "alert_stream": alert_hub.stats(),
+        "locations": location_store.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -114,7 +413,9 @@ async def predict_location_safety(location: LocationRequest):
         if not walksafe_model.is_loaded():
             raise HTTPException(status_code=503, detail="Model not loaded")
         
-        prediction = walksafe_model.predict_safety(
+        prediction = await model_executor.run(
+            "predict",
+            "predict_safety",
             location.lat, 
             location.lon, 
             location.time_of_day, 
@@ -126,6 +427,29 @@ async def predict_location_safety(location: LocationRequest):
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/batch", response_model=BatchSafetyPrediction)
+async def predict_batch_safety(batch: BatchLocationRequest):
+    """Predict safety scores for many locations in one pass"""
+    try:
+        if not walksafe_model.is_loaded():
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        
+        predictions = await model_executor.run(
+            "predict-batch",
+            "predict_safety_batch",
+            [{'lat': point.lat, 'lon': point.lon} for point in batch.points],
+            [point.time_of_day for point in batch.points],
+            [point.day_of_week for point in batch.points]
+        )
+        
+        return BatchSafetyPrediction(
+            predictions=[SafetyPrediction(**prediction) for prediction in predictions],
+            total_points=len(predictions)
+        )
+    except Exception as e:
+        logger.error(f"Batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
 @app.post("/analyze-route", response_model=RouteAnalysis)
 async def analyze_route(route: RouteRequest):
     """Analyze safety along a walking route"""
@@ -136,25 +460,83 @@ async def analyze_route(route: RouteRequest):
         if len(route.coordinates) < 2:
             raise HTTPException(status_code=400, detail="Route must have at least 2 coordinates")
         
-        analysis = walksafe_model.analyze_route(route.coordinates, route.walking_speed)
+        analysis = await model_executor.run("analyze-route", "analyze_route", route.coordinates, route.walking_speed)
         return RouteAnalysis(**analysis)
         
     except Exception as e:
         logger.error(f"Route analysis error: {e}")
         raise HTTPException(status_code=500, detail=f"Route analysis failed: {str(e)}")
 
+@app.post("/compare-routes")
+async def compare_routes(comparison: CompareRoutesRequest):
+    """Analyze candidate routes together and rank them by safety"""
+    try:
+        if not walksafe_model.is_loaded():
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        
+        if any(len(route) < 2 for route in comparison.routes):
+            raise HTTPException(status_code=400, detail="Each route must have at least 2 coordinates")
+        
+        result = await model_executor.run(
+            "compare-routes",
+            "compare_routes",
+            comparison.routes,
+            comparison.walking_speed,
+            comparison.time_of_day,
+            comparison.day_of_week
+        )
+        
+        return {
+            "routes": [RouteAnalysis(**analysis) for analysis in result['routes']],
+            "ranking": result['ranking'],
+            "total_points": result['total_points'],
+            "unique_cells": result['unique_cells']
+        }
+    except Exception as e:
+        logger.error(f"Route comparison error: {e}")
+        raise HTTPException(status_code=500, detail=f"Route comparison failed: {str(e)}")
+
+@app.post("/safe-route")
+async def find_safe_route(route: SafeRouteRequest):
+    """Find the safest walking path between two points"""
+    try:
+        if not walksafe_model.is_loaded():
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        
+        result = await model_executor.run(
+            "safe-route",
+            "find_safe_route",
+            {'lat': route.start.lat, 'lon': route.start.lon},
+            {'lat': route.end.lat, 'lon': route.end.lon},
+            route.safety_weight,
+            route.walking_speed,
+            route.time_of_day,
+            route.day_of_week
+        )
+        
+        return {
+            "coordinates": result['coordinates'],
+            "distance": result['distance'],
+            "safety_weight": result['safety_weight'],
+            "analysis": RouteAnalysis(**result['analysis'])
+        }
+    except Exception as e:
+        logger.error(f"Safe route error: {e}")
+        raise HTTPException(status_code=500, detail=f"Route search failed: {str(e)}")
+
 @app.get("/nearby-alerts")
 async def get_nearby_alerts(
     lat: float = Query(..., ge=26.4, le=26.5, description="Latitude"),
     lon: float = Query(..., ge=-80.15, le=-80.0, description="Longitude"),
-    radius: float = Query(0.5, ge=0.1, le=2.0, description="Search radius in miles")
+    radius: float = Query(0.5, ge=0.1, le=2.0, description="Search radius in miles"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of alerts")
 ):
     """Get nearby safety alerts"""
     try:
         if not walksafe_model.is_loaded():
             raise HTTPException(status_code=503, detail="Model not loaded")
         
-        alerts = walksafe_model.get_nearby_alerts(lat, lon, radius)
+        alerts = await model_executor.run("nearby-alerts", "get_nearby_alerts", lat, lon, radius, limit)
         
         return {
             "alerts": alerts,
@@ -166,9 +548,64 @@ async def get_nearby_alerts(
         logger.error(f"Nearby alerts error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get alerts: {str(e)}")
 
+@app.get("/alerts/stream")
+async def stream_alerts(
+    request: Request,
+    lat: float = Query(..., ge=26.4, le=26.5, description="Latitude"),
+    lon: float = Query(..., ge=-80.15, le=-80.0, description="Longitude"),
+    radius: float = Query(0.5, ge=0.1, le=2.0, description="Alert radius in miles")
+):
+    """Stream alerts for new user reports near a location as Server-Sent Events"""
+    subscriber = alert_hub.subscribe(lat, lon, radius)
+    
+    async def events():
+        try:
+            yield format_event("subscribed", {"location": {"lat": lat, "lon": lon}, "radius": radius})
+            while True:
+                try:
+                    alert = await asyncio.wait_for(subscriber.queue.get(), ALERT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event("alert", alert)
+        finally:
+            alert_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/recent-incidents")
+async def get_recent_incidents(
+    lat: float = Query(..., ge=26.4, le=26.5, description="Latitude"),
+    lon: float = Query(..., ge=-80.15, le=-80.0, description="Longitude"),
+    radius: float = Query(0.5, ge=0.1, le=2.0, description="Search radius in miles"),
+    days: int = Query(30, ge=1, le=3650, description="Window length in days")
+):
+    """Count incidents near a location in the last N days"""
+    try:
+        if not walksafe_model.is_loaded():
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        
+        counts = await model_executor.run("recent-incidents", "get_recent_incidents", lat, lon, radius, days)
+        
+        return {
+            "counts": counts,
+            "days": days,
+            "search_radius": radius,
+            "location": {"lat": lat, "lon": lon}
+        }
+    except Exception as e:
+        logger.error(f"Recent incidents error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to count recent incidents: {str(e)}")
+
 @app.post("/report")
 async def submit_incident_report(report: IncidentReport):
     """Submit incident report from users"""
+    if REPORT_LOG_DIR and report_log is None:
+        # Never acknowledge a report that would not survive a restart
+        raise HTTPException(status_code=503, detail="Report log unavailable, reports cannot be stored")
     try:
         report_data = {
             'lat': report.lat,
@@ -176,10 +613,15 @@ async def submit_incident_report(report: IncidentReport):
             'incident_type': report.incident_type,
             'severity': report.severity,
             'description': report.description,
-            'user_id': report.user_id
+            'user_id': report.user_id,
+            'timestamp': datetime.now().isoformat()
         }
         
-        saved_report = walksafe_model.add_incident_report(report_data)
+        if report_log is not None:
+            # Serve and acknowledge only a report that is already on disk
+            await asyncio.wrap_future(report_log.append(report_data))
+        saved_report = await model_executor.run("report", "add_incident_report", report_data)
+        alert_hub.publish(saved_report)
         
         return {
             "success": True,
@@ -191,8 +633,86 @@ async def submit_incident_report(report: IncidentReport):
         logger.error(f"Report submission error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to submit report: {str(e)}")
 
+@app.post("/locations")
+async def update_locations(batch: LocationBatch, x_user_token: Optional[str] = Header(None)):
+    """Record a batch of the caller's position updates"""
+    user_id = require_user(x_user_token)
+    if any(update.user_id not in (None, user_id) for update in batch.updates):
+        raise HTTPException(status_code=403, detail="Updates can only be sent for the caller's own position")
+    try:
+        applied = location_store.update_many(
+            [{'user_id': user_id, 'lat': update.lat, 'lon': update.lon, 'timestamp': update.timestamp}
+             for update in batch.updates])
+        
+        return {
+            "success": True,
+            "accepted": applied,
+            "ignored": len(batch.updates) - applied
+        }
+    except Exception as e:
+        logger.error(f"Location update error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to update locations: {str(e)}")
+
+@app.post("/locations/shares")
+async def share_location(request: ShareRequest, x_user_token: Optional[str] = Header(None)):
+    """Let users see the caller's position, or stop them"""
+    user_id = require_user(x_user_token)
+    viewers = location_store.set_viewers(user_id, [viewer for viewer in request.viewer_ids if viewer != user_id],
+                                         request.allow)
+    return {
+        "success": True,
+        "viewer_ids": viewers
+    }
+
+@app.post("/friends/locations")
+async def get_friend_locations(request: FriendsRequest, x_user_token: Optional[str] = Header(None)):
+    """Get the latest positions friends share with the caller, with the safety score at each one"""
+    user_id = require_user(x_user_token)
+    try:
+        if not walksafe_model.is_loaded():
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        # Friends who have not shared with the caller are reported the same as ones with no position
+        visible = location_store.visible_to(user_id, request.friend_ids)
+        if request.lat is not None and request.lon is not None:
+            found = location_store.near(request.lat, request.lon, request.radius, visible)
+        else:
+            found = [(friend_id, position, None) for friend_id, position in location_store.get_many(
+                [friend_id for friend_id in request.friend_ids if friend_id in visible]).items()]
+        
+        # One batched pass scores every friend inside the area the model covers
+        covered = [i for i, (_, position, _) in enumerate(found) if walksafe_model.covers(position['lat'], position['lon'])]
+        predictions = [None] * len(found)
+        scored = await model_executor.run(
+            "friends",
+            "predict_safety_batch",
+            [{'lat': found[i][1]['lat'], 'lon': found[i][1]['lon']} for i in covered],
+            request.time_of_day,
+            request.day_of_week
+        ) if covered else []
+        for i, prediction in zip(covered, scored):
+            predictions[i] = prediction
+        
+        friends = [{
+            "user_id": friend_id,
+            **position,
+            "distance": distance,
+            "safety_score": prediction['safety_score'] if prediction else None,
+            "risk_level": prediction['risk_level'] if prediction else None
+        } for (friend_id, position, distance), prediction in zip(found, predictions)]
+        
+        return {
+            "friends": friends,
+            "total_friends": len(friends),
+            "not_found": len(request.friend_ids) - len(friends)
+        }
+    except Exception as e:
+        logger.error(f"Friend locations error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get friend locations: {str(e)}")
+
 @app.get("/heatmap")
 async def get_safety_heatmap(
+    request: Request,
+    response: Response,
     north: float = Query(26.50, description="Northern boundary"),
     south: float = Query(26.42, description="Southern boundary"),
     east: float = Query(-80.05, description="Eastern boundary"),
@@ -205,8 +725,13 @@ async def get_safety_heatmap(
         if not walksafe_model.is_loaded():
             raise HTTPException(status_code=503, detail="Model not loaded")
         
-        heatmap_data = walksafe_model.generate_heatmap_data(
-            north, south, east, west, resolution, min_safety
+        etag = make_etag("heatmap", north, south, east, west, resolution, min_safety, walksafe_model.get_risk_levels())
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
+        
+        heatmap_data = await model_executor.run(
+            "heatmap", "generate_heatmap_data", north, south, east, west, resolution, min_safety
         )
         
         return {
@@ -225,14 +750,64 @@ async def get_safety_heatmap(
         logger.error(f"Heatmap generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Heatmap generation failed: {str(e)}")
 
+@app.get("/tiles/{z}/{x}/{y}")
+async def get_safety_tile(
+    z: int = Path(..., ge=MIN_ZOOM, le=MAX_ZOOM, description="Zoom level"),
+    x: int = Path(..., ge=0, description="Tile column"),
+    y: int = Path(..., ge=0, description="Tile row"),
+    time_of_day: Optional[int] = Query(None, ge=0, le=23, description="Hour of day (default: now)"),
+    day_of_week: Optional[int] = Query(None, ge=0, le=6, description="Day of week (default: today)")
+):
+    """Get a fixed-grid safety heatmap tile"""
+    if not walksafe_model.is_loaded():
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    
+    try:
+        # Move the recent crime counts forward before looking up tiles keyed on them
+        if walksafe_model.recent_stats_stale():
+            await model_executor.run("refresh", "refresh_recent_stats")
+        
+        time_level, day_level = walksafe_model.get_risk_levels(time_of_day, day_of_week)
+        trained_at = walksafe_model.metadata.get('trained_at', 'unknown').replace(':', '-')
+        version = f"{trained_at}-{walksafe_model.recent_cutoff}"
+        # Tiles only depend on the model version and recent window until user reports
+        # change them; after that they are keyed on data_version and kept in memory only
+        use_disk = not walksafe_model.incident_reports
+        if not use_disk:
+            version = f"{version}-{walksafe_model.data_version}"
+        key = (version, f"{time_level}-{day_level}", z, x, f"{y}.json")
+        
+        tile = tile_memory_cache.get(key)
+        if tile is None:
+            tile = tile_disk_cache.get(key) if use_disk else None
+            if tile is None:
+                tile_data = await model_executor.run("tiles", "get_safety_tile", z, x, y, time_level, day_level)
+                tile = json.dumps(tile_data).encode()
+                if use_disk:
+                    tile_disk_cache.put(key, tile)
+            tile_memory_cache.put(key, tile)
+        
+        return Response(content=tile, media_type="application/json")
+    except Exception as e:
+        logger.error(f"Tile error: {e}")
+        raise HTTPException(status_code=500, detail=f"Tile generation failed: {str(e)}")
+
 @app.get("/stats")
-async def get_safety_statistics():
+async def get_safety_statistics(request: Request, response: Response):
     """Get safety statistics for dashboard"""
     try:
         if not walksafe_model.is_loaded():
             raise HTTPException(status_code=503, detail="Model not loaded")
         
-        stats = walksafe_model.get_statistics()
+        # The weekly report count also moves as reports age, so revalidate hourly
+        etag = make_etag("stats", datetime.now().strftime("%Y-%m-%dT%H"))
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
+        
+        stats = await model_executor.run("stats", "get_statistics")
         return stats
     except Exception as e:
         logger.error(f"Statistics error: {e}")
@@ -240,6 +815,8 @@ async def get_safety_statistics():
 
 @app.get("/danger-zones")
 async def get_danger_zones(
+    request: Request,
+    response: Response,
     danger_threshold: float = Query(0.4, description="Danger threshold"),
     high_danger_threshold: float = Query(0.25, description="High danger threshold")
 ):
@@ -248,7 +825,12 @@ async def get_danger_zones(
         if not walksafe_model.is_loaded():
             raise HTTPException(status_code=503, detail="Model not loaded")
         
-        danger_zones = walksafe_model.get_danger_zones(danger_threshold, high_danger_threshold)
+        etag = make_etag("danger-zones", danger_threshold, high_danger_threshold, walksafe_model.get_risk_levels())
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
+        
+        danger_zones = await model_executor.run("danger-zones", "get_danger_zones", danger_threshold, high_danger_threshold)
         
         return {
             "danger_zones": danger_zones,
@@ -261,13 +843,19 @@ async def get_danger_zones(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/model/info")
-async def get_model_info():
+async def get_model_info(request: Request, response: Response):
     """Model information"""
     if not walksafe_model.is_loaded():
         raise HTTPException(status_code=503, detail="Model not loaded")
     
+    etag = make_etag("model-info")
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+    
     return {
         "model_type": "Random Forest Regressor",
+        "model_version": walksafe_model.model_version,
         "training_data": {
             "crimes": walksafe_model.metadata.get('total_crimes', 0),
             "accidents": walksafe_model.metadata.get('total_accidents', 0),
@@ -283,6 +871,42 @@ async def get_model_info():
         "trained_at": walksafe_model.metadata.get('trained_at', 'unknown')
     }
 
+@app.post("/admin/reload")
+async def reload_model_endpoint(x_admin_token: Optional[str] = Header(None)):
+    """Hot reload the model from its artifact directory without downtime
+
+    With several pre-forked workers the request is broadcast: every worker's
+    artifact watcher reloads within WALKSAFE_RELOAD_INTERVAL seconds.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    
+    if WORKER_COUNT > 1:
+        if RELOAD_INTERVAL <= 0:
+            raise HTTPException(status_code=409, detail=f"{WORKER_COUNT} workers are running and only one would reload; "
+                                                        "set WALKSAFE_RELOAD_INTERVAL to reload them all")
+        try:
+            request_reload()
+        except OSError as e:
+            logger.error(f"Reload request failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Model reload request failed: {str(e)}")
+        return {
+            "success": True,
+            "scheduled": True,
+            "workers": WORKER_COUNT,
+            "reload_within": RELOAD_INTERVAL
+        }
+    
+    if not await reload_model("admin request"):
+        raise HTTPException(status_code=500, detail="Model reload failed")
+    return {
+        "success": True,
+        "model_version": walksafe_model.model_version,
+        "model_reloads": model_reloads
+    }
+
 if __name__ == "__main__":
     uvicorn.run(
         app, 
@@ -0,0 +1,198 @@
+import math
+import threading
+import numpy as np
+import geo
+
+# Degrees of latitude per mile (Earth radius 3959 miles)
+DEGREES_PER_MILE = 180.0 / (math.pi * 3959)
+
+def cell_range(lat, lon, radius, cell_size):
+    """Get the (row, col) bounds of the grid cells covering a radius in miles around a point"""
+    lat_delta = radius * DEGREES_PER_MILE
+    lon_delta = lat_delta / max(math.cos(math.radians(abs(lat) + lat_delta)), 1e-6)
+    row_min = math.floor((lat - lat_delta) / cell_size)
+    row_max = math.floor((lat + lat_delta) / cell_size)
+    col_min = math.floor((lon - lon_delta) / cell_size)
+    col_max = math.floor((lon + lon_delta) / cell_size)
+    return row_min, row_max, col_min, col_max
+
+class GridIndex:
+    """Uniform lat/lon grid buckets for fast radius queries over a fixed set of points
+
+    With keys (e.g. date ordinals) each bucket is also sorted by key, and
+    (bucket, key) pairs are packed into one globally sorted array. Counting the points
+    at or above a key is then one vectorized binary search over the covered cells,
+    plus distance checks only for the matching points of cells on the radius edge.
+    """
+
+    def __init__(self, lats, lons, cell_size=0.005, keys=None):
+        self.cell_size = cell_size
+        self.size = len(lats)
+
+        self.lats = lats = np.asarray(lats, dtype=np.float64)
+        self.lons = lons = np.asarray(lons, dtype=np.float64)
+        rows = np.floor(lats / cell_size).astype(np.int64)
+        cols = np.floor(lons / cell_size).astype(np.int64)
+
+        # Sort points by cell so every bucket is a contiguous slice of self.order
+        if keys is None:
+            self.order = np.lexsort((cols, rows))
+            self.keys = None
+        else:
+            self.order = np.lexsort((keys, cols, rows))
+            self.keys = np.asarray(keys)[self.order]
+        sorted_rows = rows[self.order]
+        sorted_cols = cols[self.order]
+
+        self.buckets = {}
+        starts = stops = np.empty(0, dtype=np.int64)
+        if self.size:
+            changes = np.flatnonzero((np.diff(sorted_rows) != 0) | (np.diff(sorted_cols) != 0)) + 1
+            starts = np.concatenate(([0], changes))
+            stops = np.concatenate((changes, [self.size]))
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                self.buckets[(int(sorted_rows[start]), int(sorted_cols[start]))] = (start, stop)
+
+        if keys is not None:
+            # Cell codes ascend in bucket order, so a cell's bucket is found by bisection
+            self.cell_codes = self.cell_code(sorted_rows[starts], sorted_cols[starts])
+            self.bucket_starts = starts
+            self.bucket_stops = stops
+            self.key_min = int(self.keys.min()) if self.size else 0
+            self.key_span = int(self.keys.max()) - self.key_min + 1 if self.size else 1
+            bucket_ids = np.repeat(np.arange(len(starts), dtype=np.int64), stops - starts)
+            self.packed_keys = bucket_ids * self.key_span + (self.keys.astype(np.int64) - self.key_min)
+
+    @staticmethod
+    def cell_code(rows, cols):
+        """Pack cell rows and columns into int64 codes that sort by row, then column"""
+        return np.asarray(rows, dtype=np.int64) * (1 << 32) + (np.asarray(cols, dtype=np.int64) + (1 << 31))
+
+    def cell_range(self, lat, lon, radius):
+        """Get the (row, col) bounds of the cells covering a radius in miles around a point"""
+        return cell_range(lat, lon, radius, self.cell_size)
+
+    def candidates(self, lat, lon, radius):
+        """Get sorted positions of points in the buckets that may lie within radius"""
+        row_min, row_max, col_min, col_max = self.cell_range(lat, lon, radius)
+
+        slices = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self.buckets.get((row, col))
+                if bucket is not None:
+                    slices.append(self.order[bucket[0]:bucket[1]])
+
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(slices))
+
+    def cells_within(self, rows, cols, lat, lon, radius):
+        """Check which whole cells lie within radius of a point (by geo.local_distances)"""
+        south, north = rows * self.cell_size, (rows + 1) * self.cell_size
+        west, east = cols * self.cell_size, (cols + 1) * self.cell_size
+        scale = geo.EARTH_RADIUS_MILES * math.pi / 180
+        # Bound the distance of every point in a cell by its largest lat and lon offsets
+        dy = np.maximum(np.abs(south - lat), np.abs(north - lat)) * scale
+        cos_lat = np.maximum(np.cos(np.radians((south + lat) / 2)), np.cos(np.radians((north + lat) / 2)))
+        dx = np.maximum(np.abs(west - lon), np.abs(east - lon)) * scale * cos_lat
+        return np.sqrt(dx * dx + dy * dy) <= radius * (1 - 1e-9)
+
+    def count_within(self, lat, lon, radius, min_key):
+        """Count points within radius of a point whose key is at least min_key"""
+        row_min, row_max, col_min, col_max = self.cell_range(lat, lon, radius)
+        rows = np.repeat(np.arange(row_min, row_max + 1), col_max - col_min + 1)
+        cols = np.tile(np.arange(col_min, col_max + 1), row_max - row_min + 1)
+
+        codes = self.cell_code(rows, cols)
+        buckets = np.minimum(np.searchsorted(self.cell_codes, codes), len(self.cell_codes) - 1)
+        found = self.cell_codes[buckets] == codes if len(self.cell_codes) else np.zeros(len(codes), dtype=bool)
+        buckets, rows, cols = buckets[found], rows[found], cols[found]
+
+        # Within a bucket the points at or above min_key are a suffix
+        offset = min(max(min_key - self.key_min, 0), self.key_span)
+        firsts = np.searchsorted(self.packed_keys, buckets * self.key_span + offset)
+        stops = self.bucket_stops[buckets]
+
+        inside = self.cells_within(rows, cols, lat, lon, radius)
+        count = int((stops[inside] - firsts[inside]).sum())
+
+        # Edge cells: check the distance of each of their matching points
+        firsts, stops = firsts[~inside], stops[~inside]
+        lengths = stops - firsts
+        if lengths.sum():
+            slots = np.arange(lengths.sum()) + np.repeat(firsts - np.cumsum(lengths) + lengths, lengths)
+            positions = self.order[slots]
+            distances = geo.local_distances(lat, lon, self.lats[positions], self.lons[positions])
+            count += int(np.count_nonzero(distances <= radius))
+        return count
+
+class PointGrid:
+    """Grid buckets over points added one at a time, for radius queries over live data
+
+    Each point carries a numeric value (e.g. severity) and an item (e.g. the report
+    dict). A bucket keeps Python lists for cheap appends and caches them as arrays
+    the first time it is queried after a change.
+    """
+
+    def __init__(self, cell_size=0.005):
+        self.cell_size = cell_size
+        self.buckets = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def add(self, lat, lon, value, item):
+        """Add one point"""
+        key = (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = {'lats': [], 'lons': [], 'values': [], 'items': [], 'arrays': None}
+            bucket['lats'].append(lat)
+            bucket['lons'].append(lon)
+            bucket['values'].append(value)
+            bucket['items'].append(item)
+            bucket['arrays'] = None
+            self.size += 1
+
+    def bucket_arrays(self, bucket):
+        """Get a bucket's (lats, lons, values, items) arrays"""
+        arrays = bucket['arrays']
+        if arrays is None:
+            with self.lock:
+                items = np.empty(len(bucket['items']), dtype=object)
+                items[:] = bucket['items']
+                arrays = bucket['arrays'] = (np.array(bucket['lats'], dtype=np.float64),
+                                             np.array(bucket['lons'], dtype=np.float64),
+                                             np.array(bucket['values'], dtype=np.float64), items)
+        return arrays
+
+    def query(self, lat, lon, radius):
+        """Get the items, values and distances of the points within radius of a point
+
+        Items come back as an object array, so callers can rank the values and only
+        touch the items they keep.
+        """
+        row_min, row_max, col_min, col_max = cell_range(lat, lon, radius, self.cell_size)
+        parts = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self.buckets.get((row, col))
+                if bucket is not None:
+                    parts.append(self.bucket_arrays(bucket))
+        if not parts:
+            return np.empty(0, dtype=object), np.empty(0), np.empty(0)
+
+        lats, lons, values, items = (np.concatenate(column) for column in zip(*parts))
+        distances = geo.local_distances(lat, lon, lats, lons)
+        within = distances <= radius
+        return items[within], values[within], distances[within]
+
+    def clear(self):
+        """Remove every point"""
+        with self.lock:
+            self.buckets = {}
+            self.size = 0
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import geo
+from spatial_index import DEGREES_PER_MILE
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA, COLUMN_DTYPES
+
+# Incident tables and their schemas; row ids are store positions + 1. Each imported
+# version of the incidents gets its own <table>_<tag> tables
+INCIDENT_TABLES = {'crimes': CRIME_SCHEMA, 'accidents': ACCIDENT_SCHEMA}
+
+# Incident versions kept in the file, most recently loaded first
+KEEP_VERSIONS = 2
+
+# Report fields kept in their own columns; the full report is kept as JSON
+REPORT_COLUMNS = ('lat', 'lon', 'incident_type', 'severity', 'timestamp')
+
+# Rows inserted per executemany call while importing
+IMPORT_BATCH = 50000
+
+# Row ids bound per query when reading rows by position
+READ_BATCH = 900
+
+def version_tag(version, crime_count, accident_count):
+    """Get the table name suffix of an incident version"""
+    return hashlib.sha1(f"{version}:{crime_count}:{accident_count}".encode()).hexdigest()[:12]
+
+def process_alive(pid):
+    """Check whether a process id is running on this machine"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def bounding_box(lat, lon, radius):
+    """Get the (south, north, west, east) box around a radius in miles"""
+    lat_delta = radius * DEGREES_PER_MILE
+    lon_delta = lat_delta / max(math.cos(math.radians(abs(lat) + lat_delta)), 1e-6)
+    return lat - lat_delta, lat + lat_delta, lon - lon_delta, lon + lon_delta
+
+class SQLiteStore:
+    """Incident and user report storage in one SQLite file with R*Tree spatial indexes
+
+    Every table has a companion R*Tree over its points, so radius queries prefilter
+    on a bounding box in SQL and only check exact distances for the rows inside it.
+    The file is opened in WAL mode, so several server processes can share it: reports
+    one process adds are seen by the others' alert queries. Incident columns are typed
+    as in IncidentStore (codes and flags as integers, dates as day ordinals). Each
+    incident version lives in its own tables, so a process still serving an older
+    version keeps reading the rows its positions refer to.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        with self.connection() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            self.create_tables(db)
+
+    def connection(self):
+        """Get this thread's connection (sqlite3 connections are not shared across threads or forks)"""
+        db = getattr(self.local, 'db', None)
+        if db is None or self.local.pid != os.getpid():
+            db = self.local.db = sqlite3.connect(self.path, timeout=self.timeout)
+            self.local.pid = os.getpid()
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def create_tables(self, db):
+        """Create the report, R*Tree, incident version and metadata tables if missing"""
+        db.execute("CREATE TABLE IF NOT EXISTS reports (id INTEGER PRIMARY KEY, lat REAL, lon REAL, "
+                   "incident_type TEXT, severity REAL, timestamp TEXT, report TEXT)")
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS reports_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+        db.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS incident_versions (tag TEXT PRIMARY KEY, version TEXT, loaded_at REAL)")
+
+    def create_incident_table(self, db, table, name):
+        """Create an incident table and its R*Tree under a new name"""
+        schema = INCIDENT_TABLES[table]
+        columns = ', '.join(f"{column} {'REAL' if kind == 'float' else 'INTEGER'}" for column, kind in schema.items())
+        db.execute(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, {columns})")
+        db.execute(f"CREATE VIRTUAL TABLE {name}_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+        db.execute(f"CREATE INDEX {name}_date ON {name} (date)")
+
+    def drop_incident_table(self, db, name):
+        """Drop an incident table and its R*Tree"""
+        db.execute(f"DROP TABLE IF EXISTS {name}_rtree")
+        db.execute(f"DROP TABLE IF EXISTS {name}")
+
+    def get_metadata(self, key):
+        """Get a stored metadata value, or None"""
+        row = self.connection().execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def import_incidents(self, crime_data, accident_data, version):
+        """Make sure tables holding this version of the incidents exist and get their names
+
+        Rows go into staging tables private to this process in short batched
+        transactions, so other processes keep writing reports meanwhile. One final
+        transaction renames them into place and marks the version ready, unless
+        another process finished the same version first. Only the KEEP_VERSIONS
+        most recently loaded versions are kept. Returns {'crimes': name, 'accidents': name}.
+        """
+        tag = version_tag(version, len(crime_data), len(accident_data))
+        names = {table: f"{table}_{tag}" for table in INCIDENT_TABLES}
+        if self.mark_loaded(tag):
+            return names
+
+        db = self.connection()
+        staging = {table: f"{name}_staging_{os.getpid()}" for table, name in names.items()}
+        with db:
+            for table, name in staging.items():
+                self.drop_incident_table(db, name)
+                self.create_incident_table(db, table, name)
+        for table, store in (('crimes', crime_data), ('accidents', accident_data)):
+            self.insert_incidents(db, staging[table], table, store)
+
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            ready = db.execute("SELECT 1 FROM incident_versions WHERE tag = ?", (tag,)).fetchone() is not None
+            for table, name in staging.items():
+                if ready:
+                    self.drop_incident_table(db, name)
+                else:
+                    db.execute(f"ALTER TABLE {name} RENAME TO {names[table]}")
+                    db.execute(f"ALTER TABLE {name}_rtree RENAME TO {names[table]}_rtree")
+            db.execute("INSERT OR REPLACE INTO incident_versions VALUES (?, ?, ?)", (tag, version, time.time()))
+        self.prune_versions()
+        return names
+
+    def insert_incidents(self, db, name, table, store):
+        """Insert an incident store into a table and its R*Tree, one transaction per batch"""
+        columns = list(INCIDENT_TABLES[table])
+        values = [store.column(column).tolist() for column in columns]
+        lats, lons = store.column('lat').tolist(), store.column('lon').tolist()
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        for start in range(0, len(store), IMPORT_BATCH):
+            stop = min(start + IMPORT_BATCH, len(store))
+            ids = range(start + 1, stop + 1)
+            with db:
+                db.executemany(f"INSERT INTO {name} (id, {', '.join(columns)}) VALUES ({placeholders})",
+                               zip(ids, *(column[start:stop] for column in values)))
+                db.executemany(f"INSERT INTO {name}_rtree VALUES (?, ?, ?, ?, ?)",
+                               ((i, lat, lat, lon, lon) for i, lat, lon in zip(ids, lats[start:stop], lons[start:stop])))
+
+    def mark_loaded(self, tag):
+        """Record that a process loaded an incident version; returns False if it is not imported yet"""
+        db = self.connection()
+        with db:
+            return db.execute("UPDATE incident_versions SET loaded_at = ? WHERE tag = ?", (time.time(), tag)).rowcount > 0
+
+    def prune_versions(self):
+        """Drop incident versions beyond the KEEP_VERSIONS most recently loaded, and staging tables of dead importers"""
+        db = self.connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            stale = [tag for tag, in db.execute(
+                "SELECT tag FROM incident_versions ORDER BY loaded_at DESC LIMIT -1 OFFSET ?", (KEEP_VERSIONS,))]
+            for tag in stale:
+                for table in INCIDENT_TABLES:
+                    self.drop_incident_table(db, f"{table}_{tag}")
+                db.execute("DELETE FROM incident_versions WHERE tag = ?", (tag,))
+            for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB '*_staging_[0-9]*' "
+                                    "AND name NOT GLOB '*_rtree*'").fetchall():
+                if not process_alive(int(name.rsplit('_', 1)[1])):
+                    self.drop_incident_table(db, name)
+
+    def incident_versions(self):
+        """Get the imported incident versions, most recently loaded first"""
+        return [version for version, in self.connection().execute(
+            "SELECT version FROM incident_versions ORDER BY loaded_at DESC")]
+
+    def incident_count(self, table):
+        """Count the rows of an incident table (a name returned by import_incidents)"""
+        return self.connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def find_incidents_in_radius(self, table, lat, lon, radius):
+        """Get store positions and distances of a table's incidents within radius of a point
+
+        table is a name returned by import_incidents.
+        """
+        south, north, west, east = bounding_box(lat, lon, radius)
+        rows = self.connection().execute(
+            f"SELECT t.id, t.lat, t.lon FROM {table}_rtree r JOIN {table} t ON t.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ? ORDER BY t.id",
+            (south, north, west, east)).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        ids, lats, lons = (np.array(column) for column in zip(*rows))
+        distances = geo.local_distances(lat, lon, lats, lons)
+        within = distances <= radius
+        return ids[within].astype(np.int64) - 1, distances[within]
+
+    def read_incident_columns(self, table, schema, names, positions=None):
+        """Read incident columns as typed arrays, for every row or only the rows at sorted unique positions"""
+        select = f"SELECT {', '.join(names)} FROM {table}"
+        db = self.connection()
+        if positions is None:
+            rows = db.execute(f"{select} ORDER BY id").fetchall()
+        else:
+            ids = (np.asarray(positions, dtype=np.int64) + 1).tolist()
+            rows = []
+            for start in range(0, len(ids), READ_BATCH):
+                batch = ids[start:start + READ_BATCH]
+                rows += db.execute(f"{select} WHERE id IN ({', '.join('?' * len(batch))}) ORDER BY id", batch).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(names)
+        return {name: np.array(values, dtype=COLUMN_DTYPES[schema[name]]) for name, values in zip(names, columns)}
+
+    def incident_positions_between(self, table, name, low, high):
+        """Get the store positions of a table's incidents whose column value is at least low and below high"""
+        rows = self.connection().execute(
+            f"SELECT id FROM {table} WHERE {name} >= ? AND {name} < ? ORDER BY id", (int(low), int(high))).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64) - 1
+
+    def stored_incidents(self, table, incidents):
+        """Get a StoredIncidents view of a table imported from an in-memory incident store"""
+        return StoredIncidents(self, table, incidents.schema, incidents.vocabularies)
+
+    def add_report(self, report):
+        """Store a user report and get its id"""
+        db = self.connection()
+        with db:
+            cursor = db.execute(
+                f"INSERT INTO reports ({', '.join(REPORT_COLUMNS)}, report) VALUES (?, ?, ?, ?, ?, ?)",
+                (*(report.get(name) for name in REPORT_COLUMNS), json.dumps(report)))
+            db.execute("INSERT INTO reports_rtree VALUES (?, ?, ?, ?, ?)",
+                       (cursor.lastrowid, report['lat'], report['lat'], report['lon'], report['lon']))
+        return cursor.lastrowid
+
+    def report_count(self):
+        """Count stored user reports"""
+        return self.connection().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def reports(self):
+        """Get every stored user report in insertion order"""
+        return [json.loads(row[0]) for row in self.connection().execute("SELECT report FROM reports ORDER BY id")]
+
+    def reports_in_radius(self, lat, lon, radius):
+        """Get (report, distance) pairs for user reports within radius of a point, oldest first"""
+        south, north, west, east = bounding_box(lat, lon, radius)
+        rows = self.connection().execute(
+            "SELECT p.lat, p.lon, p.report FROM reports_rtree r JOIN reports p ON p.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ? ORDER BY p.id",
+            (south, north, west, east)).fetchall()
+        if not rows:
+            return []
+        
+        lats, lons, reports = zip(*rows)
+        distances = geo.local_distances(lat, lon, np.array(lats), np.array(lons))
+        return [(json.loads(report), float(distance))
+                for report, distance in zip(reports, distances) if distance <= radius]
+
+    def nbytes(self):
+        """Get the size of the database file in bytes"""
+        db = self.connection()
+        return db.execute("PRAGMA page_count").fetchone()[0] * db.execute("PRAGMA page_size").fetchone()[0]
+
+    def close(self):
+        """Close this thread's connection"""
+        db = getattr(self.local, 'db', None)
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+class StoredIncidents(IncidentStore):
+    """An incident table of an SQLiteStore, read in place of an in-memory IncidentStore
+
+    No column is held in memory: radius queries read only the rows they match, and
+    whole columns (raster rebuilds, bundle writes) are read when asked for.
+    """
+
+    def __init__(self, storage, table, schema, vocabularies):
+        self.storage = storage
+        self.table = table
+        self.schema = schema
+        self.columns = {}
+        self.vocabularies = {name: list(values) for name, values in vocabularies.items()}
+        self.size = storage.incident_count(table)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, position):
+        return self.take(np.array([position]))[0]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def column(self, name):
+        return self.storage.read_incident_columns(self.table, self.schema, [name])[name]
+
+    def column_at(self, name, positions):
+        return self.take_columns([name], positions)[name]
+
+    def positions_between(self, name, low, high):
+        return self.storage.incident_positions_between(self.table, name, low, high)
+
+    def mask(self, name, value):
+        vocabulary = self.vocabularies[name]
+        if value not in vocabulary:
+            return np.zeros(len(self), dtype=np.bool_)
+        return self.column(name) == vocabulary.index(value)
+
+    def take_columns(self, names, positions):
+        """Read columns at positions, in the order given"""
+        positions = np.asarray(positions, dtype=np.int64)
+        unique, inverse = np.unique(positions, return_inverse=True)
+        columns = self.storage.read_incident_columns(self.table, self.schema, names, unique)
+        return {name: values[inverse.ravel()] for name, values in columns.items()}
+
+    def take(self, positions):
+        return IncidentStore(self.schema, self.take_columns(list(self.schema), positions), self.vocabularies)
+
+    def load(self):
+        """Read the whole table into an in-memory IncidentStore"""
+        columns = self.storage.read_incident_columns(self.table, self.schema, list(self.schema))
+        return IncidentStore(self.schema, columns, self.vocabularies)
+
+    def to_saved(self):
+        return self.load().to_saved()
+
+    def nbytes(self):
+        return 0
@@ -0,0 +1,32 @@
+import os
+import pytest
+from model import WalkSafeModel
+
+# Shipped artifacts, relative to server_env
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+@pytest.fixture(scope="session")
+def shipped_model():
+    """The shipped model, loaded once for every test that only reads it"""
+    walksafe = WalkSafeModel()
+    if not walksafe.load_model(MODEL_DIR):
+        pytest.skip("Shipped model artifacts are not available")
+    return walksafe
+
+@pytest.fixture
+def fresh_model():
+    """A private copy of the shipped model for tests that add reports or change state"""
+    walksafe = WalkSafeModel()
+    if not walksafe.load_model(MODEL_DIR):
+        pytest.skip("Shipped model artifacts are not available")
+    return walksafe
+
+@pytest.fixture(scope="session")
+def server_module(tmp_path_factory):
+    """The API module, imported with its report log, tile cache and reload request file in a scratch directory"""
+    scratch = tmp_path_factory.mktemp("server")
+    os.environ.setdefault("WALKSAFE_REPORT_LOG_DIR", "")
+    os.environ.setdefault("WALKSAFE_TILE_CACHE_DIR", str(scratch / "tile_cache"))
+    os.environ.setdefault("WALKSAFE_RELOAD_REQUEST_PATH", str(scratch / ".reload-request"))
+    import server
+    return server
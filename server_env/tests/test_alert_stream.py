@@ -0,0 +1,54 @@
+import json
+import numpy as np
+import pytest
+import geo
+from alert_stream import AlertHub, format_event
+
+def report_at(lat, lon):
+    return {'lat': lat, 'lon': lon, 'incident_type': 'theft', 'severity': 0.6, 'timestamp': '2026-01-01T12:00:00'}
+
+def queued(subscriber):
+    alerts = []
+    while not subscriber.queue.empty():
+        alerts.append(subscriber.queue.get_nowait())
+    return alerts
+
+def test_reports_reach_exactly_the_circles_that_contain_them():
+    hub = AlertHub()
+    rng = np.random.default_rng(21)
+    subscribers = [hub.subscribe(float(lat), float(lon), float(radius)) for lat, lon, radius in
+                   zip(rng.uniform(26.43, 26.49, 200), rng.uniform(-80.12, -80.04, 200), rng.uniform(0.1, 1.0, 200))]
+    reports = [report_at(float(lat), float(lon)) for lat, lon in
+               zip(rng.uniform(26.43, 26.49, 50), rng.uniform(-80.12, -80.04, 50))]
+    delivered = sum(hub.publish(report) for report in reports)
+    
+    total = 0
+    for subscriber in subscribers:
+        inside = [report for report in reports if geo.calculate_distance(
+            subscriber.lat, subscriber.lon, report['lat'], report['lon']) <= subscriber.radius]
+        alerts = queued(subscriber)
+        assert [(alert['lat'], alert['lon']) for alert in alerts] == [(report['lat'], report['lon']) for report in inside]
+        assert all(alert['distance'] <= subscriber.radius for alert in alerts)
+        total += len(alerts)
+    assert delivered == total == hub.stats()['delivered']
+
+def test_unsubscribed_clients_get_nothing_and_free_their_cells():
+    hub = AlertHub()
+    subscriber = hub.subscribe(26.4615, -80.0728, 0.5)
+    assert hub.publish(report_at(26.4620, -80.0730)) == 1
+    hub.unsubscribe(subscriber)
+    assert hub.publish(report_at(26.4620, -80.0730)) == 0
+    assert hub.stats()['subscribers'] == 0 and hub.stats()['indexed_cells'] == 0
+
+def test_a_full_queue_drops_its_oldest_alert():
+    hub = AlertHub(queue_size=2)
+    subscriber = hub.subscribe(26.4615, -80.0728, 0.5)
+    for offset in range(3):
+        hub.publish(report_at(26.4615 + offset * 1e-4, -80.0728))
+    assert [alert['lat'] for alert in queued(subscriber)] == pytest.approx([26.4616, 26.4617])
+    assert subscriber.dropped == 1
+
+def test_events_are_encoded_as_server_sent_events():
+    message = format_event("alert", {'severity': 0.6})
+    assert message.startswith("event: alert\ndata: ") and message.endswith("\n\n")
+    assert json.loads(message.split("data: ", 1)[1]) == {'severity': 0.6}
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import geo
+from conftest import MODEL_DIR
+from model import MAX_CRIME_ALERTS
+
+CENTER = (26.4615, -80.0728)
+
+def brute_force_alerts(walksafe, radius):
+    """(severity, distance) of every report and the most severe high-risk crimes within radius, in rank order"""
+    lat, lon = CENTER
+    reports = [(report['severity'], float(geo.local_distances(lat, lon, report['lat'], report['lon'])))
+               for report in walksafe.incident_reports]
+    crimes = walksafe.crime_data
+    distances = geo.local_distances(lat, lon, crimes.column('lat'), crimes.column('lon'))
+    severities = crimes.column('severity')
+    high_risk = (distances <= radius) & (severities > np.float32(0.7))
+    ranked_crimes = sorted(zip(-severities[high_risk].astype(np.float64), distances[high_risk]))[:MAX_CRIME_ALERTS]
+    ranked = sorted([(-severity, distance) for severity, distance in reports if distance <= radius] + ranked_crimes)
+    return [(-severity, distance) for severity, distance in ranked]
+
+@pytest.fixture(scope="module")
+def reported(shipped_model):
+    """A copy of the shipped model with reports of many severities around CENTER"""
+    walksafe = type(shipped_model)()
+    walksafe.load_model(MODEL_DIR)
+    rng = np.random.default_rng(20)
+    for lat, lon, severity in zip(rng.normal(CENTER[0], 0.005, 60), rng.normal(CENTER[1], 0.005, 60),
+                                  rng.choice([0.2, 0.5, 0.8, 0.95], 60)):
+        walksafe.add_incident_report({'lat': float(lat), 'lon': float(lon), 'incident_type': 'theft',
+                                      'severity': float(severity)})
+    return walksafe
+
+@pytest.mark.parametrize("limit", [1, 5, 20, None])
+def test_top_alerts_match_a_full_sort(reported, limit):
+    expected = brute_force_alerts(reported, 0.5)
+    alerts = reported.get_nearby_alerts(*CENTER, radius=0.5, limit=limit)
+    if limit is not None:
+        expected = expected[:limit]
+    
+    assert len(alerts) == len(expected)
+    assert [alert['severity'] for alert in alerts] == pytest.approx([severity for severity, _ in expected], abs=1e-6)
+    assert [alert['distance'] for alert in alerts] == pytest.approx([distance for _, distance in expected], abs=1e-9)
+
+def test_alerts_stay_inside_the_radius(reported):
+    alerts = reported.get_nearby_alerts(*CENTER, radius=0.2)
+    assert alerts and all(alert['distance'] <= 0.2 for alert in alerts)
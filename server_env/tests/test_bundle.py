@@ -0,0 +1,33 @@
+import numpy as np
+from bundle import load_bundle
+from model import WalkSafeModel
+
+def test_round_trip_keeps_predictions(shipped_model, tmp_path):
+    shipped_model.save_bundle(str(tmp_path / "bundle"))
+    loaded = WalkSafeModel()
+    assert loaded.load_model(str(tmp_path / "bundle"))
+    
+    points = [{'lat': 26.4615, 'lon': -80.0728}, {'lat': 26.4432, 'lon': -80.1011}]
+    for exact in (False, True):
+        expected = shipped_model.predict_safety_batch(points, 21, 5, exact=exact)
+        actual = loaded.predict_safety_batch(points, 21, 5, exact=exact)
+        assert [p['safety_score'] for p in actual] == [p['safety_score'] for p in expected]
+    assert loaded.safety_raster.recent_cutoff == shipped_model.safety_raster.recent_cutoff
+
+def test_bundle_from_an_earlier_day_is_brought_up_to_date(fresh_model, tmp_path, monkeypatch):
+    # Build the bundle as if on a day when the recent window reached a year further back
+    monkeypatch.setattr(fresh_model, 'recent_cutoff_ordinal',
+                        lambda days: WalkSafeModel.recent_cutoff_ordinal(fresh_model, days) - 365)
+    fresh_model.safety_raster = fresh_model.build_safety_raster(fresh_model.raster_step)
+    fresh_model.save_bundle(str(tmp_path / "bundle"))
+    saved = load_bundle(str(tmp_path / "bundle"))['safety_raster']
+    
+    loaded = WalkSafeModel()
+    assert loaded.load_model(str(tmp_path / "bundle"))
+    raster = loaded.safety_raster
+    rebuilt = loaded.build_safety_raster(raster.step)
+    assert saved.recent_cutoff == rebuilt.recent_cutoff - 365
+    assert not np.allclose(saved.stats['recent_crime_count'], rebuilt.stats['recent_crime_count'])
+    assert raster.recent_cutoff == rebuilt.recent_cutoff
+    assert np.allclose(raster.stats['recent_crime_count'], rebuilt.stats['recent_crime_count'])
+    assert np.allclose(raster.scores, rebuilt.scores)
@@ -0,0 +1,34 @@
+import numpy as np
+from model import DANGER_ZONE_BOUNDS, DANGER_ZONE_RESOLUTION
+
+def exact_zone_scores(walksafe, hour, day):
+    """Score every danger zone grid point with an exact per-point prediction"""
+    grid = walksafe.get_coverage_grid(DANGER_ZONE_BOUNDS['north'], DANGER_ZONE_BOUNDS['south'],
+                                      DANGER_ZONE_BOUNDS['east'], DANGER_ZONE_BOUNDS['west'], DANGER_ZONE_RESOLUTION)
+    return np.array([walksafe.predict_safety(lat, lon, hour, day)['safety_score'] for lat, lon in grid])
+
+def test_grid_matches_exact_predictions(shipped_model):
+    for hour, day in [(12, 0), (8, 5), (23, 5)]:
+        time_level, day_level = shipped_model.get_risk_levels(hour, day)
+        assert np.allclose(shipped_model.danger_grid['scores'][time_level, day_level],
+                           exact_zone_scores(shipped_model, hour, day))
+
+def test_zones_are_the_exact_low_scoring_points(shipped_model):
+    scores = exact_zone_scores(shipped_model, None, None)
+    zones = shipped_model.get_danger_zones()
+    assert len(zones) == np.count_nonzero(scores < 0.4)
+    assert all(zone['safety_score'] < 0.4 for zone in zones)
+
+def test_reports_refresh_the_grid(fresh_model):
+    before = fresh_model.danger_grid['scores'].copy()
+    # Report around the safest grid point, where added crimes can still lower the score
+    safest = int(np.argmax(before.min(axis=(0, 1))))
+    lat, lon = fresh_model.danger_grid['lats'][safest], fresh_model.danger_grid['lons'][safest]
+    for i in range(20):
+        fresh_model.add_incident_report({'lat': lat + (i % 5) * 0.001, 'lon': lon, 'incident_type': 'assault',
+                                         'severity': 0.9})
+    incremental = fresh_model.danger_grid['scores'].copy()
+    assert not np.array_equal(before, incremental)
+    
+    fresh_model.build_danger_grid()
+    assert np.allclose(incremental, fresh_model.danger_grid['scores'])
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+import pytest
+import executor
+from conftest import MODEL_DIR
+from executor import ModelExecutor, WorkerBehind, parse_limits
+
+POINT = {'lat': 26.4615, 'lon': -80.0728}
+
+class SlowModel:
+    """Stand-in model whose calls take a while and record how many overlap"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+    
+    def work(self, value):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return value * 2
+
+def run_all(model_executor, endpoint, values):
+    async def calls():
+        return await asyncio.gather(*(model_executor.run(endpoint, "work", value) for value in values))
+    return asyncio.run(calls())
+
+def test_parse_limits():
+    assert parse_limits(" heatmap=2, tiles=8 ,") == {'heatmap': 2, 'tiles': 8}
+    assert parse_limits("") == {}
+
+def test_unknown_kind_is_refused():
+    with pytest.raises(ValueError):
+        ModelExecutor(SlowModel(), kind='fiber')
+
+@pytest.mark.parametrize("kind", ['inline', 'thread'])
+def test_calls_return_model_results(kind):
+    model_executor = ModelExecutor(SlowModel(), kind=kind)
+    try:
+        assert run_all(model_executor, "other", [1, 2, 3]) == [2, 4, 6]
+    finally:
+        model_executor.shutdown()
+
+def test_endpoint_limits_cap_concurrent_calls():
+    model = SlowModel()
+    model_executor = ModelExecutor(model, kind='thread', max_workers=4, limits={'heatmap': 2})
+    try:
+        run_all(model_executor, "heatmap", range(8))
+        assert model.peak == 2
+        model.peak = 0
+        run_all(model_executor, "other", range(8))
+        assert model.peak == 4
+    finally:
+        model_executor.shutdown()
+
+def test_a_worker_behind_the_sent_reports_asks_for_its_own(fresh_model, monkeypatch):
+    monkeypatch.setattr(executor, "_worker_model", fresh_model)
+    reports = [{**POINT, 'incident_type': 'theft', 'severity': 0.5, 'timestamp': '2026-01-01T12:00:00'}] * 3
+    behind = executor._call_worker_model("get_statistics", (), {}, 2, reports[2:])
+    assert isinstance(behind, WorkerBehind) and behind.applied == 0
+    
+    executor._call_worker_model("get_statistics", (), {}, 0, reports[:2])
+    executor._call_worker_model("get_statistics", (), {}, 1, reports[1:])
+    assert len(fresh_model.incident_reports) == 3
+
+def test_process_workers_see_user_reports(fresh_model):
+    model_executor = ModelExecutor(fresh_model, kind='process', max_workers=2, model_dir=MODEL_DIR)
+    try:
+        async def scores():
+            predictions = await asyncio.gather(*(model_executor.run(
+                "predict-batch", "predict_safety_batch", [POINT], 21, 5) for _ in range(4)))
+            return [prediction[0]['factors']['crime_density'] for prediction in predictions]
+        
+        before = asyncio.run(scores())
+        for severity in (0.6, 0.9):
+            fresh_model.add_incident_report({**POINT, 'incident_type': 'assault', 'severity': severity})
+            expected = fresh_model.predict_safety_batch([POINT], 21, 5)[0]['factors']['crime_density']
+            assert asyncio.run(scores()) == [expected] * 4
+        assert expected > before[0]
+    finally:
+        model_executor.shutdown()
@@ -0,0 +1,52 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+from forest import FlatForest
+from conftest import MODEL_DIR
+
+def parity_rows(flat_forest, scaler, n_random=20000, seed=3):
+    """Random rows plus rows on and just past every split threshold"""
+    rng = np.random.default_rng(seed)
+    random_rows = scaler.mean_ + rng.normal(size=(n_random, len(scaler.mean_))) * scaler.scale_ * 2
+
+    splits = np.flatnonzero(np.isfinite(flat_forest.threshold))
+    boundary_rows = np.tile(scaler.mean_, (2 * len(splits), 1))
+    features = flat_forest.feature[splits]
+    thresholds = flat_forest.threshold[splits]
+    boundary_rows[np.arange(len(splits)), features] = thresholds
+    boundary_rows[len(splits) + np.arange(len(splits)), features] = np.nextafter(thresholds, np.inf)
+    return np.vstack([random_rows, boundary_rows])
+
+def assert_parity(model, scaler):
+    flat_forest = FlatForest.from_sklearn(model, scaler)
+    rows = parity_rows(flat_forest, scaler)
+    expected = model.predict(scaler.transform(rows))
+    assert np.array_equal(flat_forest.predict(rows), expected)
+
+def test_matches_trained_forest_exactly():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6)) * [1, 10, 0.1, 100, 1, 5] + [0, 3, -1, 50, 2, 0]
+    y = X[:, 0] * 0.3 - np.abs(X[:, 2]) + rng.normal(scale=0.1, size=2000)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    assert_parity(model, scaler)
+
+def test_matches_shipped_forest_exactly():
+    model_path = os.path.join(MODEL_DIR, "walksafe_model.pkl")
+    if not os.path.exists(model_path):
+        pytest.skip("Shipped model pickles are not available")
+    assert_parity(joblib.load(model_path), joblib.load(os.path.join(MODEL_DIR, "walksafe_scaler.pkl")))
+
+def test_predicts_small_and_chunked_batches():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(500, 3))
+    y = X.sum(axis=1)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+    flat_forest = FlatForest.from_sklearn(model, scaler)
+    rows = rng.normal(size=(10000, 3))
+    assert np.array_equal(flat_forest.predict(rows), model.predict(scaler.transform(rows)))
+    assert np.array_equal(flat_forest.predict(rows[:1]), model.predict(scaler.transform(rows[:1])))
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import geo
+
+def random_points(n, seed):
+    """n points spread a few miles around Delray Beach"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(26.40, 26.50, n), rng.uniform(-80.15, -80.00, n)
+
+def test_vectorized_haversine_matches_the_scalar_formula():
+    lats, lons = random_points(200, seed=1)
+    distances = geo.haversine_distances(26.4615, -80.0728, lats, lons)
+    expected = [geo.calculate_distance(26.4615, -80.0728, lat, lon) for lat, lon in zip(lats, lons)]
+    assert distances == pytest.approx(expected, rel=1e-12, abs=1e-12)
+
+def test_haversine_broadcasts_pairwise():
+    lats, lons = random_points(20, seed=2)
+    distances = geo.haversine_distances(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+    assert distances.shape == (20, 20)
+    assert np.allclose(distances, distances.T)
+    assert np.allclose(np.diag(distances), 0)
+    assert distances[3, 7] == pytest.approx(geo.calculate_distance(lats[3], lons[3], lats[7], lons[7]), rel=1e-12)
+
+def test_local_distances_stay_within_a_foot_of_haversine():
+    lats, lons = random_points(500, seed=3)
+    local = geo.local_distances(26.4615, -80.0728, lats, lons)
+    exact = geo.haversine_distances(26.4615, -80.0728, lats, lons)
+    assert np.max(np.abs(local - exact)) < 1 / 5280
+
+def test_path_distance_sums_the_legs():
+    lats, lons = random_points(10, seed=4)
+    legs = [geo.calculate_distance(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(9)]
+    assert geo.path_distance(lats, lons) == pytest.approx(sum(legs), rel=1e-12)
+    assert geo.path_distance(lats[:1], lons[:1]) == 0.0
@@ -0,0 +1,43 @@
+import numpy as np
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA, MISSING_DATE
+
+CRIMES = [
+    {'lat': 26.4615, 'lon': -80.0728, 'severity': 0.8, 'date': '2025-03-14', 'crime_type': 'violent', 'category': 'assault'},
+    {'lat': 26.4432, 'lon': -80.1011, 'severity': 0.3, 'date': 'not a date', 'crime_type': 'theft', 'category': 'theft'},
+    {'lat': 26.4871, 'lon': -80.0553, 'severity': 0.55, 'date': None, 'crime_type': 'arson', 'category': 'arson'}
+]
+
+def test_records_round_trip_through_typed_columns():
+    store = IncidentStore.from_records(CRIME_SCHEMA, CRIMES)
+    assert len(store) == 3
+    assert store.column('lat').dtype == np.float32
+    assert store.column('date').dtype == np.int32
+    assert store.column('crime_type').dtype == np.int8
+    
+    assert store[0] == CRIMES[0]
+    # Unparseable dates are kept as missing; unknown codes extend the vocabulary
+    assert store.column('date')[1] == MISSING_DATE and store[1]['date'] is None
+    assert store[2]['crime_type'] == 'arson'
+    assert store.vocabularies['crime_type'][-1] == 'arson'
+
+def test_masks_and_take():
+    store = IncidentStore.from_records(CRIME_SCHEMA, CRIMES)
+    assert store.mask('crime_type', 'violent').tolist() == [True, False, False]
+    assert not store.mask('crime_type', 'piracy').any()
+    
+    subset = store.take(np.array([2, 0]))
+    assert [record['category'] for record in subset] == ['arson', 'assault']
+    assert subset.vocabularies == store.vocabularies
+
+def test_saved_form_and_legacy_lists_load_the_same():
+    store = IncidentStore.from_records(CRIME_SCHEMA, CRIMES)
+    assert list(IncidentStore.from_saved(CRIME_SCHEMA, store.to_saved())) == list(store)
+    assert list(IncidentStore.from_saved(CRIME_SCHEMA, CRIMES)) == list(store)
+
+def test_accident_flags():
+    store = IncidentStore.from_records(ACCIDENT_SCHEMA, [
+        {'lat': 26.45, 'lon': -80.07, 'severity': 0.9, 'date': '2025-01-02', 'pedestrian_involved': 1, 'intersection': False}
+    ])
+    assert store.column('pedestrian_involved').dtype == np.bool_
+    assert store[0]['pedestrian_involved'] is True and store[0]['intersection'] is False
+    assert store.nbytes() == sum(column.nbytes for column in store.columns.values())
@@ -0,0 +1,37 @@
+from locations import LocationStore
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_future_timestamps_are_capped_at_server_time():
+    clock = Clock()
+    store = LocationStore(clock=clock)
+    assert store.update_many([{'user_id': 'a', 'lat': 26.46, 'lon': -80.07, 'timestamp': clock.now + 3600}]) == 1
+    assert store.get_many(['a'])['a']['recorded_at'] == clock.now
+    
+    # A fast client clock no longer blocks the next real update
+    clock.now += 5
+    assert store.update_many([{'user_id': 'a', 'lat': 26.47, 'lon': -80.07, 'timestamp': clock.now - 1}]) == 1
+    assert store.get_many(['a'])['a']['lat'] == 26.47
+
+def test_out_of_order_updates_are_ignored():
+    clock = Clock()
+    store = LocationStore(clock=clock)
+    store.update_many([{'user_id': 'a', 'lat': 26.46, 'lon': -80.07, 'timestamp': clock.now - 1}])
+    assert store.update_many([{'user_id': 'a', 'lat': 26.47, 'lon': -80.07, 'timestamp': clock.now - 10}]) == 0
+    assert store.get_many(['a'])['a']['lat'] == 26.46
+
+def test_positions_are_visible_only_to_viewers_they_are_shared_with():
+    store = LocationStore()
+    assert store.set_viewers('alice', ['bob', 'carol']) == ['bob', 'carol']
+    assert store.visible_to('bob', ['alice', 'dave']) == {'alice'}
+    assert store.visible_to('dave', ['alice']) == set()
+    
+    assert store.set_viewers('alice', ['bob'], allow=False) == ['carol']
+    assert store.visible_to('bob', ['alice']) == set()
+    store.set_viewers('alice', ['carol'], allow=False)
+    assert store.stats()['sharing_users'] == 0
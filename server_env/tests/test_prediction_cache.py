@@ -0,0 +1,58 @@
+from model import WalkSafeModel
+
+POINT = {'lat': 26.46153, 'lon': -80.07281}
+NEIGHBOR = {'lat': 26.46147, 'lon': -80.07276}
+
+def cell_center(walksafe, point):
+    size = walksafe.cache_cell_size
+    return {'lat': round(point['lat'] / size) * size, 'lon': round(point['lon'] / size) * size}
+
+def test_points_in_one_cell_share_the_prediction_at_its_center(fresh_model):
+    first = fresh_model.predict_safety(POINT['lat'], POINT['lon'], 21, 5)
+    hits = fresh_model.prediction_cache.stats()['hits']
+    second = fresh_model.predict_safety(NEIGHBOR['lat'], NEIGHBOR['lon'], 21, 5)
+    
+    assert fresh_model.prediction_cache.stats()['hits'] == hits + 1
+    assert (second['lat'], second['lon']) == (NEIGHBOR['lat'], NEIGHBOR['lon'])
+    center = fresh_model.compute_safety_predictions([cell_center(fresh_model, POINT)], [21], [5], exact=True)[0]
+    assert first['safety_score'] == second['safety_score'] == center['safety_score']
+
+def test_cached_answers_do_not_depend_on_which_point_came_first(fresh_model, shipped_model):
+    other = WalkSafeModel()
+    other.use_components({
+        'model': shipped_model.model, 'scaler': shipped_model.scaler, 'forest': shipped_model.forest,
+        'feature_importance': shipped_model.feature_importance, 'features_config': shipped_model.features_config,
+        'crime_data': shipped_model.crime_data, 'accident_data': shipped_model.accident_data,
+        'delray_center': shipped_model.delray_center, 'metadata': shipped_model.metadata
+    })
+    forward = fresh_model.predict_safety_batch([POINT, NEIGHBOR], 21, 5)
+    backward = other.predict_safety_batch([NEIGHBOR, POINT], 21, 5)
+    assert [p['safety_score'] for p in forward] == [p['safety_score'] for p in backward[::-1]]
+
+def test_time_buckets_get_their_own_entries(fresh_model):
+    night = fresh_model.predict_safety(POINT['lat'], POINT['lon'], 23, 5)
+    size = fresh_model.prediction_cache.stats()['size']
+    # 2 PM falls in another time risk bucket than 11 PM
+    fresh_model.predict_safety(POINT['lat'], POINT['lon'], 14, 5)
+    assert fresh_model.prediction_cache.stats()['size'] == size + 1
+    assert fresh_model.predict_safety(POINT['lat'], POINT['lon'], 23, 5) == night
+
+def test_a_report_invalidates_cached_predictions(fresh_model):
+    before = fresh_model.predict_safety(POINT['lat'], POINT['lon'], 21, 5)
+    fresh_model.add_incident_report({**POINT, 'incident_type': 'assault', 'severity': 0.9})
+    misses = fresh_model.prediction_cache.stats()['misses']
+    after = fresh_model.predict_safety(POINT['lat'], POINT['lon'], 21, 5)
+    
+    assert fresh_model.prediction_cache.stats()['misses'] == misses + 1
+    assert after['factors']['crime_density'] > before['factors']['crime_density']
+
+def test_a_recent_window_refresh_invalidates_cached_predictions(fresh_model, monkeypatch):
+    fresh_model.predict_safety(POINT['lat'], POINT['lon'], 21, 5)
+    version = fresh_model.data_version
+    monkeypatch.setattr(fresh_model, 'recent_cutoff_ordinal',
+                        lambda days: WalkSafeModel.recent_cutoff_ordinal(fresh_model, days) - 1)
+    misses = fresh_model.prediction_cache.stats()['misses']
+    fresh_model.predict_safety(POINT['lat'], POINT['lon'], 21, 5)
+    
+    assert fresh_model.data_version == version + 1
+    assert fresh_model.prediction_cache.stats()['misses'] == misses + 1
@@ -0,0 +1,69 @@
+import os
+from report_log import LogFollower, ReportLog, claim_report_log, encode_record, list_segments
+
+def report(i):
+    return {'lat': 26.46, 'lon': -80.07, 'incident_type': 'theft', 'severity': 0.5, 'n': i}
+
+def append_all(log, records):
+    for future in [log.append(record) for record in records]:
+        future.result()
+
+def test_each_process_claims_its_own_slot(tmp_path):
+    base = str(tmp_path / "reports")
+    first, _ = claim_report_log(base, commit_interval=0)
+    second, _ = claim_report_log(base, commit_interval=0)
+    try:
+        assert first.directory == base
+        assert second.directory == os.path.join(base, "worker-1")
+        append_all(second, [report(0)])
+    finally:
+        first.close()
+        second.close()
+    
+    # A restarted worker takes over a free slot, with the reports logged there
+    reclaimed, records = claim_report_log(base, commit_interval=0)
+    reclaimed.close()
+    assert reclaimed.directory == base and records == []
+    assert ReportLog(os.path.join(base, "worker-1")).recover() == [report(0)]
+
+def test_follower_reads_every_record_once_across_snapshots(tmp_path):
+    directory = str(tmp_path / "worker-1")
+    owner = ReportLog(directory, commit_interval=0, snapshot_every=4)
+    owner.recover()
+    follower = LogFollower(directory)
+    seen = []
+    try:
+        for batch in range(6):
+            append_all(owner, [report(batch * 3 + i) for i in range(3)])
+            if owner.snapshot_thread is not None:
+                owner.snapshot_thread.join()
+            seen += follower.poll()
+        assert owner.snapshots >= 2
+        assert seen == [report(i) for i in range(18)]
+        assert follower.poll() == []
+        
+        # A follower that starts late reads the snapshot, then the segments after it
+        assert LogFollower(directory).poll() == [report(i) for i in range(18)]
+    finally:
+        owner.close()
+
+def test_follower_waits_for_a_line_still_being_written(tmp_path):
+    directory = str(tmp_path / "worker-1")
+    owner = ReportLog(directory, commit_interval=0)
+    owner.recover()
+    append_all(owner, [report(0)])
+    owner.close()
+    
+    follower = LogFollower(directory)
+    assert follower.poll() == [report(0)]
+    line = encode_record(report(1))
+    path = os.path.join(directory, list_segments(directory)[-1][1])
+    with open(path, 'ab') as f:
+        f.write(line[:10])
+    assert follower.poll() == []
+    with open(path, 'ab') as f:
+        f.write(line[10:])
+    assert follower.poll() == [report(1)]
+
+def test_follower_of_a_missing_directory_reads_nothing(tmp_path):
+    assert LogFollower(str(tmp_path / "worker-9")).poll() == []
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+from report_timeline import ReportTimeline
+
+def test_window_counts_match_a_scan_with_out_of_order_times():
+    start = datetime(2026, 1, 1)
+    times = [start + timedelta(hours=hours) for hours in (5, 1, 9, 3, 3, 12, 7)]
+    timeline = ReportTimeline()
+    for timestamp in times:
+        timeline.add(timestamp.isoformat())
+    
+    assert timeline.times == sorted(timeline.times)
+    for after, until in [(0, None), (3, None), (3, 7), (4, 9), (12, None), (13, 2)]:
+        lower = start + timedelta(hours=after)
+        upper = None if until is None else start + timedelta(hours=until)
+        expected = len([t for t in times if t > lower and (upper is None or t <= upper)])
+        assert timeline.count_between(lower, upper) == expected
+
+def test_weekly_report_count_matches_a_rescan(fresh_model):
+    now = datetime.now()
+    fresh_model.incident_reports = [{'timestamp': (now - timedelta(hours=6 * i)).isoformat()} for i in range(200)]
+    for report in fresh_model.incident_reports:
+        fresh_model.report_timeline.add(report['timestamp'])
+    
+    rescanned = len([report for report in fresh_model.incident_reports
+                     if datetime.fromisoformat(report['timestamp']) > datetime.now() - timedelta(days=7)])
+    counted = fresh_model.get_statistics()['delray_beach_stats']['user_reports_this_week']
+    # A report exactly on the boundary may fall either side between the two clock reads
+    assert abs(counted - rescanned) <= 1
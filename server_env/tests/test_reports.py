@@ -0,0 +1,70 @@
+import numpy as np
+
+REPORT = {'lat': 26.4615, 'lon': -80.0728, 'incident_type': 'theft', 'severity': 0.8}
+
+def test_predictions_racing_a_report_are_not_cached(fresh_model, monkeypatch):
+    point = {'lat': 26.4701, 'lon': -80.0682}
+    compute = fresh_model.compute_safety_predictions
+    
+    def compute_then_report(*args, **kwargs):
+        predictions = compute(*args, **kwargs)
+        fresh_model.add_incident_report({**REPORT, 'lat': point['lat'], 'lon': point['lon']})
+        return predictions
+    
+    monkeypatch.setattr(fresh_model, 'compute_safety_predictions', compute_then_report)
+    stale = fresh_model.predict_safety_batch([point], 21, 5)[0]
+    monkeypatch.setattr(fresh_model, 'compute_safety_predictions', compute)
+    
+    current = fresh_model.predict_safety_batch([point], 21, 5)[0]
+    size = fresh_model.cache_cell_size
+    center = {'lat': round(point['lat'] / size) * size, 'lon': round(point['lon'] / size) * size}
+    assert current['safety_score'] == compute([center], [21], [5])[0]['safety_score']
+    assert current['factors']['crime_density'] > stale['factors']['crime_density']
+
+def test_report_arrays_built_before_a_report_are_rebuilt(fresh_model):
+    fresh_model.add_incident_report(REPORT)
+    before = fresh_model.report_stats_near(REPORT['lat'], REPORT['lon'], 0.3)
+    
+    # A reader that built its arrays just before another report landed stores them afterwards
+    stale_arrays = fresh_model.report_arrays
+    fresh_model.add_incident_report(REPORT)
+    fresh_model.report_arrays = stale_arrays
+    after = fresh_model.report_stats_near(REPORT['lat'], REPORT['lon'], 0.3)
+    assert after['crime_count'] == before['crime_count'] + 1
+
+def test_hand_over_keeps_reports_sent_during_a_reload(fresh_model, shipped_model):
+    successor = type(fresh_model)()
+    successor.use_components({
+        'model': shipped_model.model, 'scaler': shipped_model.scaler, 'forest': shipped_model.forest,
+        'feature_importance': shipped_model.feature_importance, 'features_config': shipped_model.features_config,
+        'crime_data': shipped_model.crime_data, 'accident_data': shipped_model.accident_data,
+        'delray_center': shipped_model.delray_center, 'metadata': shipped_model.metadata
+    })
+    # One report lands while the successor loads, another on the old model after the hand-over
+    fresh_model.add_incident_report(REPORT)
+    fresh_model.hand_over(successor, 0)
+    forwarded = fresh_model.add_incident_report({**REPORT, 'incident_type': 'assault'})
+    
+    assert successor.incident_reports is fresh_model.incident_reports
+    assert [report['incident_type'] for report in successor.incident_reports] == ['theft', 'assault']
+    assert len(successor.report_points) == 2
+    assert successor.incident_reports[-1] is forwarded
+    assert len(fresh_model.report_points) == 1
+
+def test_replicated_reports_are_applied(fresh_model):
+    replicated = {**REPORT, 'timestamp': '2026-01-01T12:00:00'}
+    fresh_model.add_replicated_reports([replicated])
+    assert fresh_model.incident_reports == [replicated]
+    assert fresh_model.report_stats_near(REPORT['lat'], REPORT['lon'], 0.3)['crime_count'] == 1
+
+def test_tiles_follow_reports(fresh_model):
+    pyramid = fresh_model.get_tile_pyramid(2, 1)
+    rng = np.random.default_rng(5)
+    incident_types = ['assault', 'theft', 'accident', 'near_miss', 'vandalism']
+    for i, (lat, lon) in enumerate(zip(rng.uniform(26.43, 26.49, 50), rng.uniform(-80.12, -80.04, 50))):
+        fresh_model.add_incident_report({'lat': float(lat), 'lon': float(lon),
+                                         'incident_type': incident_types[i % len(incident_types)], 'severity': 0.7})
+    
+    fresh = type(pyramid)(fresh_model.safety_raster, 2, 1, fresh_model.delray_center)
+    for zoom in fresh.levels:
+        assert np.allclose(pyramid.levels[zoom][0], fresh.levels[zoom][0], equal_nan=True)
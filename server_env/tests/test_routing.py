@@ -0,0 +1,62 @@
+import math
+import numpy as np
+import pytest
+import routing
+
+def random_pairs(raster, span, n, seed):
+    """Random in-raster endpoints about span miles apart"""
+    rng = np.random.default_rng(seed)
+    pairs = []
+    while len(pairs) < n:
+        lat, lon = rng.uniform(26.41, 26.49), rng.uniform(-80.14, -80.01)
+        angle = rng.uniform(0, 2 * math.pi)
+        end_lat = lat + span * math.sin(angle) / 69.1
+        end_lon = lon + span * math.cos(angle) / (69.1 * math.cos(math.radians(lat)))
+        if raster.contains(end_lat, end_lon):
+            pairs.append((lat, lon, end_lat, end_lon))
+    return pairs
+
+@pytest.mark.parametrize("weight", [0.0, 2.0, 5.0])
+@pytest.mark.parametrize("span", [0.5, 3.0])
+def test_windowed_search_matches_whole_raster(shipped_model, monkeypatch, weight, span):
+    raster = shipped_model.safety_raster
+    time_level, day_level = shipped_model.get_risk_levels(21, 5)
+    pairs = random_pairs(raster, span, 4, seed=24)
+
+    windowed = [routing.find_path(raster, *pair, time_level, day_level, weight)[1] for pair in pairs]
+    monkeypatch.setattr(routing, "MIN_ROUTE_MARGIN", 100.0)
+    whole = [routing.find_path(raster, *pair, time_level, day_level, weight)[1] for pair in pairs]
+    assert windowed == pytest.approx(whole, rel=1e-9)
+
+def test_path_joins_start_and_end_nodes(shipped_model):
+    raster = shipped_model.safety_raster
+    lat, lon, end_lat, end_lon = random_pairs(raster, 1.0, 1, seed=5)[0]
+    path, cost = routing.find_path(raster, lat, lon, end_lat, end_lon, 0, 0, 2.0)
+    start_node, end_node = raster.nearest_nodes([lat, end_lat], [lon, end_lon])
+    assert path[0] == start_node and path[-1] == end_node
+    # Consecutive nodes are 8-connected neighbours
+    rows, cols = np.divmod(path, raster.cols)
+    assert np.all(np.maximum(np.abs(np.diff(rows)), np.abs(np.diff(cols))) == 1)
+    assert cost > 0
+
+def overlapping_routes(walksafe, count, seed):
+    """Alternatives between the same endpoints through random via points, sharing their first and last stretches"""
+    rng = np.random.default_rng(seed)
+    start, end = {'lat': 26.4450, 'lon': -80.1050}, {'lat': 26.4700, 'lon': -80.0700}
+    routes = []
+    for _ in range(count):
+        via = {'lat': float(rng.uniform(26.448, 26.467)), 'lon': float(rng.uniform(-80.10, -80.075))}
+        first = walksafe.find_safe_route(start, via, float(rng.uniform(0, 5)))['coordinates']
+        second = walksafe.find_safe_route(via, end, float(rng.uniform(0, 5)))['coordinates']
+        routes.append(first + second[1:])
+    return routes
+
+def test_compare_routes_matches_warm_per_route_analysis(fresh_model):
+    routes = overlapping_routes(fresh_model, 5, seed=25)
+    compared = fresh_model.compare_routes(routes, time_of_day=21, day_of_week=5)
+    # Every cell is cached now, so per-route calls score the same points compare_routes did
+    separate = [fresh_model.analyze_route(route, time_of_day=21, day_of_week=5) for route in routes]
+    assert compared['routes'] == separate
+    assert compared['unique_cells'] < compared['total_points']
+    safety = [analysis['overall_safety'] for analysis in separate]
+    assert [safety[i] for i in compared['ranking']] == sorted(safety, reverse=True)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from model import WalkSafeModel
+
+def shift_recent_window(walksafe, monkeypatch, days_back):
+    """Make the model's recent window start days_back days earlier than it really does"""
+    monkeypatch.setattr(walksafe, 'recent_cutoff_ordinal',
+                        lambda days: WalkSafeModel.recent_cutoff_ordinal(walksafe, days) - days_back)
+
+def test_single_point_predictions_are_exact(shipped_model):
+    for lat, lon in [(26.4615, -80.0728), (26.4432, -80.1011), (26.4871, -80.0553)]:
+        prediction = shipped_model.predict_safety(lat, lon, 21, 5)
+        expected = shipped_model.predict_safety_batch([{'lat': lat, 'lon': lon}], 21, 5, exact=True)[0]
+        assert prediction['safety_score'] == expected['safety_score']
+
+@pytest.mark.parametrize("days_back", [[420], [420, 200], [200, 420]])
+def test_recent_counts_follow_the_window(fresh_model, monkeypatch, days_back):
+    raster = fresh_model.safety_raster
+    pyramid = fresh_model.get_tile_pyramid(2, 1)
+    for days in days_back:
+        shift_recent_window(fresh_model, monkeypatch, days)
+        fresh_model.get_danger_zones()
+    
+    rebuilt = fresh_model.build_safety_raster(raster.step)
+    assert raster.recent_cutoff == rebuilt.recent_cutoff
+    assert np.allclose(raster.stats['recent_crime_count'], rebuilt.stats['recent_crime_count'])
+    assert np.allclose(raster.scores, rebuilt.scores)
+    
+    scores = fresh_model.danger_grid['scores'].copy()
+    fresh_model.build_danger_grid()
+    assert np.allclose(scores, fresh_model.danger_grid['scores'])
+    
+    fresh = type(pyramid)(raster, 2, 1, fresh_model.delray_center)
+    for zoom in fresh.levels:
+        assert np.allclose(pyramid.levels[zoom][0], fresh.levels[zoom][0], equal_nan=True)
+
+def test_recount_without_cutoff_keeps_reports(fresh_model):
+    fresh_model.add_incident_report({'lat': 26.4615, 'lon': -80.0728, 'incident_type': 'theft', 'severity': 0.6})
+    raster = fresh_model.safety_raster
+    expected = raster.stats['recent_crime_count'].copy()
+    
+    raster.recent_cutoff = fresh_model.recent_cutoff = None
+    fresh_model.refresh_recent_stats()
+    assert np.array_equal(raster.stats['recent_crime_count'], expected)
+
+def test_batch_and_route_scores_come_from_the_model(fresh_model):
+    rng = np.random.default_rng(5)
+    points = [{'lat': float(lat), 'lon': float(lon)} for lat, lon in zip(rng.uniform(26.43, 26.49, 40), rng.uniform(-80.12, -80.04, 40))]
+    size = fresh_model.cache_cell_size
+    centers = [{'lat': round(p['lat'] / size) * size, 'lon': round(p['lon'] / size) * size} for p in points]
+    expected = [p['safety_score'] for p in fresh_model.compute_safety_predictions(centers, [21] * 40, [5] * 40, exact=True)]
+    
+    assert [p['safety_score'] for p in fresh_model.predict_safety_batch(points, 21, 5)] == expected
+    route = fresh_model.analyze_route(points, time_of_day=21, day_of_week=5)
+    assert route['overall_safety'] == pytest.approx(np.mean(expected), abs=1e-12)
+    assert fresh_model.compare_routes([points], time_of_day=21, day_of_week=5)['routes'][0] == route
@@ -0,0 +1,178 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+@pytest.fixture
+def client(server_module, monkeypatch):
+    monkeypatch.setattr(server_module, "ADMIN_TOKEN", "secret")
+    return TestClient(server_module.app)
+
+def test_reload_is_broadcast_to_every_worker(server_module, client, monkeypatch):
+    monkeypatch.setattr(server_module, "WORKER_COUNT", 4)
+    monkeypatch.setattr(server_module, "RELOAD_INTERVAL", 5.0)
+    before = server_module.watched_fingerprint()
+    
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["scheduled"] is True
+    assert os.path.exists(server_module.RELOAD_REQUEST_PATH)
+    assert server_module.watched_fingerprint() != before
+
+def test_reload_with_several_workers_needs_the_watcher(server_module, client, monkeypatch):
+    monkeypatch.setattr(server_module, "WORKER_COUNT", 4)
+    monkeypatch.setattr(server_module, "RELOAD_INTERVAL", 0.0)
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 409
+
+def test_reports_are_refused_without_a_durable_log(server_module, client, monkeypatch):
+    monkeypatch.setattr(server_module, "REPORT_LOG_DIR", "report_log")
+    monkeypatch.setattr(server_module, "report_log", None)
+    response = client.post("/report", json={'lat': 26.46, 'lon': -80.07, 'incident_type': 'theft', 'severity': 0.5})
+    assert response.status_code == 503
+
+@pytest.fixture
+def located(server_module, shipped_model, monkeypatch):
+    """A client with location sharing enabled, a fresh location store and the shipped model"""
+    from auth import user_token
+    from locations import LocationStore
+    monkeypatch.setattr(server_module, "USER_TOKEN_SECRET", "signing-secret")
+    monkeypatch.setattr(server_module, "location_store", LocationStore())
+    monkeypatch.setattr(server_module, "walksafe_model", shipped_model)
+    monkeypatch.setattr(server_module.model_executor, "model", shipped_model)
+    headers = {user: {"X-User-Token": user_token("signing-secret", user)} for user in ("alice", "bob", "mallory")}
+    return TestClient(server_module.app), headers
+
+def test_location_updates_need_the_caller_identity(located):
+    client, headers = located
+    update = {'updates': [{'lat': 26.46, 'lon': -80.07}]}
+    assert client.post("/locations", json=update).status_code == 401
+    assert client.post("/locations", json=update, headers={"X-User-Token": "alice:forged"}).status_code == 401
+    spoofed = {'updates': [{'user_id': 'alice', 'lat': 26.46, 'lon': -80.07}]}
+    assert client.post("/locations", json=spoofed, headers=headers["mallory"]).status_code == 403
+    assert client.post("/locations", json=update, headers=headers["alice"]).json()["accepted"] == 1
+
+def test_friends_only_see_positions_shared_with_them(located):
+    client, headers = located
+    client.post("/locations", json={'updates': [{'lat': 26.46, 'lon': -80.07}]}, headers=headers["alice"])
+    lookup = {'friend_ids': ['alice']}
+    
+    assert client.post("/friends/locations", json=lookup, headers=headers["bob"]).json()["friends"] == []
+    client.post("/locations/shares", json={'viewer_ids': ['bob']}, headers=headers["alice"])
+    friends = client.post("/friends/locations", json=lookup, headers=headers["bob"]).json()["friends"]
+    assert [friend["user_id"] for friend in friends] == ["alice"]
+    assert client.post("/friends/locations", json=lookup, headers=headers["mallory"]).json()["friends"] == []
+    
+    client.post("/locations/shares", json={'viewer_ids': ['bob'], 'allow': False}, headers=headers["alice"])
+    assert client.post("/friends/locations", json=lookup, headers=headers["bob"]).json()["friends"] == []
+
+def test_positions_outside_coverage_have_no_safety_score(located):
+    client, headers = located
+    client.post("/locations", json={'updates': [{'lat': 40.0, 'lon': -70.0}]}, headers=headers["alice"])
+    client.post("/locations/shares", json={'viewer_ids': ['bob']}, headers=headers["alice"])
+    friend, = client.post("/friends/locations", json={'friend_ids': ['alice']}, headers=headers["bob"]).json()["friends"]
+    assert friend["safety_score"] is None and friend["risk_level"] is None
+
+@pytest.fixture
+def served(server_module, fresh_model, monkeypatch):
+    """A client serving a private copy of the shipped model, which tests may add reports to"""
+    monkeypatch.setattr(server_module, "walksafe_model", fresh_model)
+    monkeypatch.setattr(server_module.model_executor, "model", fresh_model)
+    return TestClient(server_module.app), fresh_model
+
+def test_conditional_get_returns_not_modified_until_a_report(served):
+    client, walksafe = served
+    first = client.get("/danger-zones")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+    
+    cached = client.get("/danger-zones", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["ETag"] == etag
+    assert client.get("/danger-zones", headers={"If-None-Match": f'"other", {etag}'}).status_code == 304
+    
+    walksafe.add_incident_report({'lat': 26.4615, 'lon': -80.0728, 'incident_type': 'assault', 'severity': 0.9})
+    changed = client.get("/danger-zones", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+def test_batch_predictions_match_single_predictions(served):
+    client, _ = served
+    points = [{'lat': 26.4615, 'lon': -80.0728, 'time_of_day': 21, 'day_of_week': 5},
+              {'lat': 26.4432, 'lon': -80.1011, 'time_of_day': 3, 'day_of_week': 1},
+              {'lat': 26.4871, 'lon': -80.0553, 'time_of_day': 14, 'day_of_week': 6}]
+    batch = client.post("/predict/batch", json={'points': points}).json()["predictions"]
+    single = [client.post("/predict", json=point).json() for point in points]
+    assert [p["safety_score"] for p in batch] == [p["safety_score"] for p in single]
+    assert [p["factors"] for p in batch] == [p["factors"] for p in single]
+    
+    # Scored in the opposite order on a cold cache, the answers are the same
+    served[1].prediction_cache.clear()
+    reversed_single = [client.post("/predict", json=point).json() for point in points[::-1]]
+    assert [p["safety_score"] for p in reversed_single[::-1]] == [p["safety_score"] for p in batch]
+
+def test_cached_tiles_follow_the_recent_window(served, monkeypatch):
+    import json
+    import tiles
+    from model import WalkSafeModel
+    client, walksafe = served
+    z = 12
+    x, y = int(tiles.lon_to_pixel(-80.0728, z) // tiles.TILE_SIZE), int(tiles.lat_to_pixel(26.4615, z) // tiles.TILE_SIZE)
+    path = f"/tiles/{z}/{x}/{y}?time_of_day=21&day_of_week=5"
+    levels = walksafe.get_risk_levels(21, 5)
+    before = client.get(path).content
+    
+    # A day later (here: a window 400 days wider) the cached tile must not be served
+    monkeypatch.setattr(walksafe, 'recent_cutoff_ordinal',
+                        lambda days: WalkSafeModel.recent_cutoff_ordinal(walksafe, days) - 400)
+    after = client.get(path).content
+    assert not walksafe.recent_stats_stale()
+    assert after != before
+    assert json.loads(after) == json.loads(json.dumps(walksafe.get_safety_tile(z, x, y, *levels)))
+
+class FailingLog:
+    """Report log whose appends fail as a full disk or fsync error would"""
+    
+    def append(self, record):
+        from concurrent.futures import Future
+        future = Future()
+        future.set_exception(OSError("No space left on device"))
+        return future
+
+class RecordingLog:
+    """Report log that commits every append at once"""
+    
+    def __init__(self):
+        self.records = []
+    
+    def append(self, record):
+        from concurrent.futures import Future
+        self.records.append(record)
+        future = Future()
+        future.set_result(len(self.records))
+        return future
+
+def test_a_report_the_log_rejects_is_not_served(served, server_module, monkeypatch):
+    client, walksafe = served
+    monkeypatch.setattr(server_module, "REPORT_LOG_DIR", "report_log")
+    monkeypatch.setattr(server_module, "report_log", FailingLog())
+    response = client.post("/report", json={'lat': 26.46, 'lon': -80.07, 'incident_type': 'theft', 'severity': 0.5})
+    assert response.status_code == 500
+    assert walksafe.incident_reports == []
+    assert walksafe.report_stats_near(26.46, -80.07, 0.3) == {}
+
+def test_a_logged_report_is_served_as_logged(served, server_module, monkeypatch):
+    client, walksafe = served
+    log = RecordingLog()
+    monkeypatch.setattr(server_module, "REPORT_LOG_DIR", "report_log")
+    monkeypatch.setattr(server_module, "report_log", log)
+    response = client.post("/report", json={'lat': 26.46, 'lon': -80.07, 'incident_type': 'theft', 'severity': 0.5})
+    assert response.status_code == 200
+    assert walksafe.incident_reports == log.records
+
+def test_location_sharing_is_refused_with_several_workers(server_module, located, monkeypatch):
+    client, headers = located
+    monkeypatch.setattr(server_module, "WORKER_COUNT", 4)
+    assert client.post("/locations", json={'updates': [{'lat': 26.46, 'lon': -80.07}]},
+                       headers=headers["alice"]).status_code == 503
+    assert client.post("/locations/shares", json={'viewer_ids': ['bob']}, headers=headers["alice"]).status_code == 503
+    assert client.post("/friends/locations", json={'friend_ids': ['alice']}, headers=headers["bob"]).status_code == 503
+    stats = server_module.location_store.stats()
+    assert stats["tracked_users"] == stats["sharing_users"] == 0
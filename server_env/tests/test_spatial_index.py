@@ -0,0 +1,35 @@
+from datetime import date
+import numpy as np
+import pytest
+import geo
+from incident_store import IncidentStore, CRIME_SCHEMA
+from model import WalkSafeModel
+from spatial_index import GridIndex
+
+def synthetic_crimes(n, seed):
+    """n crimes spread over Delray Beach and the last three years"""
+    rng = np.random.default_rng(seed)
+    return IncidentStore(CRIME_SCHEMA, {
+        'lat': rng.uniform(26.40, 26.50, n),
+        'lon': rng.uniform(-80.15, -80.00, n),
+        'severity': rng.uniform(0.1, 1.0, n),
+        'date': rng.integers(date.today().toordinal() - 3 * 365, date.today().toordinal() + 1, n),
+        'crime_type': rng.integers(0, 5, n),
+        'category': rng.integers(0, 5, n)
+    })
+
+@pytest.mark.parametrize("radius", [0.5, 2.0])
+@pytest.mark.parametrize("days", [7, 30, 365])
+def test_recent_counts_match_a_filtered_scan(radius, days):
+    walksafe = WalkSafeModel()
+    walksafe.crime_data = synthetic_crimes(50000, seed=42)
+    walksafe.crime_index = walksafe.build_spatial_index(walksafe.crime_data)
+    unsorted = GridIndex(walksafe.crime_data.column('lat'), walksafe.crime_data.column('lon'))
+    dates = walksafe.crime_data.column('date')
+    
+    rng = np.random.default_rng(7)
+    for lat, lon in zip(rng.uniform(26.40, 26.50, 20), rng.uniform(-80.15, -80.00, 20)):
+        positions = unsorted.candidates(lat, lon, radius)
+        distances = geo.local_distances(lat, lon, unsorted.lats[positions], unsorted.lons[positions])
+        expected = np.count_nonzero(dates[positions[distances <= radius]] >= walksafe.recent_cutoff_ordinal(days))
+        assert walksafe.count_recent_near(walksafe.crime_data, {'lat': lat, 'lon': lon}, radius, days) == expected
@@ -0,0 +1,122 @@
+import sqlite3
+import numpy as np
+import pytest
+from datetime import date
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA
+from model import WalkSafeModel
+from sqlite_store import SQLiteStore, StoredIncidents, KEEP_VERSIONS
+
+BOUNDS = {'south': 26.40, 'north': 26.50, 'west': -80.15, 'east': -80.00}
+
+def crime_store(n, seed):
+    rng = np.random.default_rng(seed)
+    return IncidentStore(CRIME_SCHEMA, {
+        'lat': rng.uniform(BOUNDS['south'], BOUNDS['north'], n),
+        'lon': rng.uniform(BOUNDS['west'], BOUNDS['east'], n),
+        'severity': rng.uniform(0.1, 1.0, n),
+        'date': rng.integers(date.today().toordinal() - 365, date.today().toordinal() + 1, n),
+        'crime_type': rng.integers(0, 5, n),
+        'category': rng.integers(0, 5, n)
+    })
+
+NO_ACCIDENTS = IncidentStore.from_records(ACCIDENT_SCHEMA, [])
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "incidents.db"))
+    yield store
+    store.close()
+
+def backed_model(store, crimes, version):
+    walksafe = WalkSafeModel(storage=store)
+    walksafe.crime_data = crimes
+    walksafe.storage_tables = store.import_incidents(crimes, NO_ACCIDENTS, version)
+    return walksafe
+
+def test_queries_match_the_in_memory_index(store):
+    crimes = crime_store(5000, seed=1)
+    backed = backed_model(store, crimes, "v1")
+    in_memory = WalkSafeModel()
+    in_memory.crime_data = crimes
+    in_memory.crime_index = in_memory.build_spatial_index(crimes)
+    
+    for lat, lon in [(26.45, -80.07), (26.41, -80.14), (26.49, -80.01)]:
+        center = {'lat': lat, 'lon': lon}
+        expected, _ = in_memory.find_incidents_in_radius(crimes, center, 0.5)
+        found, _ = backed.find_incidents_in_radius(crimes, center, 0.5)
+        assert np.array_equal(np.sort(found), np.sort(expected))
+
+def test_a_new_version_leaves_the_old_tables_readable(store):
+    old_crimes, new_crimes = crime_store(3000, seed=1), crime_store(1000, seed=2)
+    old = backed_model(store, old_crimes, "v1")
+    new = backed_model(store, new_crimes, "v2")
+    assert old.storage_tables != new.storage_tables
+    
+    # A process still on v1 gets positions into its own store, never past its end
+    center = {'lat': 26.45, 'lon': -80.07}
+    positions, _ = old.find_incidents_in_radius(old_crimes, center, 2.0)
+    assert len(positions) and positions.max() >= len(new_crimes)
+    assert len(old.get_incidents_in_radius(old_crimes, center, 2.0)) == len(positions)
+
+def test_reimporting_a_version_reuses_its_tables(store):
+    crimes = crime_store(1000, seed=1)
+    first = store.import_incidents(crimes, NO_ACCIDENTS, "v1")
+    assert store.import_incidents(crimes, NO_ACCIDENTS, "v1") == first
+    assert store.incident_count(first['crimes']) == 1000
+
+def test_only_recent_versions_are_kept(store):
+    names = [store.import_incidents(crime_store(100, seed=i), NO_ACCIDENTS, f"v{i}") for i in range(KEEP_VERSIONS + 2)]
+    assert store.incident_versions() == [f"v{i}" for i in reversed(range(2, KEEP_VERSIONS + 2))]
+    with pytest.raises(sqlite3.OperationalError):
+        store.incident_count(names[0]['crimes'])
+    assert store.incident_count(names[-1]['crimes']) == 100
+
+def test_staging_tables_of_dead_importers_are_dropped(store):
+    db = store.connection()
+    with db:
+        store.create_incident_table(db, 'crimes', "crimes_abc_staging_999999999")
+    store.import_incidents(crime_store(100, seed=1), NO_ACCIDENTS, "v1")
+    tables = [name for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert not any('staging' in name for name in tables)
+
+@pytest.fixture
+def stored_model(store):
+    """The shipped model with its incidents served from the SQLite store"""
+    from conftest import MODEL_DIR
+    walksafe = WalkSafeModel(storage=store)
+    if not walksafe.load_model(MODEL_DIR):
+        pytest.skip("Shipped model artifacts are not available")
+    return walksafe
+
+def test_a_stored_model_keeps_no_incident_arrays(stored_model, shipped_model):
+    assert isinstance(stored_model.crime_data, StoredIncidents)
+    assert stored_model.crime_data.nbytes() == stored_model.accident_data.nbytes() == 0
+    assert len(stored_model.crime_data) == len(shipped_model.crime_data)
+    assert stored_model.get_statistics()['delray_beach_stats']['high_risk_crimes'] == \
+        shipped_model.get_statistics()['delray_beach_stats']['high_risk_crimes']
+
+def test_a_stored_model_answers_like_the_in_memory_one(stored_model, shipped_model):
+    for lat, lon in [(26.4615, -80.0728), (26.4432, -80.1011), (26.4871, -80.0553)]:
+        stored = stored_model.compute_safety_predictions([{'lat': lat, 'lon': lon}], [21], [5])[0]
+        in_memory = shipped_model.compute_safety_predictions([{'lat': lat, 'lon': lon}], [21], [5])[0]
+        assert stored['safety_score'] == in_memory['safety_score']
+        assert stored_model.get_nearby_alerts(lat, lon, 1.0) == shipped_model.get_nearby_alerts(lat, lon, 1.0)
+        stored_recent = stored_model.get_recent_incidents(lat, lon, 1.0, 365)
+        in_memory_recent = shipped_model.get_recent_incidents(lat, lon, 1.0, 365)
+        stored_recent.pop('since'), in_memory_recent.pop('since')
+        assert stored_recent == in_memory_recent
+    assert np.array_equal(stored_model.danger_grid['scores'], shipped_model.danger_grid['scores'])
+
+def test_a_stored_model_moves_its_recent_window(stored_model, fresh_model, monkeypatch):
+    for walksafe in (stored_model, fresh_model):
+        monkeypatch.setattr(walksafe, 'recent_cutoff_ordinal',
+                            lambda days, walksafe=walksafe: WalkSafeModel.recent_cutoff_ordinal(walksafe, days) - 400)
+        walksafe.refresh_recent_stats()
+    assert np.array_equal(stored_model.safety_raster.stats['recent_crime_count'],
+                          fresh_model.safety_raster.stats['recent_crime_count'])
+
+def test_a_stored_model_writes_complete_bundles(stored_model, shipped_model, tmp_path):
+    from bundle import load_bundle
+    stored_model.save_bundle(str(tmp_path / "bundle"))
+    crimes = load_bundle(str(tmp_path / "bundle"))['crime_data']
+    assert list(crimes) == list(shipped_model.crime_data)
@@ -0,0 +1,32 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+import geo
+import train_model
+
+def synthetic_incidents(n, seed):
+    """n incidents around the training grid, with every column the label features read"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'lat': rng.uniform(26.40, 26.52, n),
+        'lon': rng.uniform(-80.12, -80.03, n),
+        'severity': rng.uniform(0.1, 1.0, n),
+        'crime_type': np.array(['theft', 'burglary', 'violent', 'vandalism', 'other'])[rng.integers(0, 5, n)],
+        'pedestrian_involved': rng.random(n) < 0.2,
+        'intersection': rng.random(n) < 0.4
+    })
+
+def test_label_counts_match_a_haversine_brute_force():
+    accidents, crimes = synthetic_incidents(3000, seed=1), synthetic_incidents(5000, seed=2)
+    labels = train_model.create_safety_labels(accidents, crimes, 30, n_jobs=1)
+    
+    area = math.pi * 0.3 ** 2
+    for i in range(len(labels)):
+        lat, lon = labels['lat'][i], labels['lon'][i]
+        crime_hits = geo.haversine_distances(lat, lon, crimes['lat'].to_numpy(), crimes['lon'].to_numpy()) <= 0.3
+        accident_hits = geo.haversine_distances(lat, lon, accidents['lat'].to_numpy(), accidents['lon'].to_numpy()) <= 0.3
+        assert round(labels['crime_density'][i] * area) == crime_hits.sum()
+        assert round(labels['accident_density'][i] * area) == accident_hits.sum()
+        assert labels['violent_crime_ratio'][i] == pytest.approx(
+            (crimes['crime_type'][crime_hits] == 'violent').mean() if crime_hits.any() else 0)
@@ -0,0 +1,128 @@
+import math
+import numpy as np
+import geo
+
+# Cells per tile side, and the zoom levels served from the pyramid
+TILE_SIZE = 32
+MIN_ZOOM = 10
+BASE_ZOOM = 15
+MAX_ZOOM = 18
+
+def pixel_to_lat(py, zoom):
+    """Convert global Web Mercator pixel rows to latitudes"""
+    n = np.pi * (1 - 2 * np.asarray(py, dtype=np.float64) / (TILE_SIZE * 2 ** zoom))
+    return np.degrees(np.arctan(np.sinh(n)))
+
+def pixel_to_lon(px, zoom):
+    """Convert global Web Mercator pixel columns to longitudes"""
+    return np.asarray(px, dtype=np.float64) / (TILE_SIZE * 2 ** zoom) * 360.0 - 180.0
+
+def lat_to_pixel(lat, zoom):
+    """Convert a latitude to a fractional global pixel row"""
+    lat_rad = math.radians(lat)
+    return (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * TILE_SIZE * 2 ** zoom
+
+def lon_to_pixel(lon, zoom):
+    """Convert a longitude to a fractional global pixel column"""
+    return (lon + 180.0) / 360.0 * TILE_SIZE * 2 ** zoom
+
+def average_blocks(grid):
+    """Average the 2x2 blocks of an even-sized grid, ignoring NaN cells"""
+    blocks = grid.reshape(grid.shape[0] // 2, 2, grid.shape[1] // 2, 2)
+    counts = (~np.isnan(blocks)).sum(axis=(1, 3))
+    sums = np.nansum(blocks, axis=(1, 3))
+    averaged = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+    return averaged.astype(np.float32)
+
+def downsample(grid, x0, y0):
+    """Average 2x2 blocks of a grid (ignoring NaN cells) to build the next zoom level out"""
+    pad_left, pad_top = x0 % 2, y0 % 2
+    pad_right = (grid.shape[1] + pad_left) % 2
+    pad_bottom = (grid.shape[0] + pad_top) % 2
+    grid = np.pad(grid, ((pad_top, pad_bottom), (pad_left, pad_right)), constant_values=np.nan)
+    return average_blocks(grid), (x0 - pad_left) // 2, (y0 - pad_top) // 2
+
+class TilePyramid:
+    """Safety scores resampled onto slippy-map tile grids for every zoom level
+
+    levels maps zoom -> (grid, x0, y0): a float32 array of cell scores whose top-left
+    cell sits at global pixel (x0, y0). Cells outside coverage are NaN.
+    """
+
+    def __init__(self, raster, time_level, day_level, center, coverage_radius=3.0):
+        self.time_level = time_level
+        self.day_level = day_level
+        self.center = center
+        self.coverage_radius = coverage_radius
+
+        x0, x1, y0, y1 = self.pixel_window(raster.bounds)
+        self.levels = {BASE_ZOOM: (self.sample(raster, x0, x1, y0, y1), x0, y0)}
+        for zoom in range(BASE_ZOOM - 1, MIN_ZOOM - 1, -1):
+            self.levels[zoom] = downsample(*self.levels[zoom + 1])
+
+    def pixel_window(self, bounds):
+        """Get the base zoom pixel columns [x0, x1) and rows [y0, y1) covering a lat/lon box"""
+        x0 = int(math.floor(lon_to_pixel(bounds['west'], BASE_ZOOM)))
+        x1 = int(math.ceil(lon_to_pixel(bounds['east'], BASE_ZOOM)))
+        y0 = int(math.floor(lat_to_pixel(bounds['north'], BASE_ZOOM)))
+        y1 = int(math.ceil(lat_to_pixel(bounds['south'], BASE_ZOOM)))
+        return x0, x1, y0, y1
+
+    def sample(self, raster, x0, x1, y0, y1):
+        """Sample the raster at the center of every base zoom cell in a pixel window"""
+        lats = pixel_to_lat(np.arange(y0, y1) + 0.5, BASE_ZOOM)
+        lons = pixel_to_lon(np.arange(x0, x1) + 0.5, BASE_ZOOM)
+        cell_lats = np.repeat(lats, len(lons))
+        cell_lons = np.tile(lons, len(lats))
+
+        scores = np.full(len(cell_lats), np.nan)
+        distances = geo.haversine_distances(self.center['lat'], self.center['lon'], cell_lats, cell_lons)
+        covered = raster.contains(cell_lats, cell_lons) & (distances <= self.coverage_radius)
+        scores[covered] = np.clip(raster.interpolate(
+            cell_lats[covered], cell_lons[covered], self.time_level, self.day_level), 0.0, 1.0)
+        return scores.reshape(len(lats), len(lons)).astype(np.float32)
+
+    def refresh(self, raster, bounds):
+        """Resample the base zoom cells inside a lat/lon box and re-average them at every lower zoom"""
+        grid, grid_x0, grid_y0 = self.levels[BASE_ZOOM]
+        x0, x1, y0, y1 = self.pixel_window(bounds)
+        x0, x1 = max(x0, grid_x0), min(x1, grid_x0 + grid.shape[1])
+        y0, y1 = max(y0, grid_y0), min(y1, grid_y0 + grid.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        grid[y0 - grid_y0:y1 - grid_y0, x0 - grid_x0:x1 - grid_x0] = self.sample(raster, x0, x1, y0, y1)
+
+        for zoom in range(BASE_ZOOM - 1, MIN_ZOOM - 1, -1):
+            # Parent cells of the changed window, averaged from their four children
+            x0, x1 = x0 // 2, (x1 + 1) // 2
+            y0, y1 = y0 // 2, (y1 + 1) // 2
+            children = self.cells(zoom + 1, 2 * x0, 2 * y0, 2 * (x1 - x0), 2 * (y1 - y0))
+            grid, grid_x0, grid_y0 = self.levels[zoom]
+            grid[y0 - grid_y0:y1 - grid_y0, x0 - grid_x0:x1 - grid_x0] = average_blocks(children)
+
+    def tile(self, z, x, y):
+        """Get the TILE_SIZE x TILE_SIZE score grid for a tile (rows run north to south)"""
+        if z > BASE_ZOOM:
+            # Deeper zooms repeat the base level cells
+            factor = 2 ** (z - BASE_ZOOM)
+            span = TILE_SIZE // factor
+            base = self.cells(BASE_ZOOM, x * span, y * span, span)
+            return np.repeat(np.repeat(base, factor, axis=0), factor, axis=1)
+        return self.cells(z, x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE)
+
+    def cells(self, zoom, px, py, size, height=None):
+        """Get a size x size (or size x height) window of a zoom level starting at global pixel (px, py)"""
+        height = size if height is None else height
+        grid, x0, y0 = self.levels[zoom]
+        window = np.full((height, size), np.nan, dtype=np.float32)
+
+        row_start, row_stop = max(py - y0, 0), min(py + height - y0, grid.shape[0])
+        col_start, col_stop = max(px - x0, 0), min(px + size - x0, grid.shape[1])
+        if row_start < row_stop and col_start < col_stop:
+            window[row_start + y0 - py:row_stop + y0 - py, col_start + x0 - px:col_stop + x0 - px] = \
+                grid[row_start:row_stop, col_start:col_stop]
+        return window
+
+    def nbytes(self):
+        """Get the memory used by all zoom levels in bytes"""
+        return sum(grid.nbytes for grid, _, _ in self.levels.values())
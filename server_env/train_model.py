@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import numpy as np
 import math
@@ -5,10 +6,13 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
 import os
 from datetime import datetime
 import logging
+from joblib import Parallel, delayed, effective_n_jobs
+from geo import EARTH_RADIUS_MILES
+from incident_store import IncidentStore, CRIME_SCHEMA, ACCIDENT_SCHEMA
+from model import WalkSafeModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -92,81 +96,140 @@ def preprocess_data(df):
     
     return accidents, crimes
 
-def create_safety_labels(accidents, crimes):
+def create_safety_labels(accidents, crimes, resolution=50, n_jobs=-1):
     """Create safety score labels for training"""
-    logger.info("Creating safety labels...")
+    logger.info(f"Creating safety labels on a {resolution}x{resolution} grid...")
     
     # Create a grid for Delray Beach area
     lat_min, lat_max = 26.42, 26.50
     lon_min, lon_max = -80.10, -80.05
-    
-    # Create training points
-    training_data = []
-    
-    # Grid resolution for training points
-    resolution = 50
     lat_step = (lat_max - lat_min) / resolution
     lon_step = (lon_max - lon_min) / resolution
-    
-    for i in range(resolution):
-        for j in range(resolution):
-            lat = lat_min + i * lat_step
-            lon = lon_min + j * lon_step
-            
-            # Calculate safety features for this location
-            features = calculate_location_features(lat, lon, accidents, crimes)
-            
-            # Calculate safety score (inverse of risk)
-            safety_score = calculate_safety_score(features)
-            
-            training_data.append({
-                'lat': lat,
-                'lon': lon,
-                'safety_score': safety_score,
-                **features
-            })
-    
-    return pd.DataFrame(training_data)
+    lats = lat_min + np.arange(resolution) * lat_step
+    lons = lon_min + np.arange(resolution) * lon_step
+    
+    # Calculate safety features for every grid point, then the safety score (inverse of risk)
+    features = calculate_grid_features(lats, lons, accidents, crimes, n_jobs=n_jobs)
+    safety_scores = calculate_safety_score(features)
+    
+    return pd.DataFrame({
+        'lat': np.repeat(lats, len(lons)),
+        'lon': np.tile(lons, len(lats)),
+        'safety_score': safety_scores,
+        **features
+    })
 
-def calculate_location_features(lat, lon, accidents, crimes, radius=0.3):
-    """Calculate features for a specific location"""
-    import math
-    
-    # Find nearby incidents
-    nearby_crimes = []
-    nearby_accidents = []
-    
-    for _, crime in crimes.iterrows():
-        distance = calculate_distance(lat, lon, crime['lat'], crime['lon'])
-        if distance <= radius:
-            nearby_crimes.append(crime)
-    
-    for _, accident in accidents.iterrows():
-        distance = calculate_distance(lat, lon, accident['lat'], accident['lon'])
-        if distance <= radius:
-            nearby_accidents.append(accident)
+def calculate_grid_features(lats, lons, accidents, crimes, radius=0.3, n_jobs=-1):
+    """Calculate features for every point of a lat/lon grid, as flat row-major arrays"""
+    crime_sums = neighborhood_sums(lats, lons, crimes['lat'].to_numpy(dtype=np.float64), crimes['lon'].to_numpy(dtype=np.float64), {
+        'count': np.ones(len(crimes)),
+        'severity': crimes['severity'].to_numpy(dtype=np.float64),
+        'violent': (crimes['crime_type'] == 'violent').to_numpy(dtype=np.float64)
+    }, radius, n_jobs)
+    accident_sums = neighborhood_sums(lats, lons, accidents['lat'].to_numpy(dtype=np.float64), accidents['lon'].to_numpy(dtype=np.float64), {
+        'count': np.ones(len(accidents)),
+        'pedestrian': accidents['pedestrian_involved'].to_numpy(dtype=np.float64),
+        'fatal': (accidents['severity'] >= 0.9).to_numpy(dtype=np.float64),
+        'intersection': accidents['intersection'].to_numpy(dtype=np.float64)
+    }, radius, n_jobs)
     
     # Calculate features
     area = math.pi * radius * radius
-    
-    features = {
-        'crime_density': len(nearby_crimes) / area if area > 0 else 0,
-        'crime_severity_avg': np.mean([c['severity'] for c in nearby_crimes]) if nearby_crimes else 0,
-        'violent_crime_ratio': len([c for c in nearby_crimes if c['crime_type'] == 'violent']) / len(nearby_crimes) if nearby_crimes else 0,
-        'recent_crime_count': len(nearby_crimes),  # Simplified for training
-        'accident_density': len(nearby_accidents) / area if area > 0 else 0,
-        'pedestrian_accident_ratio': len([a for a in nearby_accidents if a['pedestrian_involved']]) / len(nearby_accidents) if nearby_accidents else 0,
-        'fatal_accident_ratio': len([a for a in nearby_accidents if a['severity'] >= 0.9]) / len(nearby_accidents) if nearby_accidents else 0,
-        'intersection_accident_ratio': len([a for a in nearby_accidents if a['intersection']]) / len(nearby_accidents) if nearby_accidents else 0,
-        'time_risk_score': 0.4,  # Default moderate risk
-        'day_risk_score': 0.4,   # Default moderate risk
-        'weather_risk': 0.3      # Default low weather risk
+    crime_count = crime_sums['count'].ravel()
+    accident_count = accident_sums['count'].ravel()
+    point_count = len(crime_count)
+    
+    def ratio(sums, counts):
+        return np.divide(sums.ravel(), counts, out=np.zeros(point_count), where=counts > 0)
+    
+    return {
+        'crime_density': crime_count / area,
+        'crime_severity_avg': ratio(crime_sums['severity'], crime_count),
+        'violent_crime_ratio': ratio(crime_sums['violent'], crime_count),
+        'recent_crime_count': crime_count,  # Simplified for training
+        'accident_density': accident_count / area,
+        'pedestrian_accident_ratio': ratio(accident_sums['pedestrian'], accident_count),
+        'fatal_accident_ratio': ratio(accident_sums['fatal'], accident_count),
+        'intersection_accident_ratio': ratio(accident_sums['intersection'], accident_count),
+        'time_risk_score': np.full(point_count, 0.4),  # Default moderate risk
+        'day_risk_score': np.full(point_count, 0.4),   # Default moderate risk
+        'weather_risk': np.full(point_count, 0.3)      # Default low weather risk
     }
-    
-    return features
+
+def neighborhood_sums(lats, lons, incident_lats, incident_lons, weights, radius, n_jobs=-1, bands_per_job=4):
+    """Sum per-incident weights over the grid points within radius (haversine miles) of each incident
+
+    The grid rows are split into bands summed in parallel; each band only gets the
+    incidents within reach of it. Returns a dict of (len(lats), len(lons)) arrays.
+    """
+    order = np.argsort(incident_lats, kind='stable')
+    incident_lats, incident_lons = incident_lats[order], incident_lons[order]
+    weights = {name: np.asarray(values, dtype=np.float64)[order] for name, values in weights.items()}
+    reach = math.degrees(radius / EARTH_RADIUS_MILES)
+    
+    bands = [band for band in np.array_split(np.arange(len(lats)), min(len(lats), effective_n_jobs(n_jobs) * bands_per_job)) if len(band)]
+    tasks = []
+    for band in bands:
+        first = np.searchsorted(incident_lats, lats[band[0]] - reach, 'left')
+        last = np.searchsorted(incident_lats, lats[band[-1]] + reach, 'right')
+        tasks.append((lats[band], lons, incident_lats[first:last], incident_lons[first:last],
+                      {name: values[first:last] for name, values in weights.items()}, radius))
+    if len(tasks) > 1:
+        results = Parallel(n_jobs=n_jobs)(delayed(band_sums)(*task) for task in tasks)
+    else:
+        results = [band_sums(*task) for task in tasks]
+    return {name: np.vstack([result[name] for result in results]) for name in weights}
+
+def band_sums(lats, lons, incident_lats, incident_lons, weights, radius, chunk_size=20000):
+    """Sum per-incident weights over the grid points within radius of each incident for one band of rows
+
+    A circle crosses each grid row in one run of columns, whose half-width follows
+    from the haversine formula. Each incident adds its weight at the start of the
+    run and takes it off past the end, and a cumulative sum along every row turns
+    those edges into totals, so the cost grows with incidents x rows crossed rather
+    than with incidents x points covered.
+    """
+    rows, cols = len(lats), len(lons)
+    edges = {name: np.zeros(rows * (cols + 1)) for name in weights}
+    reach = math.degrees(radius / EARTH_RADIUS_MILES)
+    half_angle = math.sin(radius / EARTH_RADIUS_MILES / 2) ** 2
+    cos_lats = np.cos(np.radians(lats))
+    
+    for start in range(0, len(incident_lats), chunk_size):
+        chunk_lats = incident_lats[start:start + chunk_size]
+        chunk_lons = incident_lons[start:start + chunk_size, None]
+        first = np.searchsorted(lats, chunk_lats - reach, 'left')
+        last = np.searchsorted(lats, chunk_lats + reach, 'right')
+        width = int((last - first).max(initial=0))
+        if width == 0:
+            continue
+        
+        # Every row each incident's circle may cross
+        row = first[:, None] + np.arange(width)
+        crossed = row < last[:, None]
+        row = np.minimum(row, rows - 1)
+        
+        # Haversine: sin^2(dlon/2) <= (sin^2(r/2R) - sin^2(dlat/2)) / (cos lat1 cos lat2)
+        lat_term = np.sin(np.radians(lats[row] - chunk_lats[:, None]) / 2) ** 2
+        lon_term = (half_angle - lat_term) / (cos_lats[row] * np.cos(np.radians(chunk_lats))[:, None])
+        crossed &= lon_term >= 0
+        half_width = np.degrees(2 * np.arcsin(np.sqrt(np.clip(lon_term, 0.0, 1.0))))
+        run_start = np.searchsorted(lons, (chunk_lons - half_width).ravel(), 'left').reshape(row.shape)
+        run_end = np.searchsorted(lons, (chunk_lons + half_width).ravel(), 'right').reshape(row.shape)
+        crossed &= run_end > run_start
+        
+        row_offsets = row[crossed] * (cols + 1)
+        starts, ends = row_offsets + run_start[crossed], row_offsets + run_end[crossed]
+        incidents = np.broadcast_to(np.arange(len(chunk_lats))[:, None], row.shape)[crossed]
+        for name, values in weights.items():
+            run_weights = values[start:start + chunk_size][incidents]
+            edges[name] += np.bincount(starts, weights=run_weights, minlength=len(edges[name]))
+            edges[name] -= np.bincount(ends, weights=run_weights, minlength=len(edges[name]))
+    
+    return {name: np.cumsum(values.reshape(rows, cols + 1), axis=1)[:, :cols] for name, values in edges.items()}
 
 def calculate_safety_score(features):
-    """Calculate safety score based on features"""
+    """Calculate safety scores from features (scalars or arrays)"""
     # Start with baseline safety
     safety = 0.7
     
@@ -182,23 +245,7 @@ def calculate_safety_score(features):
     safety -= features['intersection_accident_ratio'] * 0.1
     
     # Ensure safety score is between 0 and 1
-    return max(0.0, min(1.0, safety))
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points in miles"""
-    R = 3959  # Earth radius in miles
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) +
-         math.cos(lat1_rad) * math.cos(lat2_rad) *
-         math.sin(delta_lon/2) * math.sin(delta_lon/2))
-    
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+    return np.clip(safety, 0.0, 1.0)
 
 def train_model(training_df):
     """Train the Random Forest model"""
@@ -254,45 +301,30 @@ def save_model_and_data(model, scaler, feature_importance, feature_columns, acci
     # Create models directory
     os.makedirs(model_dir, exist_ok=True)
     
-    # Save model components
-    joblib.dump(model, f"{model_dir}/walksafe_model.pkl")
-    joblib.dump(scaler, f"{model_dir}/walksafe_scaler.pkl")
-    joblib.dump(feature_importance, f"{model_dir}/walksafe_feature_importance.pkl")
-    
-    # Create features config
+    # Features config
     features_config = {feature: i for i, feature in enumerate(feature_columns)}
-    joblib.dump(features_config, f"{model_dir}/walksafe_features_config.pkl")
-    
-    # Prepare data for model
-    crime_data = []
-    for _, crime in crimes.iterrows():
-        crime_data.append({
-            'lat': crime['lat'],
-            'lon': crime['lon'],
-            'date': crime['date'],
-            'severity': crime['severity'],
-            'crime_type': crime['crime_type'],
-            'category': crime['category']
-        })
-    
-    accident_data = []
-    for _, accident in accidents.iterrows():
-        accident_data.append({
-            'lat': accident['lat'],
-            'lon': accident['lon'],
-            'date': accident['date'],
-            'severity': accident['severity'],
-            'pedestrian_involved': accident['pedestrian_involved'],
-            'intersection': accident['intersection']
-        })
-    
-    # Save data
-    joblib.dump(crime_data, f"{model_dir}/walksafe_crime_data.pkl")
-    joblib.dump(accident_data, f"{model_dir}/walksafe_accident_data.pkl")
+    
+    # Prepare data for model as typed columns
+    crime_data = IncidentStore.from_columns(CRIME_SCHEMA, {
+        'lat': crimes['lat'].to_numpy(),
+        'lon': crimes['lon'].to_numpy(),
+        'date': crimes['date'].tolist(),
+        'severity': crimes['severity'].to_numpy(),
+        'crime_type': crimes['crime_type'].tolist(),
+        'category': crimes['category'].tolist()
+    })
+    
+    accident_data = IncidentStore.from_columns(ACCIDENT_SCHEMA, {
+        'lat': accidents['lat'].to_numpy(),
+        'lon': accidents['lon'].to_numpy(),
+        'date': accidents['date'].tolist(),
+        'severity': accidents['severity'].to_numpy(),
+        'pedestrian_involved': accidents['pedestrian_involved'].to_numpy(),
+        'intersection': accidents['intersection'].to_numpy()
+    })
     
     # Delray Beach center coordinates
     delray_center = {'lat': 26.4615, 'lon': -80.0728}
-    joblib.dump(delray_center, f"{model_dir}/walksafe_delray_center.pkl")
     
     # Metadata
     metadata = {
@@ -304,13 +336,31 @@ def save_model_and_data(model, scaler, feature_importance, feature_columns, acci
         'trained_at': datetime.now().isoformat(),
         'model_type': 'RandomForestRegressor'
     }
-    joblib.dump(metadata, f"{model_dir}/walksafe_metadata.pkl")
+    
+    # Write an artifact bundle, precomputing the safety raster the server reads
+    walksafe = WalkSafeModel()
+    walksafe.use_components({
+        'model': model,
+        'scaler': scaler,
+        'feature_importance': feature_importance,
+        'features_config': features_config,
+        'crime_data': crime_data,
+        'accident_data': accident_data,
+        'delray_center': delray_center,
+        'metadata': metadata
+    })
+    walksafe.save_bundle(model_dir)
     
     logger.info("Model and data saved successfully!")
     return metadata
 
 def main():
     """Main training pipeline"""
+    parser = argparse.ArgumentParser(description="Train the WalkSafe+ safety model")
+    parser.add_argument('--resolution', type=int, default=50, help="Training grid points per side")
+    parser.add_argument('--jobs', type=int, default=-1, help="Processes for label generation (-1: all cores)")
+    args = parser.parse_args()
+    
     logger.info("Starting WalkSafe+ model training...")
     
     try:
@@ -321,7 +371,7 @@ def main():
         accidents, crimes = preprocess_data(df)
         
         # Create training data with safety labels
-        training_df = create_safety_labels(accidents, crimes)
+        training_df = create_safety_labels(accidents, crimes, args.resolution, args.jobs)
         logger.info(f"Created {len(training_df)} training samples")
         
         # Train model